@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import argparse
+from types import SimpleNamespace
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "video_tracking_demo"))
+
+from tracking.render import OverlayRenderer, _get_class_name, _map_binary
+
+NAMES = {0: "car", 1: "person", 2: "bus", 3: "bicycle"}
+
+
+def reference_draw(frame, model, tracks):
+    """The per-object cv2 drawing track_video used before OverlayRenderer."""
+    frame_objects = []
+    for box, track_id, conf, cls_id in zip(*tracks):
+        x1, y1, x2, y2 = map(int, box)
+        normalized, color = _map_binary(_get_class_name(model, int(cls_id)))
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        label = f"{normalized.title()}-#{track_id}"
+        text_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+        cv2.rectangle(frame, (x1, y1 - text_size[1] - 10), (x1 + text_size[0], y1), color, -1)
+        cv2.putText(frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        frame_objects.append({"id": int(track_id), "class": normalized, "confidence": float(conf),
+                              "bbox": [x1, y1, x2, y2]})
+    return frame_objects
+
+
+def random_tracks(rng, ids, classes, width, height):
+    """Boxes for the given tracks scattered over (and partly off) the frame."""
+    objects = len(ids)
+    xy = rng.uniform(-40, [width, height], (objects, 2))
+    wh = rng.uniform(4, [width / 4, height / 3], (objects, 2))
+    boxes = np.hstack([xy, xy + wh]).astype(np.float32)
+    conf = rng.uniform(0.5, 1, objects).astype(np.float32)
+    return boxes, ids, conf, classes
+
+
+def bench(objects, frames, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    model = SimpleNamespace(names=NAMES)
+    renderer = OverlayRenderer(model)
+    background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    # Tracks keep their ID and class for the whole clip, as they do in a video
+    ids = rng.permutation(4 * objects)[:objects] + 1
+    classes = rng.integers(0, len(NAMES), objects)
+    all_tracks = [random_tracks(rng, ids, classes, width, height) for _ in range(frames)]
+
+    timings = {}
+    outputs = {}
+    for name, draw in (("reference", lambda f, t: reference_draw(f, model, t)),
+                       ("renderer", renderer.draw)):
+        canvases = [background.copy() for _ in all_tracks]
+        start = time.perf_counter()
+        objs = [draw(canvas, tracks) for canvas, tracks in zip(canvases, all_tracks)]
+        timings[name] = (time.perf_counter() - start) / frames
+        outputs[name] = (canvases, objs)
+
+    ref_frames, ref_objs = outputs["reference"]
+    new_frames, new_objs = outputs["renderer"]
+    mismatched = sum(int((a != b).any(axis=2).sum()) for a, b in zip(ref_frames, new_frames))
+    return {
+        "objects": objects,
+        "reference_ms": round(timings["reference"] * 1000, 3),
+        "renderer_ms": round(timings["renderer"] * 1000, 3),
+        "speedup": round(timings["reference"] / timings["renderer"], 2),
+        "mismatched_pixels": mismatched,
+        "same_json": ref_objs == new_objs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OverlayRenderer against per-object cv2 drawing")
+    parser.add_argument("--objects", type=int, nargs="+", default=[1, 10, 25, 50, 100])
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--out", help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    rows = [bench(n, args.frames, args.width, args.height) for n in args.objects]
+    print(f"{'objects':>8}{'cv2 ms':>10}{'renderer ms':>13}{'speedup':>9}{'diff px':>9}{'json':>6}")
+    for r in rows:
+        print(f"{r['objects']:>8}{r['reference_ms']:>10}{r['renderer_ms']:>13}{r['speedup']:>9}"
+              f"{r['mismatched_pixels']:>9}{'ok' if r['same_json'] else 'DIFF':>6}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(rows, f, indent=2)
+    return 0 if all(r["mismatched_pixels"] == 0 and r["same_json"] for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT, "video_tracking_demo"))
+sys.path.insert(0, os.path.join(ROOT, "inference"))
+sys.path.insert(0, os.path.join(ROOT, "labeller_sdk"))
+
+from synthetic import make_video, make_image_folder, make_tiny_model
+
+CASES = ["track_video", "track_video_pipelined", "run_inference_label",
+         "convert_to_coco", "convert_to_coco_incremental", "coco_payload", "preannotation_upload"]
+
+# Metric name -> True if higher is better
+COMPARED_METRICS = {"throughput": True, "p90_ms": False, "peak_rss_mb": False}
+
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def latency_summary(durations):
+    """Percentiles in milliseconds of a list of durations in seconds."""
+    if not durations:
+        return {}
+    ms = np.asarray(durations) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _timed(items, durations):
+    """Yield from `items`, appending the time each item took to produce to `durations`."""
+    last = time.perf_counter()
+    for item in items:
+        now = time.perf_counter()
+        durations.append(now - last)
+        yield item
+        last = time.perf_counter()
+
+
+def _result(items, seconds, durations, **extra):
+    result = {"items": items, "seconds": round(seconds, 4),
+              "throughput": round(items / seconds, 2) if seconds > 0 else 0.0}
+    result.update(latency_summary(durations))
+    result.update(extra)
+    return result
+
+
+# ---- cases (each runs in its own process) ----
+
+def bench_track_video(data, weights, out_dir, pipelined=False):
+    from tracking.byte_tracker import track_video
+
+    stamps = [time.perf_counter()]
+    stage_stats = {}
+    start = time.perf_counter()
+    ok, message = track_video(
+        data["video"], os.path.join(out_dir, "tracked"), weights, os.path.join(out_dir, "results.json"),
+        pipelined=pipelined, render_workers=2 if pipelined else 1,
+        stage_stats=stage_stats if pipelined else None,
+        progress_callback=lambda done, total: stamps.append(time.perf_counter()),
+    )
+    seconds = time.perf_counter() - start
+    if not ok:
+        raise RuntimeError(message)
+    stages = {name: s for name, s in stage_stats.items() if name != "model"}
+    return _result(len(stamps) - 1, seconds, np.diff(stamps).tolist(), stages=stages)
+
+
+def bench_run_inference_label(data, weights, out_dir):
+    from tracking.model_registry import get_model
+    from run_inference_label import stream_yolo_labels
+
+    model = get_model(weights, warmup=False, tag="predict")
+    images = sorted(os.path.join(data["images"], f) for f in os.listdir(data["images"]))
+    durations = []
+    start = time.perf_counter()
+    results = _timed(model.predict(source=images, stream=True, verbose=False), durations)
+    written = stream_yolo_labels(results, os.path.join(out_dir, "labels"))
+    return _result(written, time.perf_counter() - start, durations)
+
+
+def _configure_convert(data, out_dir):
+    import convert_to_coco
+    convert_to_coco.IMG_DIR = data["images"]
+    convert_to_coco.LBL_DIR = data["labels"]
+    convert_to_coco.OUTPUT_JSON = os.path.join(out_dir, "coco_annotations.json")
+    convert_to_coco.SIZE_CACHE = os.path.join(out_dir, ".image_sizes.json")
+    convert_to_coco.MANIFEST_JSON = os.path.join(out_dir, "coco_annotations.manifest.json")
+    return convert_to_coco
+
+
+def bench_convert_to_coco(data, weights, out_dir, repeat=3, incremental=False):
+    convert_to_coco = _configure_convert(data, out_dir)
+    if incremental:
+        convert_to_coco.convert()  # the run being updated is not timed
+    durations = []
+    for _ in range(repeat):
+        if not incremental:
+            for path in (convert_to_coco.OUTPUT_JSON, convert_to_coco.SIZE_CACHE, convert_to_coco.MANIFEST_JSON):
+                if os.path.exists(path):
+                    os.remove(path)
+        start = time.perf_counter()
+        convert_to_coco.convert(incremental=incremental)
+        durations.append(time.perf_counter() - start)
+    images = len(os.listdir(data["images"]))
+    # Throughput is images per second of the median run
+    return _result(images, float(np.median(durations)), durations, runs=repeat)
+
+
+def bench_coco_payload(data, weights, out_dir, repeat=3):
+    """Time turning the COCO file into the request body an upload sends."""
+    convert_to_coco = _configure_convert(data, out_dir)
+    convert_to_coco.convert()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(convert_to_coco.OUTPUT_JSON, "r") as f:
+            coco = json.load(f)
+        payload = json.dumps(coco, separators=(",", ":")).encode("utf-8")
+        durations.append(time.perf_counter() - start)
+    return _result(len(coco["annotations"]), float(np.median(durations)), durations,
+                   runs=repeat, payload_bytes=len(payload))
+
+
+def bench_preannotation_upload(data, weights, out_dir, images_per_shard=20, workers=4):
+    """Sharded upload against the local stub server, with per-upload latency and some 503s."""
+    from chunked_upload import HttpTransport, upload_sharded
+    from stub_server import StubServer
+
+    convert_to_coco = _configure_convert(data, out_dir)
+    convert_to_coco.convert(compact=True)
+    with StubServer(latency=0.02, fail_rate=0.05) as server:
+        transport = HttpTransport("bench", "bench", "client", "project", base_url=server.url, poll_interval=0.01)
+        summary = upload_sharded(transport, convert_to_coco.OUTPUT_JSON, "project",
+                                 images_per_shard=images_per_shard, workers=workers)
+        received = server.state.summary()
+    return _result(summary["images"], summary["seconds"], summary["shard_seconds"], shards=summary["shards"],
+                   retries=summary["retries"], connections=received["connections"])
+
+
+def run_case(case, data, weights, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    if case == "track_video":
+        result = bench_track_video(data, weights, out_dir)
+    elif case == "track_video_pipelined":
+        result = bench_track_video(data, weights, out_dir, pipelined=True)
+    elif case == "run_inference_label":
+        result = bench_run_inference_label(data, weights, out_dir)
+    elif case == "convert_to_coco":
+        result = bench_convert_to_coco(data, weights, out_dir)
+    elif case == "convert_to_coco_incremental":
+        result = bench_convert_to_coco(data, weights, out_dir, incremental=True)
+    elif case == "coco_payload":
+        result = bench_coco_payload(data, weights, out_dir)
+    elif case == "preannotation_upload":
+        result = bench_preannotation_upload(data, weights, out_dir)
+    else:
+        raise ValueError(f"Unknown benchmark case: {case}")
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+# ---- driver ----
+
+def prepare_data(work_dir, config):
+    """Generate the synthetic inputs once per configuration."""
+    data_dir = os.path.join(work_dir, "data")
+    config_path = os.path.join(data_dir, "config.json")
+    data = {
+        "video": os.path.join(data_dir, "video.mp4"),
+        "images": os.path.join(data_dir, "images"),
+        "labels": os.path.join(data_dir, "labels"),
+    }
+    if os.path.exists(config_path):
+        with open(config_path, "r") as f:
+            if json.load(f) == config:
+                return data
+        shutil.rmtree(data_dir)
+
+    os.makedirs(data_dir)
+    print("Generating synthetic data ...")
+    make_video(data["video"], config["width"], config["height"], config["frames"], config["objects"])
+    make_image_folder(data["images"], data["labels"], config["images"], config["width"], config["height"],
+                      config["objects"])
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+    return data
+
+
+def spawn_case(case, data, weights, work_dir):
+    """Run one case in a fresh interpreter so its peak RSS is its own."""
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--case", case, "--work-dir", work_dir,
+         "--weights", weights, "--data", json.dumps(data)],
+        capture_output=True, text=True,
+    )
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    error = (proc.stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]
+    return {"error": error}
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of (case, metric, baseline, current, change) that got worse by more than `tolerance`."""
+    regressions = []
+    for case, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(case)
+        if not previous or "error" in current or "error" in previous:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append((case, metric, old, new, change))
+    return regressions
+
+
+def print_results(results):
+    print(f"\n{'case':<30}{'items':>8}{'throughput':>12}{'p50_ms':>10}{'p90_ms':>10}{'p99_ms':>10}{'rss_mb':>9}")
+    for case, r in results["cases"].items():
+        if "error" in r:
+            print(f"{case:<30}  error: {r['error']}")
+            continue
+        print(f"{case:<30}{r['items']:>8}{r['throughput']:>12}{r.get('p50_ms', '-'):>10}"
+              f"{r.get('p90_ms', '-'):>10}{r.get('p99_ms', '-'):>10}{str(r['peak_rss_mb']):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tracking and labelling pipelines on synthetic data")
+    parser.add_argument("--cases", nargs="+", default=CASES, choices=CASES)
+    parser.add_argument("--out", default=os.path.join(BENCH_DIR, "results.json"))
+    parser.add_argument("--baseline", help="results file to compare against; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--work-dir", default=os.path.join(BENCH_DIR, "work"))
+    parser.add_argument("--weights", help="model to benchmark; default is a randomly initialised tiny model")
+    parser.add_argument("--model-cfg", default="yolov8n-seg.yaml")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--objects", type=int, default=8)
+    # Internal: run a single case and print its result
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        result = run_case(args.case, json.loads(args.data), args.weights,
+                          os.path.join(args.work_dir, "out", args.case))
+        print(RESULT_PREFIX + json.dumps(result))
+        return 0
+
+    config = {"width": args.width, "height": args.height, "frames": args.frames,
+              "images": args.images, "objects": args.objects}
+    os.makedirs(args.work_dir, exist_ok=True)
+    data = prepare_data(args.work_dir, config)
+    weights = args.weights or make_tiny_model(os.path.join(args.work_dir, "tiny_model.pt"), args.model_cfg)
+    shutil.rmtree(os.path.join(args.work_dir, "out"), ignore_errors=True)
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": config,
+        "weights": os.path.basename(weights),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "cases": {},
+    }
+    for case in args.cases:
+        print(f"Running {case} ...")
+        results["cases"][case] = spawn_case(case, data, weights, args.work_dir)
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print_results(results)
+    print(f"\nResults saved to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("Warning: baseline was recorded with a different data configuration")
+        regressions = compare(results, baseline, args.tolerance)
+        if not regressions:
+            print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+            return 0
+        print(f"\nRegressions against {args.baseline}:")
+        for case, metric, old, new, change in regressions:
+            print(f"  {case}: {metric} {old} -> {new} ({change:+.1%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import os
+import cv2
+import numpy as np
+
+# BGR colours for the two dataset classes (vehicle, pedestrian)
+CLASS_COLORS = [(40, 40, 220), (220, 180, 40)]
+
+
+class MovingBoxes:
+    """Rectangles bouncing around a frame; the ground truth for a synthetic clip."""
+
+    def __init__(self, width, height, objects, seed=0):
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.height = height
+        self.size = np.column_stack([
+            rng.integers(width // 16, width // 5, objects),
+            rng.integers(height // 12, height // 4, objects),
+        ])
+        self.pos = rng.uniform(0, 1, (objects, 2)) * ([width, height] - self.size)
+        self.vel = rng.uniform(-1, 1, (objects, 2)) * max(width, height) / 120
+        self.cls = rng.integers(0, len(CLASS_COLORS), objects)
+
+    def step(self):
+        self.pos += self.vel
+        limit = np.array([self.width, self.height]) - self.size
+        bounced = (self.pos < 0) | (self.pos > limit)
+        self.vel[bounced] *= -1
+        self.pos = np.clip(self.pos, 0, limit)
+
+    def boxes(self):
+        """(N, 4) integer x1, y1, x2, y2."""
+        xy = self.pos.astype(int)
+        return np.column_stack([xy, xy + self.size])
+
+    def draw(self, frame):
+        for (x1, y1, x2, y2), cls in zip(self.boxes(), self.cls):
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), CLASS_COLORS[cls], -1)
+        return frame
+
+
+def _noise(rng, width, height):
+    return rng.integers(0, 96, (height, width, 3), dtype=np.uint8)
+
+
+def make_video(path, width=1280, height=720, frames=300, objects=8, fps=30, seed=0):
+    """Write an mp4 of `objects` moving rectangles over noise. Returns the path."""
+    rng = np.random.default_rng(seed)
+    scene = MovingBoxes(width, height, objects, seed)
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not out.isOpened():
+        raise RuntimeError(f"Could not open a VideoWriter for {path}")
+    try:
+        for _ in range(frames):
+            out.write(scene.draw(_noise(rng, width, height)))
+            scene.step()
+    finally:
+        out.release()
+    return path
+
+
+def make_image_folder(image_dir, label_dir=None, count=200, width=1280, height=720, objects=8, seed=0):
+    """
+    Write `count` jpg images of rectangles over noise. If `label_dir` is given, also
+    write the matching YOLO label files (class x_center y_center width height).
+    Returns the image paths.
+    """
+    os.makedirs(image_dir, exist_ok=True)
+    if label_dir:
+        os.makedirs(label_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        scene = MovingBoxes(width, height, objects, seed + i)
+        name = f"synthetic_{i:05d}"
+        path = os.path.join(image_dir, name + ".jpg")
+        cv2.imwrite(path, scene.draw(_noise(rng, width, height)))
+        paths.append(path)
+        if label_dir:
+            boxes = scene.boxes().astype(float)
+            centers = (boxes[:, :2] + boxes[:, 2:]) / 2 / [width, height]
+            sizes = (boxes[:, 2:] - boxes[:, :2]) / [width, height]
+            with open(os.path.join(label_dir, name + ".txt"), "w") as f:
+                for cls, (cx, cy), (w, h) in zip(scene.cls, centers, sizes):
+                    f.write(f"{cls} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n")
+    return paths
+
+
+def make_tiny_model(path, cfg="yolov8n-seg.yaml"):
+    """Save a randomly initialised YOLO model built from `cfg`, so no weights need downloading."""
+    from ultralytics import YOLO
+    if not os.path.exists(path):
+        YOLO(cfg).save(path)
+    return path
@@ -1,12 +1,17 @@
-from ultralytics import YOLO
 import os
+import argparse
 
-def main():
-    # Path to model weights
-    weights_path = os.path.join('..', 'Labeller_Assignment_Dataset', 'weights', 'best.pt')
+# Share the tracking app's model registry with the batch scripts (PYTHONPATH=../video_tracking_demo)
+from tracking.backends import BACKENDS, resolve_weights
+from tracking.model_registry import get_model, get_registry
 
-    # Initialize model
-    model = YOLO(weights_path)
+def main(backend="torch"):
+    # Path to model weights (or their ONNX/OpenVINO export, exported on first use)
+    weights_path = resolve_weights(os.path.join('..', 'Labeller_Assignment_Dataset', 'weights', 'best.pt'), backend)
+
+    # Initialize model (one-shot run, so no warm-up pass)
+    model = get_model(weights_path, warmup=False, tag="predict")
+    print(f"Model loaded in {get_registry().info(weights_path, tag='predict')['load_s']:.2f}s")
 
     # Source images path for inference
     source_path = os.path.join('..', 'Labeller_Assignment_Dataset', 'dataset_folder', 'images', 'test')
@@ -20,4 +25,6 @@ def main():
     print(f"Inference done. Results saved at {save_dir}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Predict the test images and save the annotated results")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    main(parser.parse_args().backend)
@@ -1,33 +1,137 @@
 import os
-from ultralytics import YOLO
-from PIL import Image
+import queue
+import argparse
+import threading
+import numpy as np
+import torch
+
+# Share the tracking app's model registry with the batch scripts (PYTHONPATH=../video_tracking_demo)
+from tracking.backends import BACKENDS, resolve_weights
+from tracking.model_registry import get_model, get_registry
+
+# Classes to keep
+ACCEPTED_CLASSES = {0, 1}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff'}
+
+def _label_path(img_path, save_dir):
+    return os.path.join(save_dir, os.path.splitext(os.path.basename(img_path))[0] + '.txt')
+
+def _write_label_file(txt_path, classes, boxes_norm):
+    with open(txt_path, 'w') as f:
+        for bbox_norm, cls_id in zip(boxes_norm, classes):
+            if cls_id not in ACCEPTED_CLASSES:
+                continue
+            line = f"{cls_id} " + " ".join([f"{x:.6f}" for x in bbox_norm]) + "\n"
+            f.write(line)
 
 def save_yolo_labels(results, save_dir):
     os.makedirs(save_dir, exist_ok=True)
-    
-    # Classes to keep
-    accepted_classes = {0, 1}
-    
+
     for result in results:
-        img_path = result.path
-        img_name = os.path.basename(img_path)
-        txt_file_name = os.path.splitext(img_name)[0] + '.txt'
-        txt_path = os.path.join(save_dir, txt_file_name)
-        
-        with open(txt_path, 'w') as f:
-            for bbox_norm, cls_id in zip(result.boxes.xywhn.cpu().numpy(), result.boxes.cls.cpu().numpy().astype(int)):
-                if cls_id not in accepted_classes:
-                    continue
-                line = f"{cls_id} " + " ".join([f"{x:.6f}" for x in bbox_norm]) + "\n"
-                f.write(line)
+        txt_path = _label_path(result.path, save_dir)
+        _write_label_file(txt_path, result.boxes.cls.cpu().numpy().astype(int), result.boxes.xywhn.cpu().numpy())
         print(f"Saved labels: {txt_path}")
 
+def pending_images(source_dir, save_dir, weights_path):
+    """
+    Images in `source_dir` that still need labels: those without a label file, or
+    whose label file is older than the image or the weights.
+    """
+    weights_mtime = os.path.getmtime(weights_path)
+    pending = []
+    for name in sorted(os.listdir(source_dir)):
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+            continue
+        img_path = os.path.join(source_dir, name)
+        txt_path = _label_path(img_path, save_dir)
+        if os.path.exists(txt_path) and os.path.getmtime(txt_path) > max(os.path.getmtime(img_path), weights_mtime):
+            continue
+        pending.append(img_path)
+    return pending
+
+def stream_yolo_labels(results, save_dir, transfer_batch=16, queue_size=64):
+    """
+    Write label files while inference is still running. Boxes of `transfer_batch`
+    results are copied device->host in one transfer, then a background thread
+    writes the files. Only the boxes are kept from each result, so masks and
+    original images are released as soon as the next result is produced.
+    Returns the number of label files the writer thread wrote.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    pending = queue.Queue(maxsize=queue_size)
+    errors = []
+    written = [0]
+
+    def writer():
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            try:
+                txt_path, classes, boxes_norm = item
+                _write_label_file(txt_path, classes, boxes_norm)
+                written[0] += 1
+                print(f"Saved labels: {txt_path}")
+            except Exception as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=writer, name="label-writer", daemon=True)
+    thread.start()
+
+    def flush(batch):
+        if not batch:
+            return
+        # One (cls, x, y, w, h) tensor for the whole batch -> a single .cpu() copy
+        rows = torch.cat([torch.cat([cls[:, None], xywhn], dim=1) for _, cls, xywhn in batch])
+        rows = rows.cpu().numpy()
+        offsets = np.cumsum([len(cls) for _, cls, _ in batch])[:-1]
+        for (path, _, _), part in zip(batch, np.split(rows, offsets)):
+            pending.put((_label_path(path, save_dir), part[:, 0].astype(int), part[:, 1:]))
+
+    batch = []
+    try:
+        for result in results:
+            batch.append((result.path, result.boxes.cls, result.boxes.xywhn))
+            if len(batch) >= transfer_batch:
+                flush(batch)
+                batch = []
+        flush(batch)
+    finally:
+        pending.put(None)
+        thread.join()
+    if errors:
+        raise errors[0]
+    return written[0]
+
 if __name__ == "__main__":
-    model_path = "./Labeller_Assignment_Dataset/weights/best.pt"
-    test_images_dir = "./Labeller_Assignment_Dataset/dataset_folder/images/test"
-    save_labels_dir = "./Labeller_Assignment_Dataset/pred_results_labels"
-    
-    model = YOLO(model_path)
-    results = model.predict(source=test_images_dir)
-    
-    save_yolo_labels(results, save_labels_dir)
+    parser = argparse.ArgumentParser(description="Predict YOLO labels for a folder of images")
+    parser.add_argument("--model", default="./Labeller_Assignment_Dataset/weights/best.pt")
+    parser.add_argument("--source", default="./Labeller_Assignment_Dataset/dataset_folder/images/test")
+    parser.add_argument("--labels", default="./Labeller_Assignment_Dataset/pred_results_labels")
+    parser.add_argument("--batch", type=int, default=1,
+                        help="images per forward pass; >1 letterboxes mixed-size images to a square canvas")
+    parser.add_argument("--stream", action="store_true",
+                        help="write labels while predicting instead of holding every result in memory")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="skip images whose label file is newer than both the image and the weights")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="run the weights through PyTorch or their ONNX Runtime/OpenVINO (INT8) export")
+    args = parser.parse_args()
+
+    model_path = resolve_weights(args.model, args.backend)
+    model = get_model(model_path, warmup=False, tag="predict")
+    print(f"Model loaded in {get_registry().info(model_path, tag='predict')['load_s']:.2f}s")
+
+    source = args.source
+    if args.skip_existing:
+        source = pending_images(args.source, args.labels, args.model)
+        print(f"{len(source)} images need labels")
+
+    if source:
+        if args.stream:
+            results = model.predict(source=source, batch=args.batch, stream=True)
+            written = stream_yolo_labels(results, args.labels)
+            print(f"Wrote {written} label files to {args.labels}")
+        else:
+            results = model.predict(source=source, batch=args.batch)
+            save_yolo_labels(results, args.labels)
@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import uuid
+import random
+import hashlib
+import threading
+import http.client
+from urllib.parse import urlsplit, urlencode
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import profiling
+
+IMAGES_PER_SHARD = 500
+MAX_WORKERS = 4
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 0.5   # seconds before the first retry (doubled per attempt, with jitter)
+BACKOFF_MAX = 30.0
+
+# Endpoints LabellerrClient.upload_preannotation_by_project_id talks to
+BASE_URL = 'https://api.labellerr.com'
+UPLOAD_PATH = '/actions/upload_answers'
+STATUS_PATH = '/actions/upload_answers_status'
+
+
+class UploadError(Exception):
+    """A shard was rejected; retrying will not help."""
+
+
+class TransientUploadError(UploadError):
+    """A shard failed in a way that may succeed on retry (network, 429, 5xx)."""
+
+
+def _multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            'Content-Type: application/json\r\n\r\n').encode()
+    return head + data + f'\r\n--{boundary}--\r\n'.encode(), f'multipart/form-data; boundary={boundary}'
+
+
+class HttpTransport:
+    """
+    Uploads shards with the same requests the SDK makes (submit, then poll the job
+    status), over one keep-alive connection per worker thread. Point `base_url` at
+    stub_server.py to run uploads offline.
+    """
+
+    def __init__(self, api_key, api_secret, client_id, project_id, annotation_format='coco_json',
+                 base_url=BASE_URL, poll_interval=1.0, timeout=120, poll_timeout=600):
+        url = urlsplit(base_url)
+        self.scheme = url.scheme
+        self.netloc = url.netloc
+        self.prefix = url.path.rstrip('/')
+        self.headers = {'api_key': api_key or '', 'api_secret': api_secret or '', 'source': 'sdk'}
+        self.params = {'project_id': project_id, 'answer_format': annotation_format, 'client_id': client_id}
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.poll_timeout = poll_timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.netloc, timeout=self.timeout)
+        return conn
+
+    def _request(self, method, path, params, body=None, headers=None):
+        conn = self._connection()
+        try:
+            conn.request(method, f'{self.prefix}{path}?{urlencode(params)}', body=body,
+                         headers={**self.headers, **(headers or {})})
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            # Drop the connection; the next request opens a fresh one
+            conn.close()
+            self._local.conn = None
+            raise TransientUploadError(f'{type(e).__name__}: {e}') from e
+        if response.status == 429 or response.status >= 500:
+            raise TransientUploadError(f'HTTP {response.status}')
+        if response.status >= 400:
+            raise UploadError(f'HTTP {response.status}: {data[:200].decode(errors="replace")}')
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            # e.g. a proxy's HTML error page served with a 2xx status
+            raise UploadError(f'bad response: {data[:200].decode(errors="replace")}') from e
+
+    def submit(self, shard_path):
+        """POST one shard and return the id of the server job processing it."""
+        with open(shard_path, 'rb') as f:
+            body, content_type = _multipart('file', os.path.basename(shard_path), f.read())
+        result = self._request('POST', UPLOAD_PATH, self.params, body, {'Content-Type': content_type})
+        try:
+            return result['response']['job_id']
+        except (KeyError, TypeError) as e:
+            raise UploadError(f'bad response: no job_id in {str(result)[:200]}') from e
+
+    def wait(self, job_id):
+        """Poll `job_id` until it completes; gives up (transiently) after `poll_timeout` seconds."""
+        deadline = time.monotonic() + self.poll_timeout
+        while True:
+            result = self._request('GET', STATUS_PATH, {**self.params, 'job_id': job_id})
+            try:
+                status = result['response']['status']
+            except (KeyError, TypeError) as e:
+                raise UploadError(f'bad response: no status in {str(result)[:200]}') from e
+            if status == 'completed':
+                return
+            if status == 'failed':
+                raise UploadError(f'job {job_id} failed')
+            if time.monotonic() >= deadline:
+                raise TransientUploadError(f'job {job_id} still {status} after {self.poll_timeout}s')
+            time.sleep(self.poll_interval)
+
+
+def _is_transient(error):
+    """Whether an SDK error came from the network or a 429/5xx reply, rather than auth or validation."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (OSError, http.client.HTTPException)):
+            return True
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+        if status is not None:
+            return status == 429 or status >= 500
+        if type(error).__module__.startswith('requests') and type(error).__name__ in (
+                'ConnectionError', 'Timeout', 'ConnectTimeout', 'ReadTimeout', 'ChunkedEncodingError'):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class SdkTransport:
+    """
+    Uploads shards through LabellerrClient, one client per worker thread. The SDK
+    posts and polls in one call, so submit() returns an already finished job and a
+    retry after a failed poll has to upload the shard again.
+    """
+
+    def __init__(self, api_key, api_secret, client_id, project_id, annotation_format='coco_json'):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.client_id = client_id
+        self.project_id = project_id
+        self.annotation_format = annotation_format
+        self._local = threading.local()
+
+    def submit(self, shard_path):
+        from labellerr.client import LabellerrClient
+        from labellerr.exceptions import LabellerrError
+
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = LabellerrClient(self.api_key, self.api_secret)
+        try:
+            result = client.upload_preannotation_by_project_id(
+                self.project_id, self.client_id, self.annotation_format, shard_path)
+        except LabellerrError as e:
+            if _is_transient(e):
+                raise TransientUploadError(str(e)) from e
+            raise UploadError(str(e)) from e
+        try:
+            status = result['response']['status']
+            job_id = result['response'].get('job_id')
+        except (KeyError, TypeError, AttributeError) as e:
+            raise UploadError(f'bad response: {str(result)[:200]}') from e
+        if status != 'completed':
+            raise UploadError(f'upload finished with status {status}')
+        return job_id
+
+    def wait(self, job_id):
+        pass
+
+
+def write_shards(coco_path, shard_dir, images_per_shard=IMAGES_PER_SHARD):
+    """
+    Split a COCO file into shards of `images_per_shard` consecutive images, each
+    with the annotations of its images and all categories, written compactly to
+    `shard_dir`. Returns one dict per shard with its path, counts and sha256.
+    """
+    with open(coco_path, 'r') as f:
+        coco = json.load(f)
+    by_image = {}
+    for ann in coco['annotations']:
+        by_image.setdefault(ann['image_id'], []).append(ann)
+
+    os.makedirs(shard_dir, exist_ok=True)
+    shards = []
+    images = coco['images']
+    for index, start in enumerate(range(0, len(images), images_per_shard)):
+        chunk = images[start:start + images_per_shard]
+        annotations = [ann for image in chunk for ann in by_image.get(image['id'], ())]
+        payload = json.dumps({'images': chunk, 'annotations': annotations, 'categories': coco['categories']},
+                             separators=(',', ':')).encode('utf-8')
+        path = os.path.join(shard_dir, f'shard_{index:05d}.json')
+        with open(path, 'wb') as f:
+            f.write(payload)
+        shards.append({
+            'index': index,
+            'path': path,
+            'images': len(chunk),
+            'annotations': len(annotations),
+            'bytes': len(payload),
+            'sha256': hashlib.sha256(payload).hexdigest(),
+        })
+    return shards
+
+
+def _load_manifest(path, project_id):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('project_id') == project_id:
+            manifest.setdefault('jobs', {})
+            return manifest
+    return {'project_id': project_id, 'shards': {}, 'jobs': {}}
+
+
+def _write_manifest(path, manifest):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def upload_sharded(transport, coco_path, project_id, images_per_shard=IMAGES_PER_SHARD, workers=MAX_WORKERS,
+                   max_attempts=MAX_ATTEMPTS, shard_dir=None, manifest_path=None, progress_callback=None):
+    """
+    Upload `coco_path` as image-aligned shards on `workers` threads, retrying
+    transient failures with exponential backoff. Each shard's server job id is saved
+    in a manifest next to the COCO file as soon as it is accepted, so a retry (or a
+    rerun) only polls that job instead of posting the shard again, and finished
+    shards are recorded by content hash, so a rerun after an interruption only
+    uploads what is missing. Shards hold consecutive images, so after images are
+    added or removed every shard from the first change on is sent again.
+    `progress_callback(done, total)` is called as shards finish.
+    Returns a summary dict; raises UploadError if any shard ultimately failed.
+    """
+    base = os.path.splitext(coco_path)[0]
+    shard_dir = shard_dir or base + '_shards'
+    manifest_path = manifest_path or base + '.upload_manifest.json'
+    manifest = _load_manifest(manifest_path, project_id)
+    shards = write_shards(coco_path, shard_dir, images_per_shard)
+    pending = [s for s in shards if s['sha256'] not in manifest['shards']]
+    lock = threading.Lock()
+    stats = {'retries': 0, 'durations': []}
+
+    def upload_one(shard):
+        start = time.perf_counter()
+        with lock:
+            job_id = manifest['jobs'].get(shard['sha256'])
+        for attempt in range(1, max_attempts + 1):
+            try:
+                with profiling.span('upload_shard', shard=shard['index']):
+                    if job_id is None:
+                        job_id = transport.submit(shard['path'])
+                        # Record the job before polling it, so a retry never posts the shard twice
+                        with lock:
+                            manifest['jobs'][shard['sha256']] = job_id
+                            _write_manifest(manifest_path, manifest)
+                    transport.wait(job_id)
+                break
+            except TransientUploadError as e:
+                if attempt == max_attempts:
+                    raise UploadError(f'shard {shard["index"]}: gave up after {attempt} attempts ({e})') from e
+                with lock:
+                    stats['retries'] += 1
+                profiling.count('upload_retries')
+                # Full jitter keeps retrying workers from hitting the server in lockstep
+                time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))))
+            except UploadError as e:
+                with lock:
+                    manifest['jobs'].pop(shard['sha256'], None)
+                    _write_manifest(manifest_path, manifest)
+                raise UploadError(f'shard {shard["index"]}: {e}') from e
+        seconds = time.perf_counter() - start
+        with lock:
+            manifest['jobs'].pop(shard['sha256'], None)
+            manifest['shards'][shard['sha256']] = {'index': shard['index'], 'images': shard['images'],
+                                                   'job_id': job_id, 'attempts': attempt}
+            _write_manifest(manifest_path, manifest)
+            stats['durations'].append(seconds)
+        return shard
+
+    done = len(shards) - len(pending)
+    failures = []
+    start = time.perf_counter()
+    if progress_callback is not None:
+        progress_callback(done, len(shards))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(upload_one, shard) for shard in pending]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except UploadError as e:
+                failures.append(str(e))
+                continue
+            done += 1
+            if progress_callback is not None:
+                progress_callback(done, len(shards))
+    seconds = time.perf_counter() - start
+
+    uploaded = [s for s in pending if s['sha256'] in manifest['shards']]
+    summary = {
+        'shards': len(shards),
+        'skipped': len(shards) - len(pending),
+        'uploaded': len(uploaded),
+        'images': sum(s['images'] for s in uploaded),
+        'annotations': sum(s['annotations'] for s in uploaded),
+        'bytes': sum(s['bytes'] for s in uploaded),
+        'retries': stats['retries'],
+        'seconds': round(seconds, 3),
+        'shard_seconds': stats['durations'],
+        'failed': failures,
+    }
+    if failures:
+        raise UploadError(f'{len(failures)} of {len(pending)} shards failed; rerun to resume: {failures[0]}')
+    return summary
@@ -0,0 +1,190 @@
+import os
+import json
+import shutil
+import tempfile
+
+
+class _JsonArrayStream:
+    """Writes the items of one JSON array as they arrive, laid out like json.dump would."""
+
+    def __init__(self, f, indent):
+        self.f = f
+        self.indent = indent
+        self.count = 0
+
+    def write(self, obj):
+        if self.indent is None:
+            text = json.dumps(obj, separators=(',', ':'))
+            self.f.write(text if self.count == 0 else ',' + text)
+        else:
+            # Array items of a top-level object sit two indent levels deep
+            pad = ' ' * (2 * self.indent)
+            text = pad + json.dumps(obj, indent=self.indent).replace('\n', '\n' + pad)
+            self.f.write('\n' + text if self.count == 0 else ',\n' + text)
+        self.count += 1
+
+    def close_array(self):
+        if self.count and self.indent is not None:
+            self.f.write('\n' + ' ' * self.indent)
+        self.f.write(']')
+
+
+class _JsonReader:
+    """Pulls JSON punctuation and values off a text file, reading it a chunk at a time."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        self.eof = not chunk
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return bool(chunk)
+
+    def peek(self):
+        """Next non-whitespace character, without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON input')
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f'Expected {char!r} in JSON input, found {self.buf[self.pos]!r}')
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may go on in the next chunk
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_json_array(path, key, chunk_size=1 << 16):
+    """
+    Yield the items of the top-level array `key` of the JSON object in `path` (e.g.
+    the "annotations" of a COCO file) without loading the file: it is parsed
+    `chunk_size` characters at a time, and arrays before `key` are skipped item by item.
+    """
+    with open(path, 'r') as f:
+        reader = _JsonReader(f, chunk_size)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            name = reader.value()
+            reader.expect(':')
+            if reader.peek() != '[':
+                reader.value()
+            else:
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.pos += 1
+                else:
+                    while True:
+                        item = reader.value()
+                        if name == key:
+                            yield item
+                        if reader.peek() == ']':
+                            reader.pos += 1
+                            break
+                        reader.expect(',')
+            if name == key or reader.peek() == '}':
+                return
+            reader.expect(',')
+
+
+class CocoStreamWriter:
+    """
+    Writes a COCO file ({"images", "annotations", "categories"}) incrementally.
+    Images go straight to the output; annotations are spooled to a temporary file
+    and appended once the images are complete, so neither list is held in memory.
+
+    indent=4 reproduces json.dump(coco, f, indent=4) byte for byte; indent=None
+    writes compact JSON. The file is written under a temporary name and renamed
+    into place on close, so readers never see a partial file.
+    """
+
+    def __init__(self, path, categories, indent=4):
+        self.path = path
+        self.categories = categories
+        self.indent = indent
+        out_dir = os.path.dirname(os.path.abspath(path))
+        self._tmp_path = path + '.tmp'
+        self._out = open(self._tmp_path, 'w')
+        self._spool = tempfile.TemporaryFile('w+', dir=out_dir)
+        self._out.write('{' + self._key('images') + '[')
+        self._images = _JsonArrayStream(self._out, indent)
+        self._annotations = _JsonArrayStream(self._spool, indent)
+
+    def _key(self, name):
+        if self.indent is None:
+            return json.dumps(name) + ':'
+        return '\n' + ' ' * self.indent + json.dumps(name) + ': '
+
+    @property
+    def num_images(self):
+        return self._images.count
+
+    @property
+    def num_annotations(self):
+        return self._annotations.count
+
+    def add_image(self, image):
+        self._images.write(image)
+
+    def add_annotation(self, annotation):
+        self._annotations.write(annotation)
+
+    def close(self):
+        if self._out.closed:
+            return
+        self._images.close_array()
+        self._out.write(',' + self._key('annotations') + '[')
+        self._spool.seek(0)
+        shutil.copyfileobj(self._spool, self._out)
+        self._spool.close()
+        self._annotations.f = self._out
+        self._annotations.close_array()
+
+        if self.indent is None:
+            categories = json.dumps(self.categories, separators=(',', ':'))
+        else:
+            categories = json.dumps(self.categories, indent=self.indent).replace('\n', '\n' + ' ' * self.indent)
+        self._out.write(',' + self._key('categories') + categories)
+        self._out.write('}' if self.indent is None else '\n}')
+        self._out.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if not self._out.closed:
+            self._out.close()
+            self._spool.close()
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -1,10 +1,18 @@
 import os
 import json
-from PIL import Image
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from image_headers import SizeCache
+from coco_writer import CocoStreamWriter, iter_json_array
+from profiling import span
 
 IMG_DIR = './Labeller_Assignment_Dataset/predictions'
 LBL_DIR = './Labeller_Assignment_Dataset/pred_results_labels'
 OUTPUT_JSON = './Labeller_Assignment_Dataset/coco_annotations.json'
+SIZE_CACHE = os.path.join(IMG_DIR, '.image_sizes.json')  # image sizes keyed by path + mtime
+MANIFEST_JSON = os.path.splitext(OUTPUT_JSON)[0] + '.manifest.json'  # per-image ids and file states
+CHUNK_SIZE = 512  # images scanned at a time while streaming
 
 CLASS_MAP = {
     '0': 1,  # vehicle -> category id 1
@@ -23,68 +31,251 @@ def yolo_to_coco_bbox(x_center, y_center, width, height, img_width, img_height):
     h = height * img_height
     return [x_min, y_min, w, h]
 
-def convert():
-    images = []
-    annotations = []
-    ann_id = 1
-    img_id = 1
+def yolo_to_coco_bboxes(boxes, img_width, img_height):
+    """
+    Vectorized yolo_to_coco_bbox for an (N, 4) array of normalized x_center, y_center,
+    width, height. Uses the same float64 operations, so results are bit-identical.
+    """
+    x_min = (boxes[:, 0] - boxes[:, 2] / 2) * img_width
+    y_min = (boxes[:, 1] - boxes[:, 3] / 2) * img_height
+    w = boxes[:, 2] * img_width
+    h = boxes[:, 3] * img_height
+    return np.stack([x_min, y_min, w, h], axis=1)
 
-    for filename in os.listdir(IMG_DIR):
-        if not filename.endswith('.jpg'):
-            continue
-        img_path = os.path.join(IMG_DIR, filename)
+def read_label_file(label_path):
+    """
+    Parse a YOLO label file in one pass. Returns (category_ids, boxes) for the rows
+    with 5 fields and a known class, or None if the file does not exist.
+    """
+    try:
+        with open(label_path, 'r') as f:
+            rows = [line.split() for line in f]
+    except FileNotFoundError:
+        return None
+    rows = [parts for parts in rows if len(parts) == 5 and parts[0] in CLASS_MAP]
+    category_ids = [CLASS_MAP[parts[0]] for parts in rows]
+    boxes = np.array([parts[1:] for parts in rows], dtype=np.float64).reshape(-1, 4)
+    return category_ids, boxes
+
+def _file_state(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def _timed_size(cache, image_path):
+    with span('image_header'):
+        return cache.get_size(image_path)
+
+def _timed_label(label_path):
+    with span('label_read'):
+        return read_label_file(label_path)
+
+def _scan(filenames, workers=None):
+    """
+    Yield (filename, (width, height), label) in order. Sizes come from the image
+    headers (cached across runs) and labels are read concurrently, CHUNK_SIZE
+    images at a time so memory stays bounded.
+    """
+    cache = SizeCache(SIZE_CACHE)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(filenames), CHUNK_SIZE):
+            chunk = filenames[start:start + CHUNK_SIZE]
+            sizes = pool.map(lambda path: _timed_size(cache, path), [os.path.join(IMG_DIR, f) for f in chunk])
+            labels = pool.map(_timed_label, [os.path.join(LBL_DIR, os.path.splitext(f)[0] + '.txt') for f in chunk])
+            yield from zip(chunk, sizes, labels)
+    cache.save()
+
+def _coco_boxes(label, img_width, img_height):
+    """(category_id, bbox, area) per box of a parsed label file, rounded for the output."""
+    category_ids, boxes = label
+    bboxes = yolo_to_coco_bboxes(boxes, img_width, img_height)
+    areas = (bboxes[:, 2] * bboxes[:, 3]).tolist()
+    return [
+        (category_id, [round(coord, 2) for coord in bbox], round(area, 2))
+        for category_id, bbox, area in zip(category_ids, bboxes.tolist(), areas)
+    ]
+
+def _load_previous():
+    """
+    Image entries, manifest and largest annotation id of the existing COCO output, or
+    None if there is nothing to merge into. The annotations are only streamed (to
+    check they are grouped by image in image order, as convert writes them), so
+    memory grows with the number of images, not annotations.
+    """
+    if not os.path.exists(OUTPUT_JSON):
+        return None
+    images = list(iter_json_array(OUTPUT_JSON, 'images'))
+    position = {img['id']: i for i, img in enumerate(images)}
+    last, max_ann_id = 0, 0
+    for ann in iter_json_array(OUTPUT_JSON, 'annotations'):
+        index = position.get(ann['image_id'], -1)
+        if index < last:
+            print(f'Warning: annotations in {OUTPUT_JSON} are not grouped in image order; converting from scratch')
+            return None
+        last, max_ann_id = index, max(max_ann_id, ann['id'])
+    manifest = {}
+    if os.path.exists(MANIFEST_JSON):
+        with open(MANIFEST_JSON, 'r') as f:
+            manifest = json.load(f)
+    return images, manifest, max_ann_id
+
+class _AnnotationGroups:
+    """Hands out a stream of annotations grouped in image order one image at a time."""
+
+    def __init__(self, annotations):
+        self._annotations = annotations
+        self._next = next(annotations, None)
+
+    def take(self, image_id):
+        group = []
+        while self._next is not None and self._next['image_id'] == image_id:
+            group.append(self._next)
+            self._next = next(self._annotations, None)
+        return group
+
+def _write_manifest(manifest):
+    tmp_path = MANIFEST_JSON + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, MANIFEST_JSON)
+
+def convert(workers=None, compact=False, incremental=False):
+    """
+    Write OUTPUT_JSON from the images in IMG_DIR and labels in LBL_DIR, streaming
+    entries to disk as they are produced. compact=True drops the indentation.
+    With incremental=True an existing OUTPUT_JSON is updated in place: images whose
+    image and label files are unchanged since the last run (per MANIFEST_JSON) are
+    copied over without being read, changed images keep their image_id and reuse
+    their annotation ids, and new images get ids after the current maximum. The
+    previous annotations are streamed from OUTPUT_JSON alongside its images.
+    """
+    filenames = [f for f in os.listdir(IMG_DIR) if f.endswith('.jpg')]
+    previous = _load_previous() if incremental else None
+    manifest = {}
+    reused = 0
+
+    def states(filename):
         label_path = os.path.join(LBL_DIR, os.path.splitext(filename)[0] + '.txt')
+        return _file_state(os.path.join(IMG_DIR, filename)), _file_state(label_path)
+
+    with CocoStreamWriter(OUTPUT_JSON, CATEGORIES, indent=None if compact else 4) as writer:
+        if previous is None:
+            ann_id = 1
+            img_id = 1
+            for filename, (img_width, img_height), label in _scan(filenames, workers):
+                writer.add_image({
+                    'id': img_id,
+                    'file_name': filename,
+                    'width': img_width,
+                    'height': img_height
+                })
+                image_state, label_state = states(filename)
+                manifest[filename] = {'image_id': img_id, 'image': image_state, 'label': label_state}
 
-        # Read image size
-        with Image.open(img_path) as img:
-            img_width, img_height = img.size
+                if label is None:
+                    print(f'Warning: Label file not found for {filename}')
+                    img_id += 1
+                    continue
 
-        images.append({
-            'id': img_id,
-            'file_name': filename,
-            'width': img_width,
-            'height': img_height
-        })
+                for category_id, bbox, area in _coco_boxes(label, img_width, img_height):
+                    writer.add_annotation({
+                        'id': ann_id,
+                        'image_id': img_id,
+                        'category_id': category_id,
+                        'bbox': bbox,
+                        'area': area,
+                        'iscrowd': 0
+                    })
+                    ann_id += 1
 
-        # Read label file and convert boxes
-        if not os.path.exists(label_path):
-            print(f'Warning: Label file not found for {filename}')
-            img_id += 1
-            continue
+                img_id += 1
+        else:
+            prev_images, prev_manifest, max_ann_id = previous
+            by_name = {img['file_name']: img for img in prev_images}
+            next_img_id = max((img['id'] for img in prev_images), default=0) + 1
+            next_ann_id = max_ann_id + 1
 
-        with open(label_path, 'r') as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) != 5:
+            # Keep the previous image order and append new images after it
+            current = set(filenames)
+            order = [img['file_name'] for img in prev_images if img['file_name'] in current]
+            order += [f for f in filenames if f not in by_name]
+            # Removed images still have to be stepped over in the annotation stream
+            sequence = [(img['file_name'], img) for img in prev_images]
+            sequence += [(f, None) for f in filenames if f not in by_name]
+            groups = _AnnotationGroups(iter_json_array(OUTPUT_JSON, 'annotations'))
+
+            file_states = {}
+            unchanged = set()
+            for filename in order:
+                file_states[filename] = states(filename)
+                entry = prev_manifest.get(filename)
+                if (filename in by_name and entry and entry['image_id'] == by_name[filename]['id']
+                        and [entry['image'], entry['label']] == list(file_states[filename])):
+                    unchanged.add(filename)
+
+            scanned = _scan([f for f in order if f not in unchanged], workers)
+            for filename, image in sequence:
+                prev_annotations = groups.take(image['id']) if image is not None else []
+                if filename not in current:
                     continue
-                cls, x_c, y_c, w, h = parts
-                if cls not in CLASS_MAP:
+                image_state, label_state = file_states[filename]
+                if filename in unchanged:
+                    writer.add_image(image)
+                    for ann in prev_annotations:
+                        writer.add_annotation(ann)
+                    manifest[filename] = {'image_id': image['id'], 'image': image_state, 'label': label_state}
+                    reused += 1
                     continue
 
-                bbox = yolo_to_coco_bbox(float(x_c), float(y_c), float(w), float(h), img_width, img_height)
-
-                annotations.append({
-                    'id': ann_id,
-                    'image_id': img_id,
-                    'category_id': CLASS_MAP[cls],
-                    'bbox': [round(coord, 2) for coord in bbox],
-                    'area': round(bbox[2] * bbox[3], 2),
-                    'iscrowd': 0
+                _, (img_width, img_height), label = next(scanned)
+                if filename in by_name:
+                    img_id = by_name[filename]['id']
+                else:
+                    img_id = next_img_id
+                    next_img_id += 1
+                writer.add_image({
+                    'id': img_id,
+                    'file_name': filename,
+                    'width': img_width,
+                    'height': img_height
                 })
-                ann_id += 1
+                manifest[filename] = {'image_id': img_id, 'image': image_state, 'label': label_state}
 
-        img_id += 1
-
-    coco_output = {
-        'images': images,
-        'annotations': annotations,
-        'categories': CATEGORIES
-    }
+                if label is None:
+                    print(f'Warning: Label file not found for {filename}')
+                    continue
 
-    with open(OUTPUT_JSON, 'w') as out_file:
-        json.dump(coco_output, out_file, indent=4)
+                old_ids = [ann['id'] for ann in prev_annotations]
+                for i, (category_id, bbox, area) in enumerate(_coco_boxes(label, img_width, img_height)):
+                    if i < len(old_ids):
+                        ann_id = old_ids[i]
+                    else:
+                        ann_id = next_ann_id
+                        next_ann_id += 1
+                    writer.add_annotation({
+                        'id': ann_id,
+                        'image_id': img_id,
+                        'category_id': category_id,
+                        'bbox': bbox,
+                        'area': area,
+                        'iscrowd': 0
+                    })
+            # Drain the scanner so its size cache is saved
+            for _ in scanned:
+                pass
 
+    _write_manifest(manifest)
+    if previous is not None:
+        print(f'Reused {reused} unchanged images, re-read {len(manifest) - reused}')
     print(f'Successfully wrote COCO annotations to {OUTPUT_JSON}')
 
 if __name__ == '__main__':
-    convert()
+    parser = argparse.ArgumentParser(description='Convert YOLO prediction labels to a COCO JSON file')
+    parser.add_argument('--compact', action='store_true', help='write JSON without indentation')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only re-read new or changed images and merge into the existing output')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    convert(workers=args.workers, compact=args.compact, incremental=args.incremental)
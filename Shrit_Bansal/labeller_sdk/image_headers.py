@@ -0,0 +1,109 @@
+import os
+import json
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, arithmetic); not DHT/JPG/DAC
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        # Skip to the next marker, including any 0xFF fill bytes
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0xD9 or marker == 0xDA:  # EOI / start of scan: no frame header found
+            return None
+        if 0xD0 <= marker <= 0xD8 or marker == 0x01:  # standalone markers have no length
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) != 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if marker in SOF_MARKERS:
+            data = f.read(5)
+            if len(data) != 5:
+                return None
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_size(path):
+    """
+    Return (width, height) by reading only the JPEG/PNG header. Falls back to PIL
+    for other formats or headers it cannot parse. Like PIL's img.size, EXIF
+    orientation is not applied.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(24)
+        if head.startswith(PNG_SIGNATURE) and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:2] == b'\xff\xd8':
+            size = _jpeg_size(f)
+            if size is not None:
+                return size
+
+    from PIL import Image
+    with Image.open(path) as img:
+        return img.size
+
+
+class SizeCache:
+    """
+    Image sizes persisted to a JSON file, keyed by absolute path and validated
+    against the file's mtime and byte size so changed images are re-read.
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def get_size(self, path):
+        key = os.path.abspath(path)
+        st = os.stat(path)
+        entry = self._entries.get(key)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[2], entry[3]
+
+        width, height = read_image_size(path)
+        with self._lock:
+            self._entries[key] = [st.st_mtime_ns, st.st_size, width, height]
+            self._dirty = True
+        return width, height
+
+    def save(self):
+        if not self.cache_path or not self._dirty:
+            return
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+
+
+def scan_image_sizes(paths, cache_path=None, workers=None):
+    """Read the sizes of many images concurrently. Returns a list of (width, height) in input order."""
+    cache = SizeCache(cache_path)
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as pool:
+        sizes = list(pool.map(cache.get_size, paths))
+    cache.save()
+    return sizes
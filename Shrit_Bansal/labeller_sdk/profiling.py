@@ -0,0 +1,17 @@
+from contextlib import nullcontext
+
+# Stage timings go through the tracking app's instrumentation (enabled by PIPELINE_PROFILE) when the
+# tracking package is importable, e.g. with PYTHONPATH=video_tracking_demo; otherwise they are no-ops.
+try:
+    from tracking import instrument
+except ImportError:
+    instrument = None
+
+
+def span(name, **args):
+    return instrument.span(name, **args) if instrument is not None else nullcontext()
+
+
+def count(name, value=1):
+    if instrument is not None:
+        instrument.count(name, value)
@@ -0,0 +1,164 @@
+import json
+import time
+import uuid
+import random
+import socket
+import argparse
+import threading
+import email.parser
+import email.policy
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from chunked_upload import UPLOAD_PATH, STATUS_PATH
+
+
+class StubState:
+    """
+    What the stub has received, plus its fault injection: `latency` seconds per
+    upload, a `fail_rate` share of uploads answered with 503, `processing` seconds
+    before a job reports completed, and `fail_after` uploads after which every
+    upload fails (to simulate an outage part-way through a run).
+    """
+
+    def __init__(self, latency=0.0, fail_rate=0.0, processing=0.0, fail_after=None, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.processing = processing
+        self.fail_after = fail_after
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.jobs = {}
+        self.images = set()
+        self.stats = {'connections': 0, 'requests': 0, 'uploads': 0, 'rejected': 0,
+                      'annotations': 0, 'bytes': 0}
+
+    def summary(self):
+        with self.lock:
+            return {**self.stats, 'images': len(self.images)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so clients can reuse connections
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle plus delayed ACKs add ~40ms per reply
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.state.lock:
+            self.server.state.stats['connections'] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _shard(self, body):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f'Content-Type: {self.headers["Content-Type"]}\r\n\r\n'.encode() + body)
+        for part in message.iter_parts():
+            if part.get_param('name', header='content-disposition') == 'file':
+                return json.loads(part.get_payload(decode=True))
+        return None
+
+    def do_POST(self):
+        state = self.server.state
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with state.lock:
+            state.stats['requests'] += 1
+        if url.path != UPLOAD_PATH:
+            return self._reply(404, {'error': 'not found'})
+        if not self.headers.get('api_key'):
+            return self._reply(401, {'error': 'missing api_key'})
+        with state.lock:
+            failing = state.fail_after is not None and state.stats['uploads'] >= state.fail_after
+            if failing or state.random.random() < state.fail_rate:
+                state.stats['rejected'] += 1
+                failing = True
+            else:
+                state.stats['uploads'] += 1
+        if failing:
+            return self._reply(503, {'error': 'unavailable'})
+        time.sleep(state.latency)
+        shard = self._shard(body)
+        if shard is None:
+            return self._reply(400, {'error': 'no file field'})
+
+        job_id = uuid.uuid4().hex
+        with state.lock:
+            state.stats['bytes'] += len(body)
+            state.stats['annotations'] += len(shard['annotations'])
+            state.images.update(image['file_name'] for image in shard['images'])
+            state.jobs[job_id] = time.monotonic() + state.processing
+        self._reply(200, {'response': {'job_id': job_id}})
+
+    def do_GET(self):
+        state = self.server.state
+        url = urlsplit(self.path)
+        with state.lock:
+            state.stats['requests'] += 1
+        if url.path == '/stats':
+            return self._reply(200, state.summary())
+        if url.path != STATUS_PATH:
+            return self._reply(404, {'error': 'not found'})
+        job_id = parse_qs(url.query).get('job_id', [''])[0]
+        with state.lock:
+            ready_at = state.jobs.get(job_id)
+        if ready_at is None:
+            return self._reply(404, {'error': f'unknown job {job_id}'})
+        status = 'completed' if time.monotonic() >= ready_at else 'processing'
+        self._reply(200, {'response': {'status': status}})
+
+
+class StubServer:
+    """A local stand-in for the Labellerr pre-annotation endpoints, served from a background thread."""
+
+    def __init__(self, host='127.0.0.1', port=0, **state_kwargs):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state = StubState(**state_kwargs)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='labellerr-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in for the Labellerr pre-annotation upload API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds spent on each upload')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of uploads answered with 503')
+    parser.add_argument('--processing', type=float, default=0.0, help='seconds before a job completes')
+    parser.add_argument('--fail-after', type=int, default=None, help='reject every upload after this many')
+    args = parser.parse_args()
+    server = StubServer(args.host, args.port, latency=args.latency, fail_rate=args.fail_rate,
+                        processing=args.processing, fail_after=args.fail_after)
+    print(f'Serving on {server.url} (GET /stats for counters)')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(server.state.summary(), indent=2))
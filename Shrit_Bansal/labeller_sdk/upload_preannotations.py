@@ -1,10 +1,11 @@
 import time
-from labellerr.client import LabellerrClient
-from labellerr.exceptions import LabellerrError
+import argparse
 from dotenv import load_dotenv
 import os
+from chunked_upload import (IMAGES_PER_SHARD, MAX_WORKERS, HttpTransport, SdkTransport, UploadError,
+                            upload_sharded)
 
-load_dotenv()  
+load_dotenv()
 
 API_KEY = os.getenv('API_KEY')
 API_SECRET = os.getenv('API_SECRET')
@@ -16,6 +17,10 @@ ANNOTATION_FILE = "./Labeller_Assignment_Dataset/coco_annotations.json"  # Path
 
 
 def upload_annotations():
+    """Upload ANNOTATION_FILE in one SDK call (no retries or resume)."""
+    from labellerr.client import LabellerrClient
+    from labellerr.exceptions import LabellerrError
+
     client = LabellerrClient(API_KEY, API_SECRET)
     try:
         result = client.upload_preannotation_by_project_id(PROJECT_ID, CLIENT_ID, ANNOTATION_FORMAT, ANNOTATION_FILE)
@@ -26,5 +31,41 @@ def upload_annotations():
     except LabellerrError as e:
         print(f"Upload failed: {str(e)}")
 
+def upload_annotations_sharded(images_per_shard=IMAGES_PER_SHARD, workers=MAX_WORKERS, base_url=None):
+    """
+    Upload ANNOTATION_FILE in image-aligned shards on several workers, resuming a
+    previous interrupted run. With `base_url` the shards are posted directly over
+    keep-alive connections (e.g. to stub_server.py); otherwise through the SDK.
+    """
+    if base_url:
+        transport = HttpTransport(API_KEY, API_SECRET, CLIENT_ID, PROJECT_ID, ANNOTATION_FORMAT, base_url=base_url)
+    else:
+        transport = SdkTransport(API_KEY, API_SECRET, CLIENT_ID, PROJECT_ID, ANNOTATION_FORMAT)
+
+    def progress(done, total):
+        print(f"\rShards uploaded: {done}/{total}", end="", flush=True)
+
+    try:
+        summary = upload_sharded(transport, ANNOTATION_FILE, PROJECT_ID, images_per_shard=images_per_shard,
+                                 workers=workers, progress_callback=progress)
+    except UploadError as e:
+        print(f"\nUpload failed: {str(e)}")
+        return None
+    seconds = max(summary['seconds'], 1e-9)
+    print(f"\nUploaded {summary['uploaded']} shards ({summary['images']} images) in {summary['seconds']}s, "
+          f"{summary['images'] / seconds:.1f} images/s, {summary['retries']} retries; "
+          f"{summary['skipped']} shards already uploaded")
+    return summary
+
 if __name__ == '__main__':
-    upload_annotations()
+    parser = argparse.ArgumentParser(description='Upload COCO pre-annotations to a Labellerr project')
+    parser.add_argument('--single', action='store_true', help='upload the whole file in one call')
+    parser.add_argument('--shard-images', type=int, default=IMAGES_PER_SHARD)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--base-url', help='post shards to this endpoint instead of using the SDK '
+                                           '(e.g. http://127.0.0.1:8765 for stub_server.py)')
+    args = parser.parse_args()
+    if args.single:
+        upload_annotations()
+    else:
+        upload_annotations_sharded(args.shard_images, args.workers, args.base_url)
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "video_tracking_demo"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# Trained weights to track with; a randomly initialised model detects nothing, so the
+# tracking comparisons are skipped without them
+WEIGHTS_ENV = "TRACKER_TEST_WEIGHTS"
+
+
+@pytest.fixture(scope="session")
+def synthetic_clip(tmp_path_factory):
+    from synthetic import make_video
+    path = tmp_path_factory.mktemp("clips") / "synthetic.mp4"
+    return make_video(str(path), width=640, height=360, frames=90, objects=6, seed=1)
+
+
+@pytest.fixture(scope="session")
+def weights():
+    if not os.environ.get(WEIGHTS_ENV):
+        pytest.skip(f"set {WEIGHTS_ENV} to trained weights to run the tracking comparisons")
+    return os.environ[WEIGHTS_ENV]
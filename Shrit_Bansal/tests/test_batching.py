@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+pytest.importorskip("ultralytics")
+
+from tracking.byte_tracker import track_video
+
+
+def _objects(json_path):
+    with open(json_path, "r", encoding="utf-8") as f:
+        return [record["objects"] for record in json.load(f)]
+
+
+def test_batched_tracking_matches_unbatched(synthetic_clip, weights, tmp_path):
+    ok, message = track_video(synthetic_clip, str(tmp_path / "serial"), weights, str(tmp_path / "serial.json"))
+    assert ok, message
+    ok, message = track_video(synthetic_clip, str(tmp_path / "batched"), weights, str(tmp_path / "batched.json"),
+                              batch_size=4)
+    assert ok, message
+
+    serial, batched = _objects(tmp_path / "serial.json"), _objects(tmp_path / "batched.json")
+    assert len(serial) == len(batched) == 90
+    assert any(serial), "nothing was tracked, so the comparison would be vacuous"
+    assert serial == batched
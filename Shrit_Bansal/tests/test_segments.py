@@ -0,0 +1,41 @@
+import json
+
+import cv2
+import pytest
+
+pytest.importorskip("ultralytics")
+
+from tracking.byte_tracker import track_video
+from tracking.consistency import id_agreement
+from tracking.segments import _read_range, track_video_segments
+
+MIN_AGREEMENT = 0.9
+
+
+def _records(json_path):
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_last_range_reads_to_end_of_file(synthetic_clip):
+    cap = cv2.VideoCapture(synthetic_clip)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    assert sum(1 for _ in _read_range(synthetic_clip, 60, None)) == total - 60
+    assert sum(1 for _ in _read_range(synthetic_clip, 60, 70)) == 10
+
+
+def test_segment_ids_agree_with_serial_run(synthetic_clip, weights, tmp_path):
+    ok, message = track_video(synthetic_clip, str(tmp_path / "serial"), weights, str(tmp_path / "serial.json"))
+    assert ok, message
+    ok, message = track_video_segments(synthetic_clip, str(tmp_path / "segments"), weights,
+                                       str(tmp_path / "segments.json"), workers=3, overlap=15)
+    assert ok, message
+
+    serial, segmented = _records(tmp_path / "serial.json"), _records(tmp_path / "segments.json")
+    assert [r["frame_id"] for r in segmented] == [r["frame_id"] for r in serial]
+    # id_agreement scores 1.0 when there is nothing to match
+    assert any(r["objects"] for r in serial), "nothing was tracked, so the agreement would be vacuous"
+    report = id_agreement(serial, segmented)
+    assert report["recall"] >= MIN_AGREEMENT
+    assert report["agreement"] >= MIN_AGREEMENT
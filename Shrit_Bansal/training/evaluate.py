@@ -1,10 +1,85 @@
 from ultralytics import YOLO
 import os
+import sys
 import shutil
+import argparse
 import pandas as pd
 import json
+import time
+from ultralytics.data.utils import check_det_dataset
+from fileutils import file_digest
+from sweep import PredictionCache, list_images, read_ground_truth, recommend, sweep
+
+# Exported backends and track_video's thresholds come from the tracking app (PYTHONPATH=../video_tracking_demo)
+from tracking.backends import BACKENDS, exported_task, resolve_weights
+from tracking.byte_tracker import track_params
+
+# Reject a backend whose box mAP50-95 falls more than this below the PyTorch model's
+MAX_MAP_DROP = 0.01
+
+def backend_row(backend, metrics):
+    """Accuracy and per-image latency (Ultralytics' preprocess + inference + postprocess) of one validation run."""
+    latency_ms = sum(metrics.speed.values())
+    return {
+        'Backend': backend,
+        'mAP50': float(metrics.box.map50),
+        'mAP50-95': float(metrics.box.map),
+        'Mask mAP50-95': float(metrics.seg.map) if hasattr(metrics, 'seg') else None,
+        'Inference ms': round(float(metrics.speed['inference']), 2),
+        'Latency ms': round(float(latency_ms), 2),
+        'Images/s': round(1000 / latency_ms, 2) if latency_ms > 0 else 0.0,
+    }
 
-def main():
+def compare_backends(weights_path, data_yaml, backends, baseline, max_map_drop=MAX_MAP_DROP, imgsz=640, batch=1):
+    """
+    Run the same validation for each backend's export of `weights_path` and compare
+    it with `baseline` (the PyTorch row): mAP deltas, speed-up, and whether the
+    backend stays within `max_map_drop` of the baseline's mAP50-95.
+    """
+    rows = [dict(baseline, **{'mAP50 delta': 0.0, 'mAP50-95 delta': 0.0, 'Speed-up': 1.0, 'Accepted': True})]
+    for backend in backends:
+        model_path = resolve_weights(weights_path, backend, imgsz=imgsz, data=data_yaml)
+        print(f"Running model evaluation ({backend}: {model_path}) ...")
+        model = YOLO(model_path, task=exported_task(model_path))
+        row = backend_row(backend, model.val(data=data_yaml, imgsz=imgsz, batch=batch))
+        row['mAP50 delta'] = round(row['mAP50'] - baseline['mAP50'], 4)
+        row['mAP50-95 delta'] = round(row['mAP50-95'] - baseline['mAP50-95'], 4)
+        row['Speed-up'] = round(baseline['Latency ms'] / row['Latency ms'], 2) if row['Latency ms'] > 0 else 0.0
+        row['Accepted'] = row['mAP50-95 delta'] >= -max_map_drop
+        rows.append(row)
+    return rows
+
+def sweep_thresholds(model, weights_path, data_yaml, eval_folder, imgsz=640):
+    """
+    Score every (conf, NMS IoU) pair of the sweep grid on the val split from cached raw
+    predictions (only new or changed images are predicted), save the table and the
+    recommended operating point, and return both.
+    """
+    images = []
+    val = check_det_dataset(data_yaml)['val']
+    for folder in (val if isinstance(val, list) else [val]):
+        images += list_images(folder)
+    cache = PredictionCache(os.path.join(eval_folder, 'prediction_cache'), weights_path, imgsz)
+    predictions = cache.predictions(model, images)
+    ground_truth = [read_ground_truth(path, prediction[0]) for path, prediction in zip(images, predictions)]
+
+    start = time.perf_counter()
+    table = sweep(predictions, ground_truth)
+    print(f"Scored {len(table)} operating points on {len(images)} images in {time.perf_counter() - start:.1f}s")
+    table.to_csv(os.path.join(eval_folder, 'threshold_sweep.csv'), index=False)
+
+    best = recommend(table)
+    # track_video only applies the point to these exact weights, matched by content digest
+    params = track_params(weights=weights_path)
+    current = table[(table['conf'] == params['conf']) & (table['iou'] == params['iou'])]
+    point = {'recommended': best, 'current': current.iloc[0].to_dict() if len(current) else params,
+             'images': len(images), 'weights': os.path.abspath(weights_path),
+             'weights_digest': file_digest(weights_path), 'imgsz': imgsz}
+    with open(os.path.join(eval_folder, 'operating_point.json'), 'w') as f:
+        json.dump(point, f, indent=2)
+    return table, point
+
+def main(backends=(), max_map_drop=MAX_MAP_DROP, imgsz=640, batch=1, threshold_sweep=True):
     # Path to model weights
     weights_path = os.path.join('..', 'Labeller_Assignment_Dataset', 'weights', 'best.pt')
 
@@ -15,7 +90,8 @@ def main():
     data_yaml = os.path.join(os.path.dirname(__file__), 'configs', 'data.yaml')
 
     print("Running model evaluation ...")
-    metrics = model.val(data=data_yaml)
+    # Only pin imgsz/batch when comparing, so the baseline is measured like the exports
+    metrics = model.val(data=data_yaml, imgsz=imgsz, batch=batch) if backends else model.val(data=data_yaml)
 
     print("\n=== Model Performance Metrics ===")
     print(f"mAP50: {metrics.box.map50:.4f}")
@@ -27,13 +103,9 @@ def main():
     eval_folder = os.path.join('..', 'Labeller_Assignment_Dataset', 'evaluation')
     os.makedirs(eval_folder, exist_ok=True)
 
-    # Results run folder (last validation)
-    val_run_path = os.path.join('..', 'runs', 'segment')
-    val_folders = [f for f in os.listdir(val_run_path) if f.startswith('val')]
-
-    if val_folders:
-        latest_val = sorted(val_folders)[-1]
-        val_plots_path = os.path.join(val_run_path, latest_val)
+    # Results run folder of this validation
+    val_plots_path = str(metrics.save_dir)
+    if os.path.isdir(val_plots_path):
         print(f"Copying evaluation plots from: {val_plots_path}")
 
         plot_files = []
@@ -74,6 +146,40 @@ def main():
     print("\n=== Final Metrics Summary ===")
     print(df_metrics.to_string(index=False))
 
+    if threshold_sweep:
+        print("\nSweeping confidence / NMS IoU thresholds ...")
+        _, point = sweep_thresholds(model, weights_path, data_yaml, eval_folder, imgsz)
+        best, current = point['recommended'], point['current']
+        print(f"Recommended operating point: conf={best['conf']}, iou={best['iou']} "
+              f"(F1 {best['f1']:.4f}, mAP50-95 {best['mAP50-95']:.4f})")
+        if 'f1' in current:
+            print(f"track_video currently uses conf={current['conf']}, iou={current['iou']} (F1 {current['f1']:.4f})")
+
+    if not backends:
+        return 0
+    rows = compare_backends(weights_path, data_yaml, backends, backend_row('torch', metrics), max_map_drop,
+                            imgsz, batch)
+    df_backends = pd.DataFrame(rows)
+    df_backends.to_csv(os.path.join(eval_folder, 'backend_comparison.csv'), index=False)
+    with open(os.path.join(eval_folder, 'backend_comparison.json'), 'w') as f:
+        json.dump({'max_map_drop': max_map_drop, 'imgsz': imgsz, 'batch': batch, 'backends': rows}, f, indent=2)
+
+    print(f"\n=== Backend Comparison (max mAP50-95 drop {max_map_drop}) ===")
+    print(df_backends.to_string(index=False))
+    rejected = [row['Backend'] for row in rows if not row['Accepted']]
+    if rejected:
+        print(f"Rejected (accuracy loss over {max_map_drop}): {', '.join(rejected)}")
+    return 1 if rejected else 0
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Validate the trained model and optionally its exported backends")
+    parser.add_argument("--backends", nargs="*", choices=BACKENDS[1:], default=[],
+                        help="also validate these exports against the PyTorch model")
+    parser.add_argument("--max-map-drop", type=float, default=MAX_MAP_DROP,
+                        help="largest acceptable mAP50-95 loss; exits with status 1 if a backend loses more")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch", type=int, default=1, help="validation batch size when comparing backends")
+    parser.add_argument("--no-sweep", action="store_true", help="skip the confidence / NMS IoU threshold sweep")
+    args = parser.parse_args()
+    sys.exit(main(args.backends, args.max_map_drop, args.imgsz, args.batch, not args.no_sweep))
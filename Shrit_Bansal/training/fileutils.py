@@ -0,0 +1,20 @@
+import hashlib
+import os
+
+_digest_cache = {}
+
+
+def file_digest(path, algo='sha256', chunk_size=1 << 20):
+    """
+    Hex digest of a file's contents, read in chunks. Memoized per (path, size, mtime),
+    so rebuilding the image cache or re-running a sweep does not hash unchanged files again.
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns, algo)
+    if key not in _digest_cache:
+        h = hashlib.new(algo)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                h.update(block)
+        _digest_cache[key] = h.hexdigest()
+    return _digest_cache[key]
@@ -0,0 +1,154 @@
+import os
+import math
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from fileutils import file_digest
+
+CHUNK_SIZE = 64  # images decoded at a time while (re)building, so memory stays bounded
+
+
+def resize_like_ultralytics(im, imgsz):
+    """Long side to `imgsz`, keeping the aspect ratio (BaseDataset.load_image with rect_mode=True)."""
+    h0, w0 = im.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+    return im
+
+
+def _decode(path, imgsz):
+    im = cv2.imread(path, cv2.IMREAD_COLOR)
+    if im is None:
+        raise FileNotFoundError(f"Could not decode training image {path}")
+    return im.shape[:2], np.ascontiguousarray(resize_like_ultralytics(im, imgsz))
+
+
+class ImageStore:
+    """
+    A split's images decoded and resized once into a flat, memory-mapped uint8 file
+    (images.u8) under `cache_dir`, with an index (index.npz) of each image's source
+    path, mtime, size and content hash, original and stored shape and byte offset.
+    Labels are left to Ultralytics' own label cache.
+
+    update() re-decodes only images whose contents changed (a changed mtime with the
+    same hash just refreshes the index) and writes a new store next to the old one
+    before renaming it into place. The mapping is opened lazily, so the store can be
+    pickled to DataLoader workers, which then share the OS page cache.
+    """
+
+    def __init__(self, cache_dir, imgsz=640):
+        self.cache_dir = cache_dir
+        self.imgsz = imgsz
+        self.data_path = os.path.join(cache_dir, 'images.u8')
+        self.index_path = os.path.join(cache_dir, 'index.npz')
+        self.index = None
+        self._rows = {}
+        self._data = None
+        if os.path.exists(self.index_path) and os.path.exists(self.data_path):
+            with np.load(self.index_path, allow_pickle=False) as npz:
+                self._set_index({name: npz[name] for name in npz.files})
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_data'] = None
+        return state
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _set_index(self, index):
+        if int(index['imgsz']) != self.imgsz:
+            return
+        self.index = index
+        self._rows = {path: i for i, path in enumerate(index['files'].tolist())}
+        self._data = None
+
+    def _source_states(self, files):
+        """Per file: (mtime_ns, size, hash); the hash is only computed when mtime or size changed."""
+        states = []
+        for path in files:
+            st = os.stat(path)
+            row = self._rows.get(path)
+            if row is not None and (int(self.index['mtimes'][row]), int(self.index['sizes'][row])) == \
+                    (st.st_mtime_ns, st.st_size):
+                states.append((st.st_mtime_ns, st.st_size, str(self.index['hashes'][row])))
+            else:
+                states.append((st.st_mtime_ns, st.st_size, file_digest(path)))
+        return states
+
+    def update(self, files, workers=None):
+        """
+        Make the store hold exactly `files` (absolute paths, in order), decoding new or
+        changed images with `workers` threads. Returns the number of images decoded.
+        """
+        files = [os.path.abspath(f) for f in files]
+        states = self._source_states(files)
+        # Row of the old store to copy each image from, or None to decode it again
+        reuse = []
+        for path, (_, _, digest) in zip(files, states):
+            row = self._rows.get(path)
+            reuse.append(row if row is not None and str(self.index['hashes'][row]) == digest else None)
+        stale = [i for i, row in enumerate(reuse) if row is None]
+        unchanged = not stale and self.index is not None and self.index['files'].tolist() == files
+
+        index = {
+            'imgsz': np.int32(self.imgsz),
+            'files': np.asarray(files, dtype=str),
+            'mtimes': np.asarray([s[0] for s in states], dtype=np.int64),
+            'sizes': np.asarray([s[1] for s in states], dtype=np.int64),
+            'hashes': np.asarray([s[2] for s in states], dtype=str),
+        }
+        if unchanged:
+            index.update(orig_shapes=self.index['orig_shapes'], shapes=self.index['shapes'],
+                         offsets=self.index['offsets'])
+        else:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            old = self._open() if self.index is not None else None
+            orig_shapes = np.zeros((len(files), 2), dtype=np.int32)
+            shapes = np.zeros((len(files), 2), dtype=np.int32)
+            offsets = np.zeros(len(files) + 1, dtype=np.int64)
+            tmp_path = f'{self.data_path}.tmp'
+            with open(tmp_path, 'wb') as out, ThreadPoolExecutor(max_workers=workers) as pool:
+                for start in range(0, len(files), CHUNK_SIZE):
+                    chunk = range(start, min(start + CHUNK_SIZE, len(files)))
+                    todo = [i for i in chunk if reuse[i] is None]
+                    decoded = dict(zip(todo, pool.map(lambda i: _decode(files[i], self.imgsz), todo)))
+                    for i in chunk:
+                        if reuse[i] is None:
+                            orig_shapes[i], im = decoded[i]
+                            shapes[i] = im.shape[:2]
+                            out.write(im.tobytes())
+                        else:
+                            row = reuse[i]
+                            orig_shapes[i], shapes[i] = self.index['orig_shapes'][row], self.index['shapes'][row]
+                            out.write(old[self.index['offsets'][row]:self.index['offsets'][row + 1]].tobytes())
+                        offsets[i + 1] = offsets[i] + int(shapes[i].prod()) * 3
+            index.update(orig_shapes=orig_shapes, shapes=shapes, offsets=offsets)
+            self._data = old = None
+            os.replace(tmp_path, self.data_path)
+
+        tmp_index = f'{self.index_path}.tmp.npz'
+        np.savez(tmp_index, **index)
+        os.replace(tmp_index, self.index_path)
+        self._set_index(index)
+        return len(stale)
+
+    def _open(self):
+        if self._data is None:
+            # np.memmap cannot map an empty file, which is what a store of no images is
+            if os.path.getsize(self.data_path) == 0:
+                self._data = np.zeros(0, dtype=np.uint8)
+            else:
+                self._data = np.memmap(self.data_path, dtype=np.uint8, mode='r')
+        return self._data
+
+    def get(self, path):
+        """(image, (h0, w0)) as stored for `path` (a read-only view into the mapping), or None."""
+        row = self._rows.get(os.path.abspath(path))
+        if row is None:
+            return None
+        start, end = self.index['offsets'][row], self.index['offsets'][row + 1]
+        h, w = self.index['shapes'][row]
+        return self._open()[start:end].reshape(h, w, 3), tuple(int(v) for v in self.index['orig_shapes'][row])
@@ -0,0 +1,225 @@
+import os
+import numpy as np
+import pandas as pd
+from fileutils import file_digest
+
+CONF_GRID = np.round(np.arange(0.05, 0.951, 0.05), 2)
+NMS_IOU_GRID = np.round(np.arange(0.3, 0.901, 0.1), 2)
+MATCH_IOUS = np.linspace(0.5, 0.95, 10)  # mAP50-95 thresholds, as in COCO/Ultralytics
+CONF_FLOOR = 0.001                       # lowest confidence kept in the cache (Ultralytics' val default)
+MAX_DET = 300
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff'}
+
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+
+def list_images(folder):
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS)
+
+
+class PredictionCache:
+    """
+    Raw predictions of one model, one .npz per (weights hash, imgsz) under `cache_dir`,
+    keyed per image by content hash so only new or changed images are predicted
+    again. Predictions are kept down to CONF_FLOOR and with NMS effectively off
+    (iou=1.0), so any confidence / NMS IoU pair can be applied afterwards.
+    """
+
+    def __init__(self, cache_dir, weights, imgsz=640):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.imgsz = imgsz
+        self.path = os.path.join(cache_dir, f'{file_digest(weights)[:16]}-{imgsz}.npz')
+        self.entries = {}
+        if os.path.exists(self.path):
+            with np.load(self.path, allow_pickle=False) as npz:
+                ends = np.cumsum(npz['counts']).tolist()
+                start = 0
+                for key, shape, end in zip(npz['keys'].tolist(), npz['shapes'], ends):
+                    self.entries[key] = (tuple(int(v) for v in shape), npz['boxes'][start:end],
+                                         npz['conf'][start:end], npz['cls'][start:end])
+                    start = end
+
+    def save(self):
+        keys = sorted(self.entries)
+        rows = [self.entries[k] for k in keys]
+        tmp_path = f'{self.path}.tmp.npz'
+        np.savez_compressed(
+            tmp_path,
+            keys=np.asarray(keys, dtype=str),
+            shapes=np.asarray([r[0] for r in rows], dtype=np.int32).reshape(-1, 2),
+            counts=np.asarray([len(r[2]) for r in rows], dtype=np.int32),
+            boxes=np.concatenate([r[1] for r in rows]).reshape(-1, 4) if rows else np.zeros((0, 4), np.float32),
+            conf=np.concatenate([r[2] for r in rows]) if rows else np.zeros(0, np.float32),
+            cls=np.concatenate([r[3] for r in rows]) if rows else np.zeros(0, np.int16),
+        )
+        os.replace(tmp_path, self.path)
+
+    def predictions(self, model, image_paths, batch=16):
+        """(shape, xyxy, conf, cls) for every image, predicting only those not cached yet."""
+        keys = [file_digest(p) for p in image_paths]
+        missing = [p for p, k in zip(image_paths, keys) if k not in self.entries]
+        if missing:
+            print(f"Predicting {len(missing)} of {len(image_paths)} images (the rest are cached) ...")
+            digests = dict(zip(image_paths, keys))
+            results = model.predict(source=missing, conf=CONF_FLOOR, iou=1.0, max_det=MAX_DET, imgsz=self.imgsz,
+                                    batch=batch, stream=True, verbose=False)
+            for path, result in zip(missing, results):
+                boxes = result.boxes
+                self.entries[digests[path]] = (tuple(result.orig_shape), boxes.xyxy.cpu().numpy().astype(np.float32),
+                                               boxes.conf.cpu().numpy().astype(np.float32),
+                                               boxes.cls.cpu().numpy().astype(np.int16))
+            self.save()
+        return [self.entries[k] for k in keys]
+
+
+def label_path(image_path):
+    # Ultralytics layout: .../images/<split>/x.jpg -> .../labels/<split>/x.txt
+    sa, sb = f'{os.sep}images{os.sep}', f'{os.sep}labels{os.sep}'
+    return sb.join(image_path.rsplit(sa, 1)).rsplit('.', 1)[0] + '.txt'
+
+
+def read_ground_truth(image_path, shape):
+    """(xyxy in pixels, cls) from a YOLO box or polygon (segmentation) label file."""
+    h, w = shape
+    boxes, classes = [], []
+    if os.path.exists(label_path(image_path)):
+        with open(label_path(image_path), 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 5:
+                    continue
+                values = np.asarray(parts[1:], dtype=np.float64)
+                if len(values) == 4:
+                    x, y, bw, bh = values
+                    box = [x - bw / 2, y - bh / 2, x + bw / 2, y + bh / 2]
+                else:
+                    xs, ys = values[0::2], values[1::2]
+                    box = [xs.min(), ys.min(), xs.max(), ys.max()]
+                boxes.append(box)
+                classes.append(int(parts[0]))
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4) * [w, h, w, h]
+    return boxes, np.asarray(classes, dtype=np.int16)
+
+
+def box_iou(a, b):
+    """Pairwise IoU of two (n, 4) / (m, 4) xyxy arrays."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def nms_keep(boxes, conf, cls, iou_grid):
+    """
+    Class-aware greedy NMS for every threshold in `iou_grid` at once: a (n, len(iou_grid))
+    mask of kept boxes, in the input order. A box's fate depends only on the boxes
+    scoring above it, so NMS first and confidence filtering later gives the same
+    result as Ultralytics' filter-then-NMS.
+    """
+    n = len(conf)
+    keep = np.zeros((n, len(iou_grid)), dtype=bool)
+    if not n:
+        return keep
+    order = np.argsort(-conf, kind='stable')
+    iou = box_iou(boxes[order], boxes[order])
+    iou[cls[order][:, None] != cls[order][None, :]] = 0.0
+    sorted_keep = np.zeros_like(keep)
+    for i in range(n):
+        sorted_keep[i] = ~(sorted_keep[:i] & (iou[:i, i, None] > iou_grid)).any(0)
+    keep[order] = sorted_keep
+    return keep
+
+
+def match_detections(det_boxes, det_cls, gt_boxes, gt_cls):
+    """(n_det, len(MATCH_IOUS)) true-positive mask, one-to-one by descending IoU (as Ultralytics' validator)."""
+    tp = np.zeros((len(det_cls), len(MATCH_IOUS)), dtype=bool)
+    if not len(det_cls) or not len(gt_cls):
+        return tp
+    iou = box_iou(gt_boxes, det_boxes)
+    iou = iou * (gt_cls[:, None] == det_cls[None, :])
+    for j, threshold in enumerate(MATCH_IOUS):
+        gi, di = np.nonzero(iou >= threshold)
+        if not len(gi):
+            continue
+        order = np.argsort(-iou[gi, di], kind='stable')
+        gi, di = gi[order], di[order]
+        _, first = np.unique(di, return_index=True)
+        gi, di = gi[first], di[first]
+        order = np.argsort(-iou[gi, di], kind='stable')
+        gi, di = gi[order], di[order]
+        _, first = np.unique(gi, return_index=True)
+        tp[di[first], j] = True
+    return tp
+
+
+def average_precision(recall, precision):
+    """101-point interpolated AP (COCO / Ultralytics 'interp')."""
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    return _trapezoid(np.interp(x, mrec, mpre), x)
+
+
+def sweep(predictions, ground_truth, conf_grid=CONF_GRID, iou_grid=NMS_IOU_GRID):
+    """
+    Precision, recall, F1, mAP50 and mAP50-95 (class means, like Ultralytics' mp/mr/map)
+    for every (conf, NMS IoU) pair, from cached `predictions` and `ground_truth`
+    ((xyxy, cls) per image). Returns one row per pair.
+    """
+    gt_cls = np.concatenate([cls for _, cls in ground_truth]) if ground_truth else np.zeros(0, np.int16)
+    classes, n_gt = np.unique(gt_cls, return_counts=True)
+    rows = []
+    keeps = [nms_keep(boxes, conf, cls, iou_grid) for _, boxes, conf, cls in predictions]
+    for t, nms_iou in enumerate(iou_grid):
+        conf_all, cls_all, tp_all = [], [], []
+        for (_, boxes, conf, cls), (gt_boxes, gt_c), keep in zip(predictions, ground_truth, keeps):
+            k = keep[:, t]
+            conf_all.append(conf[k])
+            cls_all.append(cls[k])
+            tp_all.append(match_detections(boxes[k], cls[k], gt_boxes, gt_c))
+        conf_all = np.concatenate(conf_all) if conf_all else np.zeros(0, np.float32)
+        cls_all = np.concatenate(cls_all) if cls_all else np.zeros(0, np.int16)
+        tp_all = np.concatenate(tp_all) if tp_all else np.zeros((0, len(MATCH_IOUS)), bool)
+
+        # Per class: detections by descending confidence and their cumulative TP/FP counts
+        per_class = []
+        for c, n in zip(classes, n_gt):
+            mask = cls_all == c
+            order = np.argsort(-conf_all[mask], kind='stable')
+            tp = tp_all[mask][order]
+            tpc = np.cumsum(tp, axis=0)
+            fpc = np.cumsum(~tp, axis=0)
+            per_class.append((-conf_all[mask][order], tpc, fpc, n))
+
+        for conf in conf_grid:
+            p, r, ap50, ap = [], [], [], []
+            for neg_conf, tpc, fpc, n in per_class:
+                k = int(np.searchsorted(neg_conf, -conf, side='right'))  # detections with conf >= threshold
+                aps = np.zeros(len(MATCH_IOUS))
+                precision = recall = np.zeros((1, len(MATCH_IOUS)))
+                if k:
+                    recall = tpc[:k] / n
+                    precision = tpc[:k] / (tpc[:k] + fpc[:k])
+                    aps = np.array([average_precision(recall[:, j], precision[:, j]) for j in range(len(MATCH_IOUS))])
+                p.append(precision[-1, 0])
+                r.append(recall[-1, 0])
+                ap50.append(aps[0])
+                ap.append(aps.mean())
+            mp, mr = float(np.mean(p)) if p else 0.0, float(np.mean(r)) if r else 0.0
+            rows.append({
+                'conf': float(conf), 'iou': float(nms_iou),
+                'precision': round(mp, 4), 'recall': round(mr, 4),
+                'f1': round(2 * mp * mr / (mp + mr), 4) if mp + mr > 0 else 0.0,
+                'mAP50': round(float(np.mean(ap50)) if ap50 else 0.0, 4),
+                'mAP50-95': round(float(np.mean(ap)) if ap else 0.0, 4),
+            })
+    return pd.DataFrame(rows)
+
+
+def recommend(table):
+    """The row with the best F1, ties going to the higher mAP50-95 and then the higher conf (fewer boxes to track)."""
+    ranked = table.sort_values(['f1', 'mAP50-95', 'conf'], ascending=False, kind='stable')
+    return ranked.iloc[0].to_dict()
@@ -1,19 +1,171 @@
 import os
+import json
+import time
 import shutil
+import argparse
+import numpy as np
 from ultralytics import YOLO
+from ultralytics.data import YOLODataset
+from ultralytics.models.yolo.segment import SegmentationTrainer
+from image_store import ImageStore
 
-def main():
-    data_yaml = os.path.join(os.path.dirname(__file__), "configs", "data.yaml")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_YAML = os.path.join(os.path.dirname(os.path.abspath(__file__)), "configs", "data.yaml")
+# Decoded images per split and imgsz, rebuilt only for images that changed
+IMAGE_CACHE_DIR = os.path.join(ROOT, "Labeller_Assignment_Dataset", "image_cache")
+
+
+class MmapYOLODataset(YOLODataset):
+    """YOLODataset that takes decoded images from an ImageStore instead of decoding the JPEGs every epoch."""
+
+    image_store = None
+
+    def load_image(self, i, rect_mode=True):
+        cached = None
+        if self.ims[i] is None and rect_mode and self.image_store is not None:
+            cached = self.image_store.get(self.im_files[i])
+        if cached is None:
+            return super().load_image(i, rect_mode)
+        im, hw0 = cached
+        im = np.array(im)  # the mapping is read-only and augmentations work in place
+
+        # Same mosaic buffer bookkeeping as BaseDataset.load_image
+        if self.augment:
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, hw0, im.shape[:2]
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                if self.cache != "ram":
+                    self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return im, hw0, im.shape[:2]
+
+
+class MmapSegmentationTrainer(SegmentationTrainer):
+    """SegmentationTrainer whose datasets read from a per-split ImageStore, refreshed before each run."""
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        dataset = super().build_dataset(img_path, mode, batch)
+        store = ImageStore(os.path.join(IMAGE_CACHE_DIR, f"{mode}-{self.args.imgsz}"), self.args.imgsz)
+        start = time.perf_counter()
+        decoded = store.update(dataset.im_files, workers=self.args.workers or None)
+        print(f"{mode}: image cache at {store.cache_dir} holds {len(store)} images "
+              f"({decoded} decoded in {time.perf_counter() - start:.1f}s)")
+        # Keep Ultralytics' own dataset construction and only swap in the mmap-backed image loading
+        dataset.__class__ = MmapYOLODataset
+        dataset.image_store = store
+        return dataset
+
+
+class LoaderTimer:
+    """
+    Trainer callbacks that record each training epoch's wall time (without validation)
+    and loader stall: the time the training loop waited for the next batch after
+    finishing the previous one.
+    """
+
+    def __init__(self):
+        self.epochs = []
+        self._epoch_start = self._last = 0.0
+        self._stall = 0.0
+        self._batches = 0
+
+    def attach(self, model):
+        model.add_callback("on_train_epoch_start", self.on_epoch_start)
+        model.add_callback("on_train_batch_start", self.on_batch_start)
+        model.add_callback("on_train_batch_end", self.on_batch_end)
+        model.add_callback("on_train_epoch_end", self.on_epoch_end)
+
+    def on_epoch_start(self, trainer):
+        self._epoch_start = self._last = time.perf_counter()
+        self._stall, self._batches = 0.0, 0
+
+    def on_batch_start(self, trainer):
+        self._stall += time.perf_counter() - self._last
+        self._batches += 1
+
+    def on_batch_end(self, trainer):
+        self._last = time.perf_counter()
+
+    def on_epoch_end(self, trainer):
+        seconds = time.perf_counter() - self._epoch_start
+        self.epochs.append({
+            "epoch": trainer.epoch + 1,
+            "epoch_s": round(seconds, 2),
+            "stall_s": round(self._stall, 2),
+            "stall_pct": round(100 * self._stall / seconds, 1) if seconds > 0 else 0.0,
+            "batches": self._batches,
+        })
+        print(f"Epoch {trainer.epoch + 1}: {seconds:.1f}s, waited {self._stall:.1f}s for the data loader "
+              f"({self.epochs[-1]['stall_pct']}%)")
+
+    def summary(self) -> dict:
+        if not self.epochs:
+            return {}
+        return {
+            "epochs": len(self.epochs),
+            "mean_epoch_s": round(float(np.mean([e["epoch_s"] for e in self.epochs])), 2),
+            "mean_stall_s": round(float(np.mean([e["stall_s"] for e in self.epochs])), 2),
+            "stall_pct": round(100 * sum(e["stall_s"] for e in self.epochs) / sum(e["epoch_s"] for e in self.epochs), 1),
+        }
+
+
+def train(epochs=100, image_cache=True, workers=8, **kwargs):
+    """Fine-tune yolov8s-seg on data.yaml; returns the model and its LoaderTimer."""
     model = YOLO("yolov8s-seg.pt")
+    timer = LoaderTimer()
+    timer.attach(model)
+    if image_cache:
+        kwargs["trainer"] = MmapSegmentationTrainer
+    model.train(data=DATA_YAML, epochs=epochs, imgsz=640, batch=8, workers=workers, **kwargs)
+    with open(os.path.join(model.trainer.save_dir, "loader_stats.json"), "w") as f:
+        json.dump({"image_cache": image_cache, "workers": workers, **timer.summary(), "per_epoch": timer.epochs}, f,
+                  indent=2)
+    return model, timer
+
+
+def compare_loaders(epochs, workers):
+    """Train `epochs` epochs with and without the image cache and report epoch time and loader stall."""
+    rows = []
+    for image_cache in (False, True):
+        _, timer = train(epochs, image_cache, workers, project=os.path.join(ROOT, "runs", "loader_compare"),
+                         name="image_cache" if image_cache else "jpeg", exist_ok=True, val=False, plots=False)
+        rows.append({"loader": "image cache" if image_cache else "JPEG decode", **timer.summary()})
+    if rows[0].get("mean_epoch_s") and rows[1].get("mean_epoch_s"):
+        rows[1]["speedup"] = round(rows[0]["mean_epoch_s"] / rows[1]["mean_epoch_s"], 2)
+    report_path = os.path.join(ROOT, "runs", "loader_compare", "loader_report.json")
+    with open(report_path, "w") as f:
+        json.dump({"workers": workers, "loaders": rows}, f, indent=2)
+
+    print("\n=== Data loader comparison ===")
+    for row in rows:
+        print(f"{row['loader']:<12} epoch {row.get('mean_epoch_s', '-')}s, loader stall {row.get('mean_stall_s', '-')}s "
+              f"({row.get('stall_pct', '-')}%)" + (f", {row['speedup']}x faster" if "speedup" in row else ""))
+    print(f"Report saved to {report_path}")
+
 
-    model.train(data=data_yaml, epochs=100, imgsz=640, batch=8)
+def main(epochs=100, image_cache=True, workers=8):
+    model, timer = train(epochs, image_cache, workers)
+    summary = timer.summary()
+    if summary:
+        print(f"Mean epoch {summary['mean_epoch_s']}s, loader stall {summary['mean_stall_s']}s ({summary['stall_pct']}%)")
 
-    src_weights = os.path.join(os.path.dirname(os.path.dirname(__file__)), "runs", "segment", "train2", "weights", "best.pt")
-    dest_weights = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Labeller_Assignment_Dataset", "weights", "best.pt")
+    src_weights = str(model.trainer.best)
+    dest_weights = os.path.join(ROOT, "Labeller_Assignment_Dataset", "weights", "best.pt")
 
     shutil.copy(src_weights, dest_weights)
     print(f"Model weights copied to {dest_weights}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Fine-tune yolov8s-seg on configs/data.yaml")
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8, help="data loader worker processes")
+    parser.add_argument("--no-image-cache", action="store_true",
+                        help="decode the JPEGs every epoch instead of reading the memory-mapped image cache")
+    parser.add_argument("--compare-loaders", type=int, metavar="EPOCHS", default=0,
+                        help="only train EPOCHS epochs with and without the image cache and compare them")
+    args = parser.parse_args()
+    if args.compare_loaders:
+        compare_loaders(args.compare_loaders, args.workers)
+    else:
+        main(args.epochs, not args.no_image_cache, args.workers)
@@ -1,15 +1,49 @@
 import os
 import json
-import shutil
-import tempfile
+import time
+import pandas as pd
 import streamlit as st
 from pathlib import Path
-from tracking.byte_tracker import track_video
+from tracking.artifacts import ArtifactServer, ArtifactStore
+from tracking.fileutils import format_bytes
+from tracking.analytics import analytics_path, build_analytics, load_analytics
+from tracking.backends import BACKENDS
+from tracking.instrument import METRICS_NAME, SUMMARY_NAME, TRACE_NAME
+from tracking.jobs import JobScheduler, RUNNING, DONE, CANCELLED
+from tracking.live import DEFAULT_MAX_LATENCY, LiveTracker
 
 st.set_page_config(page_title="Vehicle & Pedestrian Tracker", page_icon="🚦", layout="wide")
 st.title("🚦 Vehicle and Pedestrian Tracking with YOLOv8 & ByteTrack")
 
 MODEL_WEIGHTS_PATH = "Shrit_Bansal/video_tracking_demo/model/yolo-seg.pt"
+# Inference backend preselected in the sidebar (see tracking/backends.py)
+DEFAULT_BACKEND = os.getenv("TRACKER_BACKEND", "torch")
+# Larger files are only read into memory for st.download_button once the user asks for them
+INLINE_DOWNLOAD_BYTES = 64 * 1024 ** 2
+
+@st.cache_resource
+def get_store():
+    # Uploads and job outputs, shared by all sessions; ARTIFACT_QUOTA_GB / ARTIFACT_TTL_HOURS bound its size
+    store = ArtifactStore(os.getenv("ARTIFACT_DIR"),
+                          max_bytes=int(float(os.getenv("ARTIFACT_QUOTA_GB", "20")) * 1024 ** 3),
+                          ttl=float(os.getenv("ARTIFACT_TTL_HOURS", "168")) * 3600)
+    store.prune()
+    return store
+
+@st.cache_resource
+def get_artifact_server():
+    # Optional side server that streams downloads from disk; ARTIFACT_PUBLIC_URL if behind a proxy.
+    # It has no authentication, so it stays on localhost unless ARTIFACT_HOST (e.g. 0.0.0.0) opts in
+    port = os.getenv("ARTIFACT_PORT")
+    if not port:
+        return None
+    return ArtifactServer(host=os.getenv("ARTIFACT_HOST", "127.0.0.1"), port=int(port),
+                          public_url=os.getenv("ARTIFACT_PUBLIC_URL"))
+
+@st.cache_resource
+def get_scheduler():
+    # One scheduler per server process, shared by all sessions
+    return JobScheduler(workers=int(os.getenv("TRACKER_WORKERS", "1")), cache_dir=str(get_store().jobs_dir))
 
 def upload_controls():
     with st.sidebar:
@@ -19,42 +53,136 @@ def upload_controls():
             type=["mp4", "mov", "avi", "mkv"],
             help="Drag & drop or browse a video file to track",
         )
+        draw_masks = st.checkbox("Draw segmentation masks", value=False)
+        backend = st.selectbox(
+            "Inference backend",
+            BACKENDS,
+            index=BACKENDS.index(DEFAULT_BACKEND) if DEFAULT_BACKEND in BACKENDS else 0,
+            help="ONNX Runtime/OpenVINO exports (INT8 ones calibrated on the val set) run faster on CPU; "
+                 "the first run of a backend exports the model",
+        )
+        realtime = st.checkbox(
+            "Real-time mode",
+            value=False,
+            help="Detect only every few frames (and at a smaller size if needed) to keep up with the target fps",
+        )
+        target_fps = st.number_input("Target fps (0 = video fps)", min_value=0.0, value=0.0, step=5.0,
+                                     disabled=not realtime)
+        profile = st.checkbox("Profile stages", value=False,
+                              help="Time decode, inference, tracking, drawing and encoding for this run")
         run_btn = st.button("🎯 Start Tracking", type="primary", use_container_width=True)
-    return uploaded_file, run_btn
+    options = {"draw_masks": draw_masks}
+    if backend != "torch":
+        options["backend"] = backend
+    if realtime:
+        options.update(realtime=True, target_fps=target_fps or None)
+    if profile:
+        options["profile"] = True
+    return uploaded_file, run_btn, options
+
+def live_controls():
+    with st.sidebar.expander("Live stream"):
+        source = st.text_input("Source", value="",
+                               help="Camera index (e.g. 0) or stream URL; leave empty to replay the uploaded "
+                                    "video in a loop at its own fps")
+        max_latency = st.slider("Max latency (s)", min_value=0.1, max_value=2.0, value=DEFAULT_MAX_LATENCY,
+                                step=0.1, help="Older frames are dropped to keep results within this delay")
+        duration = st.number_input("Duration (s, 0 = until stopped)", min_value=0.0, value=0.0, step=10.0)
+        start = st.button("📡 Start Live Preview", use_container_width=True)
+    return source.strip(), max_latency, duration, start
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def get_analytics(results_json_path, mtime_ns):
+    # Keyed on the mtime too, so a rewritten results file is re-indexed
+    index_path = analytics_path(results_json_path)
+    if os.path.exists(index_path):
+        return load_analytics(index_path)
+    return build_analytics(results_json_path)
 
 def show_analytics():
     st.subheader("Summary")
     results_json_path = st.session_state.get("results_json_path")
     if results_json_path and os.path.exists(results_json_path):
-        with open(results_json_path, "r", encoding="utf-8") as f:
-            results_data = json.load(f)
-        all_objects = [obj for frame in results_data for obj in frame.get("objects", [])]
-        if not all_objects:
+        index = get_analytics(results_json_path, os.stat(results_json_path).st_mtime_ns)
+        if not index.total_objects:
             st.info("No objects were detected in this video.")
             return
-        unique_objects = len({obj.get("id") for obj in all_objects})
-        frames_processed = len(results_data)
-        c1, c2 = st.columns(2)
-        c1.metric("Unique Objects", unique_objects)   # KPI widget [docs]
-        c2.metric("Frames", frames_processed)         # KPI widget [docs]
+        by_class = index.tracks_by_class()
+        dwell = index.dwell()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Unique Objects", index.unique_objects)   # KPI widget [docs]
+        c2.metric("Frames", index.frames)                   # KPI widget [docs]
+        c3.metric("Vehicles / Pedestrians", f"{by_class.get('vehicle', 0)} / {by_class.get('pedestrian', 0)}")
+        c4.metric("Median dwell", f"{float(pd.Series(dwell).median()):.1f}{'s' if index.fps else ' frames'}")
+
+        left, right = st.columns(2)
+        with left:
+            st.caption("Objects per frame")
+            st.line_chart(pd.DataFrame(index.objects_per_frame(), index=index.frame_ids))
+        with right:
+            st.caption("Track length (frames seen)")
+            counts, edges = index.track_length_histogram()
+            labels = [f"{int(lo)}-{int(hi)}" for lo, hi in zip(edges[:-1], edges[1:])]
+            st.bar_chart(pd.DataFrame({"tracks": counts}, index=pd.CategoricalIndex(labels, categories=labels)))
     else:
         st.info("Run tracking to see analytics.")
 
 
+def show_profile():
+    profile_path = st.session_state.get("profile_path")
+    if not profile_path or not os.path.exists(os.path.join(profile_path, SUMMARY_NAME)):
+        return
+    st.subheader("Stage Profile")
+    with open(os.path.join(profile_path, SUMMARY_NAME), "r", encoding="utf-8") as f:
+        summary = json.load(f)
+    stages = pd.DataFrame.from_dict(summary["stages"], orient="index")
+    if stages.empty:
+        st.info("No stages were recorded for this run.")
+        return
+    st.caption(f"Wall time {summary['wall_s']:.2f}s; stages can overlap when rendering runs in parallel")
+    left, right = st.columns(2)
+    with left:
+        st.bar_chart(stages["total_s"])
+    with right:
+        st.dataframe(stages, use_container_width=True)
+    c1, c2 = st.columns(2)
+    with c1:
+        download_control("Download Trace (chrome://tracing)", os.path.join(profile_path, TRACE_NAME),
+                         "trace.json", "application/json")
+    with c2:
+        download_control("Download Metrics (Prometheus)", os.path.join(profile_path, METRICS_NAME),
+                         "metrics.prom", "text/plain")
+
+def download_control(label, path, file_name, mime):
+    """
+    A download for a stored file without holding it in memory on every rerun: a link to
+    the streaming artifact server when one runs, otherwise st.download_button, which
+    reads the whole file, so files above INLINE_DOWNLOAD_BYTES are only read on request.
+    """
+    get_store().touch(path)
+    server = get_artifact_server()
+    if server is not None:
+        st.link_button(label, server.url_for(path, file_name), use_container_width=True)
+        return
+    size = os.path.getsize(path)
+    prepared = st.session_state.setdefault("prepared_downloads", set())
+    if size > INLINE_DOWNLOAD_BYTES and path not in prepared:
+        if st.button(f"📦 Prepare {file_name} ({format_bytes(size)})", key=f"prepare-{path}",
+                     use_container_width=True):
+            prepared.add(path)
+            st.rerun()
+        return
+    with open(path, "rb") as f:
+        st.download_button(label, data=f, file_name=file_name, mime=mime, use_container_width=True)
+
 def show_downloads():
     st.subheader("Download Results")
 
     # JSON download
     results_json_path = st.session_state.get("results_json_path")
     if results_json_path and os.path.exists(results_json_path):
-        with open(results_json_path, "rb") as jf:
-            st.download_button(
-                "Download Tracking Results (JSON)",
-                data=jf,
-                file_name="tracking_results.json",
-                mime="application/json",
-                use_container_width=True,
-            )
+        download_control("Download Tracking Results (JSON)", results_json_path, "tracking_results.json",
+                         "application/json")
     else:
         st.info("Run tracking to generate and download results JSON.")
 
@@ -63,27 +191,70 @@ def show_downloads():
     if output_video_path and os.path.exists(output_video_path):
         suffix = Path(output_video_path).suffix.lower()
         mime = "video/mp4" if suffix == ".mp4" else "video/x-msvideo"
-        with open(output_video_path, "rb") as vf:
-            st.download_button(
-                "Download Tracked Video",
-                data=vf,
-                file_name=f"tracked_output{suffix}",
-                mime=mime,
-                use_container_width=True,
-            )
+        download_control("Download Tracked Video", output_video_path, f"tracked_output{suffix}", mime)
     else:
         st.info("Run tracking to generate and download tracked video.")
 
-def _resolve_actual_output(base_output_path: str, tmp_dir: str) -> str | None:
-    base = Path(base_output_path)
-    for p in (base.with_suffix(".mp4"), base.with_suffix(".avi")):
-        if p.exists():
-            return str(p)
-    stem = base.with_suffix("").name
-    for p in Path(tmp_dir).iterdir():
-        if p.is_file() and p.name.startswith(stem):
-            return str(p)
-    return None
+def show_live_preview(source, max_latency, duration, options):
+    st.subheader("Live Preview")
+    tracker = LiveTracker(MODEL_WEIGHTS_PATH, max_latency=max_latency, draw_masks=options["draw_masks"],
+                          backend=options.get("backend", "torch"))
+    st.button("■ Stop", use_container_width=True)  # any rerun ends the preview
+    image = st.empty()
+    c1, c2, c3, c4 = st.columns(4)
+    vehicles, pedestrians, latency, dropped = c1.empty(), c2.empty(), c3.empty(), c4.empty()
+    frames = tracker.stream(source, loop=True, duration=duration or None)
+    try:
+        for live_frame in frames:
+            image.image(live_frame.image, channels="BGR", output_format="JPEG", use_container_width=True)
+            counts = live_frame.counts
+            vehicles.metric("Vehicles", counts["vehicle"])
+            pedestrians.metric("Pedestrians", counts["pedestrian"])
+            latency.metric("Latency", f"{live_frame.latency * 1000:.0f} ms")
+            dropped.metric("Dropped frames", tracker.stats.dropped)
+    finally:
+        frames.close()
+    summary = tracker.stats.summary()
+    if summary.get("latency_ms"):
+        st.caption(f"{summary['frames']} frames at {summary['fps']} fps, {summary['dropped']} dropped; latency "
+                   f"p50 {summary['latency_ms']['p50']} ms, p99 {summary['latency_ms']['p99']} ms")
+
+def show_job_progress(scheduler):
+    job_id = st.session_state.get("job_id")
+    job = scheduler.get(job_id) if job_id else None
+    if job is None:
+        return
+
+    if job.active:
+        st.subheader("Processing")
+        total = job.total_frames
+        done = job.frames_done
+        st.progress(min(done / total, 1.0) if total else 0.0,
+                    text="Waiting for a free worker..." if job.state != RUNNING else f"Tracking frame {done} of {total or '?'}")
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Frames", f"{done}/{total or '?'}")
+        c2.metric("FPS", f"{job.fps:.1f}")
+        c3.metric("ETA", f"{job.eta:.0f}s" if job.eta is not None else "-")
+        if st.button("✖ Cancel", use_container_width=True):
+            scheduler.cancel(job_id)
+        time.sleep(0.5)
+        st.rerun()
+
+    st.session_state["job_id"] = None
+    if job.state == DONE:
+        st.session_state["output_video_path"] = job.output_video_path
+        st.session_state["output_suffix"] = Path(job.output_video_path).suffix
+        st.session_state["results_json_path"] = job.results_json_path
+        st.session_state["profile_path"] = job.profile_path
+        st.session_state["prepared_downloads"] = set()
+        # Outputs land in the store's jobs/ folder; keep it within its quota
+        get_store().prune(keep=[job.output_video_path, job.input_path, *scheduler.pinned_paths()])
+        st.toast("⚡ Loaded cached results!" if job.from_cache else "🎉 Tracking completed!")
+        st.rerun()
+    elif job.state == CANCELLED:
+        st.warning("Tracking was cancelled.")
+    else:
+        st.error(f"Failed: {job.message}")
 
 def main():
     # Initialize session state keys
@@ -91,18 +262,28 @@ def main():
         "input_video_path": None,
         "output_video_path": None,
         "results_json_path": None,
+        "profile_path": None,
         "output_suffix": ".mp4",
+        "job_id": None,
+        "upload_id": None,
     }.items():
         if k not in st.session_state:
             st.session_state[k] = v
 
-    uploaded_file, run_btn = upload_controls()
+    store = get_store()
+    scheduler = get_scheduler()
+    uploaded_file, run_btn, options = upload_controls()
+    live_source, max_latency, live_duration, live_btn = live_controls()
 
-    if uploaded_file and not st.session_state["input_video_path"]:
+    # Streamed into the store under its content hash, so re-uploading the same video reuses the stored copy
+    input_video_path = st.session_state["input_video_path"]
+    if uploaded_file and (st.session_state["upload_id"] != uploaded_file.file_id
+                          or not input_video_path or not os.path.exists(input_video_path)):
         suffix = os.path.splitext(uploaded_file.name)[1] or ".mp4"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tfile:
-            tfile.write(uploaded_file.getbuffer())
-            st.session_state["input_video_path"] = tfile.name
+        keep = [p for p in (st.session_state["output_video_path"], st.session_state["results_json_path"]) if p]
+        st.session_state["input_video_path"] = str(store.put_stream(uploaded_file, suffix,
+                                                                    keep=[*keep, *scheduler.pinned_paths()]))
+        st.session_state["upload_id"] = uploaded_file.file_id
 
     st.subheader("How it works")
     st.markdown(
@@ -111,7 +292,20 @@ def main():
         "3) Download the tracked video and JSON results."
     )
 
+    if live_btn:
+        if not os.path.exists(MODEL_WEIGHTS_PATH):
+            st.error(f"❌ Model weights file not found at '{MODEL_WEIGHTS_PATH}'")
+        elif not live_source and not st.session_state["input_video_path"]:
+            st.warning("Enter a camera or stream URL, or upload a video to replay.")
+        else:
+            try:
+                show_live_preview(live_source or st.session_state["input_video_path"], max_latency, live_duration,
+                                  options)
+            except IOError as e:
+                st.error(str(e))
+
     show_analytics()
+    show_profile()
     show_downloads()
 
     if run_btn:
@@ -119,44 +313,11 @@ def main():
             st.error(f"❌ Model weights file not found at '{MODEL_WEIGHTS_PATH}'")
         elif not st.session_state["input_video_path"] or not os.path.exists(st.session_state["input_video_path"]):
             st.warning("Please upload a video first.")
-        else:
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                base_name = f"tracked_{os.path.basename(st.session_state['input_video_path'])}"
-                requested_output = os.path.join(tmp_dir, base_name)
-                results_json_tmp = os.path.join(tmp_dir, "tracking_results.json")
-
-                with st.status("Processing video...", expanded=True) as status:
-                    st.write("Loading model and preparing video...")
-                    success, message = track_video(
-                        st.session_state["input_video_path"],
-                        requested_output,
-                        MODEL_WEIGHTS_PATH,
-                        results_json_tmp,
-                    )
-
-                    if success:
-                        actual_writer_path = _resolve_actual_output(requested_output, tmp_dir)
-                        if actual_writer_path and os.path.exists(actual_writer_path):
-                            suffix = Path(actual_writer_path).suffix
-                            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as out_tf:
-                                out_tf.flush()
-                                shutil.copyfile(actual_writer_path, out_tf.name)
-                                st.session_state["output_video_path"] = out_tf.name
-                                st.session_state["output_suffix"] = suffix
-
-                            if os.path.exists(results_json_tmp):
-                                with tempfile.NamedTemporaryFile(delete=False, suffix=".json") as js_tf:
-                                    js_tf.flush()
-                                    shutil.copyfile(results_json_tmp, js_tf.name)
-                                    st.session_state["results_json_path"] = js_tf.name
-
-                            status.update(label="Completed successfully!", state="complete", expanded=False)
-                            st.toast("🎉 Tracking completed!")
-                            st.rerun()
-                        else:
-                            status.update(label="Failed: Could not locate output video file.", state="error", expanded=True)
-                    else:
-                        status.update(label=f"Failed: {message}", state="error", expanded=True)
+        elif not st.session_state["job_id"]:
+            st.session_state["job_id"] = scheduler.submit(st.session_state["input_video_path"], MODEL_WEIGHTS_PATH,
+                                                          **options)
+
+    show_job_progress(scheduler)
 
 if __name__ == "__main__":
     main()
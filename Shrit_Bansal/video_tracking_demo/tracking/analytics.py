@@ -0,0 +1,178 @@
+import os
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from .results_io import iter_results
+
+# Classes track_video reports (see render._map_binary); unknown ones are counted under their own name
+CLASSES = ("vehicle", "pedestrian")
+
+
+def analytics_path(results_path) -> str:
+    """Where the index for a results file lives: next to it, as <stem>.analytics.npz."""
+    path = Path(results_path)
+    return str(path.with_name(f"{path.stem}.analytics.npz"))
+
+
+class AnalyticsBuilder:
+    """
+    Summarizes frame records as they are produced: per-track first/last frame,
+    frames seen, majority class and max/mean confidence, and per-frame object
+    counts by class. Memory grows with tracks and frames, not objects.
+    """
+
+    def __init__(self, fps: float | None = None):
+        self.fps = fps
+        self.classes = list(CLASSES)
+        self.frame_ids = []
+        self.frame_counts = []
+        self._tracks = {}
+
+    def _class_index(self, name: str) -> int:
+        if name not in self.classes:
+            self.classes.append(name)
+        return self.classes.index(name)
+
+    def add(self, record: dict):
+        counts = Counter()
+        frame_id = record["frame_id"]
+        for obj in record["objects"]:
+            cls = self._class_index(obj["class"])
+            counts[cls] += 1
+            conf = obj["confidence"]
+            track = self._tracks.get(obj["id"])
+            if track is None:
+                self._tracks[obj["id"]] = [frame_id, frame_id, 1, Counter({cls: 1}), conf, conf]
+            else:
+                track[1] = frame_id
+                track[2] += 1
+                track[3][cls] += 1
+                track[4] = max(track[4], conf)
+                track[5] += conf
+        self.frame_ids.append(frame_id)
+        self.frame_counts.append(counts)
+
+    def arrays(self) -> dict:
+        ids = sorted(self._tracks)
+        rows = [self._tracks[i] for i in ids]
+        counts = np.zeros((len(self.frame_ids), len(self.classes)), dtype=np.int32)
+        for i, frame in enumerate(self.frame_counts):
+            for cls, n in frame.items():
+                counts[i, cls] = n
+        seen = np.asarray([r[2] for r in rows], dtype=np.int32)
+        return {
+            "fps": np.float64(self.fps or 0.0),
+            "classes": np.asarray(self.classes, dtype=str),
+            "frame_ids": np.asarray(self.frame_ids, dtype=np.int32),
+            "frame_counts": counts,
+            "track_ids": np.asarray(ids, dtype=np.int64),
+            "first_frame": np.asarray([r[0] for r in rows], dtype=np.int32),
+            "last_frame": np.asarray([r[1] for r in rows], dtype=np.int32),
+            "frames_seen": seen,
+            "track_class": np.asarray([r[3].most_common(1)[0][0] for r in rows], dtype=np.int16),
+            "max_conf": np.asarray([r[4] for r in rows], dtype=np.float32),
+            "mean_conf": (np.asarray([r[5] for r in rows], dtype=np.float64) / np.maximum(seen, 1)).astype(np.float32),
+        }
+
+    def save(self, path) -> str:
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, **self.arrays())
+        os.replace(tmp_path, path)
+        return str(path)
+
+
+class AnalyticsWriter:
+    """
+    Wraps a results writer: records pass through unchanged and also feed an
+    AnalyticsBuilder, whose index is saved to analytics_path(writer.path) on close.
+    """
+
+    def __init__(self, writer, fps: float | None = None):
+        self.writer = writer
+        self.path = writer.path
+        self.builder = AnalyticsBuilder(fps)
+        self._closed = False
+
+    @property
+    def frames(self) -> int:
+        return self.writer.frames
+
+    def write(self, record: dict):
+        self.writer.write(record)
+        self.builder.add(record)
+
+    def close(self):
+        self.writer.close()
+        if not self._closed:
+            self._closed = True
+            self.builder.save(analytics_path(self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AnalyticsIndex:
+    """A loaded index; every summary is computed from small arrays, without the results file."""
+
+    def __init__(self, arrays: dict):
+        self.fps = float(arrays["fps"]) or None
+        self.classes = [str(c) for c in arrays["classes"]]
+        self.frame_ids = arrays["frame_ids"]
+        self.frame_counts = arrays["frame_counts"]
+        self.track_ids = arrays["track_ids"]
+        self.first_frame = arrays["first_frame"]
+        self.last_frame = arrays["last_frame"]
+        self.frames_seen = arrays["frames_seen"]
+        self.track_class = arrays["track_class"]
+        self.max_conf = arrays["max_conf"]
+        self.mean_conf = arrays["mean_conf"]
+
+    @property
+    def frames(self) -> int:
+        return len(self.frame_ids)
+
+    @property
+    def unique_objects(self) -> int:
+        return len(self.track_ids)
+
+    @property
+    def total_objects(self) -> int:
+        return int(self.frame_counts.sum())
+
+    def dwell(self) -> np.ndarray:
+        """Per-track time from first to last sighting, in seconds (in frames if fps is unknown)."""
+        span = (self.last_frame - self.first_frame + 1).astype(np.float64)
+        return span / self.fps if self.fps else span
+
+    def tracks_by_class(self) -> dict:
+        return {name: int((self.track_class == i).sum()) for i, name in enumerate(self.classes)}
+
+    def objects_per_frame(self) -> dict:
+        """Column per class (skipping classes never seen), aligned with frame_ids."""
+        return {name: self.frame_counts[:, i] for i, name in enumerate(self.classes) if self.frame_counts[:, i].any()}
+
+    def track_length_histogram(self, bins: int = 20) -> tuple[np.ndarray, np.ndarray]:
+        """(counts, bin_edges) of track lengths in frames seen."""
+        if not len(self.frames_seen):
+            return np.zeros(0, dtype=np.int64), np.zeros(1)
+        return np.histogram(self.frames_seen, bins=min(bins, max(1, int(self.frames_seen.max()))))
+
+
+def load_analytics(path) -> AnalyticsIndex:
+    with np.load(path, allow_pickle=False) as npz:
+        return AnalyticsIndex({name: npz[name] for name in npz.files})
+
+
+def build_analytics(results_path, fps: float | None = None, save: bool = True) -> AnalyticsIndex:
+    """Index an existing results file (e.g. from before indexes were written) and save it next to it."""
+    builder = AnalyticsBuilder(fps)
+    for record in iter_results(results_path):
+        builder.add(record)
+    if save:
+        builder.save(analytics_path(results_path))
+    return AnalyticsIndex(builder.arrays())
@@ -0,0 +1,249 @@
+import hashlib
+import http.server
+import mimetypes
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote, unquote, urlsplit
+
+from .fileutils import remember_digest
+
+DEFAULT_ROOT = os.path.join(tempfile.gettempdir(), "tracker_artifacts")
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+DEFAULT_TTL = 7 * 24 * 3600
+CHUNK_SIZE = 1 << 20
+
+
+def _entry_bytes(path: Path) -> int:
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size
+
+
+class ArtifactStore:
+    """
+    Content-addressed storage for the app's files: uploads live in uploads/ named by
+    the sha256 of their contents, so an identical upload is stored once, and tracking
+    outputs live in jobs/<cache key>/ (JobScheduler's cache_dir, whose keys already
+    hash the input, weights and parameters). Everything is written under a temporary
+    name in the store and renamed into place; nothing is copied out again.
+
+    An entry's last use is its atime, set by touch() (the mtime is left alone so
+    memoized digests stay valid). prune() evicts entries unused for `ttl` seconds,
+    then least recently used ones until the store fits in `max_bytes`.
+    """
+
+    def __init__(self, root: str | None = None, max_bytes: int | None = DEFAULT_MAX_BYTES,
+                 ttl: float | None = DEFAULT_TTL):
+        self.root = Path(root or DEFAULT_ROOT)
+        self.uploads_dir = self.root / "uploads"
+        self.jobs_dir = self.root / "jobs"
+        self.uploads_dir.mkdir(parents=True, exist_ok=True)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def put_stream(self, stream, suffix: str = "", keep=()) -> Path:
+        """
+        Store the bytes of file-like `stream`, read in chunks and hashed on the way in,
+        as uploads/<sha256><suffix>; returns its path. Then prunes the store, sparing `keep`.
+        """
+        if hasattr(stream, "seek"):
+            stream.seek(0)
+        h = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(prefix=".upload.", dir=self.uploads_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    block = stream.read(CHUNK_SIZE)
+                    if not block:
+                        break
+                    h.update(block)
+                    f.write(block)
+            digest = h.hexdigest()
+            final = self.uploads_dir / f"{digest}{suffix.lower()}"
+            if final.exists():
+                os.unlink(tmp_path)
+            else:
+                os.replace(tmp_path, final)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        remember_digest(str(final), digest)
+        self.touch(final)
+        self.prune(keep=[final, *keep])
+        return final
+
+    def touch(self, path):
+        """Mark a stored file, or the entry it belongs to, as just used."""
+        entry = self._entry_of(Path(path))
+        if entry is not None and entry.exists():
+            st = entry.stat()
+            os.utime(entry, ns=(time.time_ns(), st.st_mtime_ns))
+
+    def _entry_of(self, path: Path) -> Path | None:
+        path = path.resolve()
+        for folder in (self.uploads_dir, self.jobs_dir):
+            folder = folder.resolve()
+            if path.parent == folder:
+                return path
+            if folder in path.parents:
+                return folder / path.relative_to(folder).parts[0]
+        return None
+
+    def entries(self) -> list[dict]:
+        """Complete entries, most recently used first."""
+        rows = []
+        for kind, folder in (("upload", self.uploads_dir), ("job", self.jobs_dir)):
+            for entry in folder.iterdir():
+                # Skip partial writes (".upload.*" and the scheduler's "<key>.<random>") and its track cache
+                if entry.name.startswith(".") or (kind == "job" and ("." in entry.name or entry.name == "tracks")):
+                    continue
+                try:
+                    rows.append({"path": entry, "kind": kind, "bytes": _entry_bytes(entry),
+                                 "last_used": entry.stat().st_atime})
+                except FileNotFoundError:
+                    continue
+        rows.sort(key=lambda row: row["last_used"], reverse=True)
+        return rows
+
+    def remove(self, path) -> bool:
+        path = Path(path)
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        elif path.exists():
+            path.unlink(missing_ok=True)
+        else:
+            return False
+        return True
+
+    def prune(self, max_bytes: int | None = None, ttl: float | None = None, keep=()) -> list[Path]:
+        """
+        Evict entries unused for `ttl` seconds, then least recently used ones until the
+        store fits in `max_bytes` (defaults: the store's limits). Entries holding a
+        path in `keep` (e.g. inputs of queued jobs, outputs on screen) are never
+        evicted but still count towards the quota. Returns the evicted entries.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        ttl = self.ttl if ttl is None else ttl
+        pinned = {entry for entry in (self._entry_of(Path(p)) for p in keep) if entry is not None}
+        with self._lock:
+            entries = self.entries()
+            total = sum(row["bytes"] for row in entries)
+            candidates = [row for row in entries if row["path"].resolve() not in pinned]
+            evicted = []
+            if ttl is not None:
+                cutoff = time.time() - ttl
+                evicted += [row for row in candidates if row["last_used"] < cutoff]
+                candidates = [row for row in candidates if row["last_used"] >= cutoff]
+            if max_bytes is not None:
+                total -= sum(row["bytes"] for row in evicted)
+                while candidates and total > max_bytes:
+                    row = candidates.pop()
+                    total -= row["bytes"]
+                    evicted.append(row)
+            for row in evicted:
+                self.remove(row["path"])
+        return [row["path"] for row in evicted]
+
+
+class _ArtifactHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._send(body=True)
+
+    def do_HEAD(self):
+        self._send(body=False)
+
+    def _send(self, body: bool):
+        url = urlsplit(self.path)
+        token, _, name = url.path.strip("/").partition("/")
+        path = self.server.files.get(token)
+        if path is None or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start, end, status = 0, size - 1, 200
+        # A single byte range is enough for browsers seeking in a video
+        ranges = self.headers.get("Range", "")
+        if ranges.startswith("bytes="):
+            first, _, last = ranges[6:].split(",")[0].strip().partition("-")
+            try:
+                if first:
+                    start, end = int(first), int(last) if last else size - 1
+                else:
+                    start = max(0, size - int(last))
+            except ValueError:
+                start = end = -1
+            if not 0 <= start <= end or start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            end, status = min(end, size - 1), 206
+
+        name = unquote(name) or os.path.basename(path)
+        self.send_response(status)
+        self.send_header("Content-Type", mimetypes.guess_type(name)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        if "download" in url.query:
+            self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(name)}")
+        self.end_headers()
+        if not body:
+            return
+        try:
+            with open(path, "rb") as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining:
+                    block = f.read(min(CHUNK_SIZE, remaining))
+                    if not block:
+                        break
+                    self.wfile.write(block)
+                    remaining -= len(block)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ArtifactServer:
+    """
+    Streams stored files over HTTP straight from disk in chunks (with byte ranges, so
+    videos can be seeked), so large downloads never pass through the Streamlit
+    process's memory. Only files handed to url_for() are served, under random tokens,
+    but without authentication, so it listens on localhost unless `host` says otherwise.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8502, public_url: str | None = None):
+        self.httpd = http.server.ThreadingHTTPServer((host, port), _ArtifactHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.files = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self.public_url = (public_url or f"http://localhost:{self.httpd.server_address[1]}").rstrip("/")
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="artifact-server", daemon=True)
+        self.thread.start()
+
+    def url_for(self, path, file_name: str | None = None, download: bool = True) -> str:
+        path = os.path.abspath(path)
+        with self._lock:
+            token = self._tokens.get(path)
+            if token is None:
+                token = self._tokens[path] = secrets.token_urlsafe(16)
+                self.httpd.files[token] = path
+        url = f"{self.public_url}/{token}/{quote(file_name or os.path.basename(path))}"
+        return url + "?download=1" if download else url
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
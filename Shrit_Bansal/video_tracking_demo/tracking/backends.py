@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# "torch" runs the .pt weights as they are; the others are exported (and cached) on first use
+BACKENDS = ("torch", "onnx", "onnx-int8", "openvino", "openvino-int8")
+
+# data.yaml whose val split (dataset_folder/images/val) calibrates INT8 models
+DEFAULT_CALIBRATION_DATA = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "training", "configs", "data.yaml"
+)
+CALIBRATION_IMAGES = 300
+EXPORT_MANIFEST = "export.json"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def export_dir(weights: str, backend: str, imgsz: int = 640) -> Path:
+    """Where the `backend` export of `weights` is kept: <weights dir>/<stem>_exports/<backend>-<imgsz>/."""
+    path = Path(weights).resolve()
+    return path.parent / f"{path.stem}_exports" / f"{backend}-{imgsz}"
+
+
+def _model_path(directory: Path, backend: str) -> str:
+    # ONNX exports are a single file; OpenVINO ones are the directory holding the .xml/.bin/metadata.yaml
+    return str(directory / "model.onnx") if backend.startswith("onnx") else str(directory)
+
+
+def read_manifest(path) -> dict | None:
+    """The export.json of an exported model (its file or directory), or None for plain weights."""
+    path = Path(path)
+    manifest = (path if path.is_dir() else path.parent) / EXPORT_MANIFEST
+    if not manifest.exists():
+        return None
+    with open(manifest, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def exported_task(path) -> str | None:
+    # YOLO() cannot tell the task of an .onnx file or OpenVINO directory from its name
+    manifest = read_manifest(path)
+    return manifest["task"] if manifest else None
+
+
+def _is_current(directory: Path, weights: str, backend: str) -> bool:
+    manifest = read_manifest(_model_path(directory, backend))
+    return (manifest is not None and manifest["weights_mtime_ns"] == os.stat(weights).st_mtime_ns
+            and os.path.exists(_model_path(directory, backend)))
+
+
+def _calibration_batches(onnx_path: str, data: str, imgsz: int, limit: int):
+    """Letterboxed val images, preprocessed the way the exported model expects them."""
+    import onnx
+    from ultralytics.data.augment import LetterBox
+    from ultralytics.data.utils import check_det_dataset
+
+    val = check_det_dataset(data)["val"]
+    folders = val if isinstance(val, list) else [val]
+    files = sorted(str(f) for folder in folders for f in Path(folder).rglob("*")
+                   if f.suffix.lower() in IMAGE_EXTENSIONS)[:limit]
+    if not files:
+        raise FileNotFoundError(f"No calibration images in the val split of {data}")
+    input_name = onnx.load(onnx_path, load_external_data=False).graph.input[0].name
+    letterbox = LetterBox((imgsz, imgsz), auto=False)
+    for file in files:
+        image = letterbox(image=cv2.imread(file))
+        tensor = np.ascontiguousarray(image[..., ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255
+        yield {input_name: tensor}
+
+
+def _quantize_onnx(src: str, dst: str, data: str, imgsz: int, limit: int):
+    """Static (QDQ) INT8 quantization: int8 weights per channel, uint8 activations calibrated on val images."""
+    from ultralytics.utils.checks import check_requirements
+
+    check_requirements("onnxruntime")
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.batches = _calibration_batches(src, data, imgsz, limit)
+
+        def get_next(self):
+            return next(self.batches, None)
+
+    quantize_static(src, dst, Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    # Ultralytics reads names, stride, task and imgsz from the model's metadata; carry it over
+    quantized = onnx.load(dst)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(onnx.load(src, load_external_data=False).metadata_props)
+    onnx.save(quantized, dst)
+
+
+def export_model(weights: str, backend: str, imgsz: int = 640, data: str | None = None,
+                 calibration_images: int = CALIBRATION_IMAGES) -> str:
+    """
+    Export `weights` for `backend` into export_dir() and return the path YOLO() loads.
+    Exports have dynamic input shapes, so batching and the real-time mode's smaller
+    sizes still work. INT8 backends are calibrated on the val split of `data`
+    (default: training/configs/data.yaml). The export is built in a private folder
+    and renamed into place, so concurrent exports of the same model do not clash.
+    """
+    if backend not in BACKENDS or backend == "torch":
+        raise ValueError(f"Cannot export to {backend!r}; choose one of {', '.join(BACKENDS[1:])}")
+    from ultralytics import YOLO
+
+    data = data or DEFAULT_CALIBRATION_DATA
+    final = export_dir(weights, backend, imgsz)
+    final.parent.mkdir(parents=True, exist_ok=True)
+    partial = Path(tempfile.mkdtemp(prefix=f"{final.name}.", dir=final.parent))
+    start = time.perf_counter()
+    try:
+        # Export a private copy, since YOLO.export() writes next to the weights it is given
+        source = partial / "source" / "model.pt"
+        source.parent.mkdir()
+        shutil.copy2(weights, source)
+        model = YOLO(str(source))
+        task = model.task
+        if backend == "onnx-int8":
+            fp32 = resolve_weights(weights, "onnx", imgsz, data)
+            _quantize_onnx(fp32, str(partial / "model.onnx"), data, imgsz, calibration_images)
+        elif backend == "onnx":
+            out = model.export(format="onnx", imgsz=imgsz, dynamic=True)
+            shutil.move(out, partial / "model.onnx")
+        else:
+            kwargs = {"int8": True, "data": data} if backend == "openvino-int8" else {}
+            out = model.export(format="openvino", imgsz=imgsz, dynamic=True, **kwargs)
+            for item in Path(out).iterdir():
+                shutil.move(str(item), partial / item.name)
+        shutil.rmtree(partial / "source")
+        manifest = {"backend": backend, "task": task, "imgsz": imgsz, "weights": str(Path(weights).resolve()),
+                    "weights_mtime_ns": os.stat(weights).st_mtime_ns, "int8": backend.endswith("int8"),
+                    "calibration_data": data if backend.endswith("int8") else None,
+                    "export_s": round(time.perf_counter() - start, 2), "created": time.time()}
+        with open(partial / EXPORT_MANIFEST, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        if final.exists():
+            shutil.rmtree(final, ignore_errors=True)
+        os.replace(partial, final)
+    except Exception:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    return _model_path(final, backend)
+
+
+def resolve_weights(weights: str, backend: str = "torch", imgsz: int = 640, data: str | None = None) -> str:
+    """
+    The model path to load for `backend`: `weights` itself for torch, otherwise its
+    export, re-exported if missing or older than the weights.
+    """
+    if backend == "torch":
+        return weights
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; choose one of {', '.join(BACKENDS)}")
+    directory = export_dir(weights, backend, imgsz)
+    if _is_current(directory, weights, backend):
+        return _model_path(directory, backend)
+    return export_model(weights, backend, imgsz, data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export YOLO weights for a CPU inference backend")
+    parser.add_argument("weights")
+    parser.add_argument("--backend", choices=BACKENDS[1:], action="append", required=True,
+                        help="repeat to export several backends")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--data", default=DEFAULT_CALIBRATION_DATA, help="data.yaml whose val split calibrates INT8")
+    parser.add_argument("--calibration-images", type=int, default=CALIBRATION_IMAGES,
+                        help="val images used to calibrate onnx-int8 (OpenVINO/NNCF picks its own subset)")
+    parser.add_argument("--force", action="store_true", help="re-export even if an up-to-date export exists")
+    args = parser.parse_args()
+
+    for backend in args.backend:
+        if args.force:
+            path = export_model(args.weights, backend, args.imgsz, args.data, args.calibration_images)
+        else:
+            path = resolve_weights(args.weights, backend, args.imgsz, args.data)
+        print(f"{backend}: {path} (exported in {read_manifest(path)['export_s']}s)")
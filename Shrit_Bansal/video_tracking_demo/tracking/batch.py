@@ -0,0 +1,261 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cv2
+
+from .backends import BACKENDS, resolve_weights
+from .byte_tracker import track_params, track_video
+from .segments import limit_threads
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
+DONE_MARKER = "done.json"
+SUMMARY_NAME = "summary.json"
+# Rough resident size of one worker (model, torch runtime, frame buffers)
+WORKER_MEMORY_MB = 1500
+
+
+def find_videos(inputs, exclude=None) -> list[str]:
+    """
+    Videos named by `inputs`: files, directories (searched recursively) or glob
+    patterns, leaving out anything under the `exclude` directory (the output folder,
+    whose rendered videos would otherwise be picked up as inputs on the next run).
+    """
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found += [str(p) for p in Path(item).rglob("*") if p.suffix.lower() in VIDEO_EXTENSIONS]
+        elif os.path.isfile(item):
+            found.append(item)
+        else:
+            found += [p for p in glob.glob(item, recursive=True)
+                      if os.path.isfile(p) and Path(p).suffix.lower() in VIDEO_EXTENSIONS]
+    found = set(os.path.abspath(p) for p in found)
+    if exclude:
+        exclude = os.path.join(os.path.abspath(exclude), "")
+        found = {p for p in found if not p.startswith(exclude)}
+    return sorted(found)
+
+
+def _frame_count(path: str) -> int:
+    cap = cv2.VideoCapture(path)
+    try:
+        return max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+    finally:
+        cap.release()
+
+
+def _available_memory_mb() -> float | None:
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def default_workers(threads_per_worker: int = 2, worker_memory_mb: float = WORKER_MEMORY_MB) -> int:
+    """As many workers as the cores allow at `threads_per_worker` each, capped by available memory."""
+    workers = max(1, (os.cpu_count() or 1) // max(1, threads_per_worker))
+    memory = _available_memory_mb()
+    if memory is not None:
+        workers = min(workers, max(1, int(memory // worker_memory_mb)))
+    return workers
+
+
+def _output_dirs(videos, out_dir) -> dict:
+    """One output directory per video, mirroring the inputs' layout below their common parent."""
+    root = os.path.commonpath([os.path.dirname(v) for v in videos]) if videos else ""
+    return {v: os.path.join(out_dir, os.path.splitext(os.path.relpath(v, root))[0]) for v in videos}
+
+
+def _fingerprint(video, model_weights, params) -> dict:
+    st = os.stat(video)
+    wt = os.stat(model_weights)
+    return {"input": video, "input_size": st.st_size, "input_mtime_ns": st.st_mtime_ns,
+            "weights": os.path.abspath(model_weights), "weights_mtime_ns": wt.st_mtime_ns, "params": params,
+            "track": track_params(params.get("conf"), params.get("iou"), weights=model_weights)}
+
+
+def is_complete(video_dir, fingerprint) -> bool:
+    """True if `video_dir` holds a finished run of the same video, weights and parameters."""
+    marker = os.path.join(video_dir, DONE_MARKER)
+    if not os.path.exists(marker):
+        return False
+    with open(marker, "r", encoding="utf-8") as f:
+        done = json.load(f)
+    if done.get("fingerprint") != fingerprint:
+        return False
+    return all(os.path.exists(os.path.join(video_dir, name)) for name in done["outputs"])
+
+
+def _init_worker(threads):
+    limit_threads(threads)
+
+
+def _run_video(video, video_dir, model_weights, results_name, params, fingerprint):
+    """
+    Worker: track one video into a private folder and rename it into place on success.
+    Runs in a pool process, so the model registry keeps the model loaded across clips.
+    """
+    parent = os.path.dirname(video_dir)
+    os.makedirs(parent, exist_ok=True)
+    partial = tempfile.mkdtemp(prefix=os.path.basename(video_dir) + ".", dir=parent)
+    frames = [0]
+
+    def progress(done, total):
+        frames[0] = done
+
+    start = time.perf_counter()
+    try:
+        ok, message = track_video(video, os.path.join(partial, "tracked"), model_weights,
+                                  os.path.join(partial, results_name), progress_callback=progress, **params)
+    except Exception as e:
+        ok, message = False, f"An error occurred during processing: {str(e)}"
+    seconds = time.perf_counter() - start
+    if not ok:
+        shutil.rmtree(partial, ignore_errors=True)
+        return {"input": video, "status": "failed", "seconds": round(seconds, 3), "frames": frames[0],
+                "message": message}
+
+    outputs = sorted(os.listdir(partial))
+    with open(os.path.join(partial, DONE_MARKER), "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "outputs": outputs, "seconds": round(seconds, 3),
+                   "frames": frames[0], "message": message}, f, indent=2)
+    if os.path.exists(video_dir):
+        shutil.rmtree(video_dir, ignore_errors=True)
+    os.replace(partial, video_dir)
+    return {"input": video, "status": "done", "seconds": round(seconds, 3), "frames": frames[0],
+            "fps": round(frames[0] / seconds, 2) if seconds > 0 else 0.0, "output": video_dir,
+            "message": message}
+
+
+def track_videos(videos, model_weights, out_dir, workers=None, threads_per_worker=2, results_format="json",
+                 force=False, progress_callback=None, **track_kwargs) -> dict:
+    """
+    Track every video in `videos` into `out_dir`/<relative path>/ on a pool of
+    `workers` processes (default: default_workers()). The longest clips are
+    submitted first so a long one does not start last and hold up the run. Videos
+    whose output folder already has a finished run with the same inputs and
+    parameters are skipped unless `force`. Extra kwargs go to track_video.
+    Writes and returns a summary with per-video timings and failures.
+    """
+    workers = workers or default_workers(threads_per_worker)
+    # Export the backend's model up front rather than in every worker at once
+    resolve_weights(model_weights, track_kwargs.get("backend", "torch"))
+    results_name = f"tracking_results.{results_format}"
+    params = {"results_format": results_format, **track_kwargs}
+    dirs = _output_dirs(videos, out_dir)
+
+    rows, pending = [], []
+    for video in videos:
+        fingerprint = _fingerprint(video, model_weights, params)
+        if not force and is_complete(dirs[video], fingerprint):
+            rows.append({"input": video, "status": "skipped", "output": dirs[video]})
+        else:
+            pending.append((video, fingerprint))
+    lengths = {video: _frame_count(video) for video, _ in pending}
+    pending.sort(key=lambda item: lengths[item[0]], reverse=True)
+
+    start = time.perf_counter()
+    if pending:
+        # spawn, not fork: forking a process that already runs torch threads can deadlock
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), mp_context=ctx,
+                                 initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+            futures = {
+                pool.submit(_run_video, video, dirs[video], model_weights, results_name, params, fingerprint): video
+                for video, fingerprint in pending
+            }
+            for future in as_completed(futures):
+                try:
+                    row = future.result()
+                except Exception as e:
+                    # The worker process died (e.g. out of memory)
+                    row = {"input": futures[future], "status": "failed", "message": f"{type(e).__name__}: {e}"}
+                rows.append(row)
+                if progress_callback is not None:
+                    progress_callback(row, len(rows), len(videos))
+    seconds = time.perf_counter() - start
+
+    done = [row for row in rows if row["status"] == "done"]
+    frames = sum(row["frames"] for row in done)
+    summary = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "weights": os.path.abspath(model_weights),
+        "params": params,
+        "workers": min(workers, len(pending)) if pending else 0,
+        "videos": len(videos),
+        "done": len(done),
+        "skipped": sum(1 for row in rows if row["status"] == "skipped"),
+        "failed": sum(1 for row in rows if row["status"] == "failed"),
+        "frames": frames,
+        "seconds": round(seconds, 3),
+        "throughput_fps": round(frames / seconds, 2) if seconds > 0 else 0.0,
+        "videos_per_hour": round(len(done) / seconds * 3600, 1) if seconds > 0 else 0.0,
+        "per_video": sorted(rows, key=lambda row: row["input"]),
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, SUMMARY_NAME), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Track a folder (or glob) of videos on a pool of worker processes")
+    parser.add_argument("inputs", nargs="+", help="video files, directories or glob patterns")
+    parser.add_argument("--weights", required=True)
+    parser.add_argument("--out-dir", required=True)
+    parser.add_argument("--workers", type=int, default=None, help="default: from cores and available memory")
+    parser.add_argument("--threads-per-worker", type=int, default=2)
+    parser.add_argument("--results-format", choices=("json", "jsonl", "npz"), default="json")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="see tracking/backends.py")
+    parser.add_argument("--draw-masks", action="store_true")
+    parser.add_argument("--conf", type=float, default=None, help="default: the weights' recommended point (see track_params)")
+    parser.add_argument("--iou", type=float, default=None, help="default: the weights' recommended point (see track_params)")
+    parser.add_argument("--track-cache", default=None, help="directory of a TrackCache to reuse raw tracks")
+    parser.add_argument("--force", action="store_true", help="re-run videos that already have complete outputs")
+    args = parser.parse_args(argv)
+
+    videos = find_videos(args.inputs, exclude=args.out_dir)
+    if not videos:
+        parser.error("no videos found")
+    track_kwargs = {"batch_size": args.batch_size, "draw_masks": args.draw_masks}
+    if args.device is not None:
+        track_kwargs["device"] = args.device
+    if args.backend != "torch":
+        track_kwargs["backend"] = args.backend
+    if args.track_cache:
+        track_kwargs["track_cache"] = args.track_cache
+    if args.conf is not None:
+        track_kwargs["conf"] = args.conf
+    if args.iou is not None:
+        track_kwargs["iou"] = args.iou
+
+    def progress(row, finished, total):
+        detail = f"{row['frames']} frames in {row['seconds']}s" if row["status"] == "done" else row["message"]
+        print(f"[{finished}/{total}] {row['status']:<7} {row['input']}: {detail}", flush=True)
+
+    summary = track_videos(videos, args.weights, args.out_dir, args.workers, args.threads_per_worker,
+                           args.results_format, args.force, progress, **track_kwargs)
+    print(f"{summary['done']} done, {summary['skipped']} skipped, {summary['failed']} failed; "
+          f"{summary['frames']} frames in {summary['seconds']}s ({summary['throughput_fps']} fps) "
+          f"on {summary['workers']} workers")
+    print(f"Summary saved to {os.path.join(args.out_dir, SUMMARY_NAME)}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
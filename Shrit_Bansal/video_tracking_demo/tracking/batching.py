@@ -0,0 +1,135 @@
+import time
+import numpy as np
+from ultralytics.trackers.track import TRACKER_MAP
+from ultralytics.utils import IterableSimpleNamespace, YAML
+from ultralytics.utils.checks import check_yaml
+
+from . import instrument
+from .operating_point import track_params
+
+
+class FrameTracker:
+    """
+    A ByteTrack/BoT-SORT instance fed one frame of detections at a time.
+    Mirrors what model.track() does in its postprocess callback, so feeding it the
+    detections of model.predict() in frame order gives the same track IDs.
+    """
+
+    def __init__(self, tracker: str = "bytetrack.yaml", frame_rate: int = 30):
+        cfg = IterableSimpleNamespace(**YAML.load(check_yaml(tracker)))
+        if cfg.tracker_type not in TRACKER_MAP:
+            raise ValueError(f"Unsupported tracker type: {cfg.tracker_type}")
+        self.tracker = TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=frame_rate)
+        self.indices = None
+
+    def reset(self):
+        self.tracker.reset()
+
+    @staticmethod
+    def _split(tracks):
+        # tracks rows: x1, y1, x2, y2, track_id, score, cls, det_index
+        return (
+            tracks[:, :4],
+            tracks[:, 4].astype(int),
+            tracks[:, 5],
+            tracks[:, 6].astype(int),
+        )
+
+    def update(self, result):
+        """
+        Associate one frame's detections. Returns (xyxy, track_ids, confidences, classes)
+        like _extract_tracks(), or None when no track is active in this frame.
+        `indices` is left holding the detection index of every returned track.
+        """
+        with instrument.span("tracker_update"):
+            det = result.boxes.cpu().numpy()
+            tracks = self.tracker.update(det, result.orig_img, getattr(result, "feats", None))
+        if len(tracks) == 0:
+            self.indices = None
+            return None
+        self.indices = tracks[:, 7].astype(int)
+        return self._split(tracks)
+
+    def predict(self):
+        """
+        Advance one frame without running detection: confirmed and lost tracks move
+        along their Kalman prediction and the frame still counts towards the
+        lost-track timeout. Returns the active tracks like update().
+        """
+        tracker = self.tracker
+        with instrument.span("tracker_predict"):
+            tracker.frame_id += 1
+            active = [t for t in tracker.tracked_stracks if t.is_activated]
+            tracker.multi_predict(tracker.joint_stracks(active, tracker.lost_stracks))
+        self.indices = None
+        if not active:
+            return None
+        return self._split(np.asarray([t.result for t in active], dtype=np.float32))
+
+
+def tracked_masks(result, indices):
+    """Segmentation polygons of the tracked detections of `result`, in track order, or None."""
+    if indices is None or getattr(result, "masks", None) is None:
+        return None
+    polygons = result.masks.xy
+    return [polygons[i] for i in indices]
+
+
+def iter_batches(frames, batch_size: int, max_latency: float | None = None):
+    """
+    Group an iterable of frames into lists of up to `batch_size`. If `max_latency`
+    (seconds) is set, a partial batch is flushed once its first frame has waited
+    that long, which bounds the delay added for live sources.
+    """
+    batch = []
+    started = 0.0
+    for frame in frames:
+        if not batch:
+            started = time.perf_counter()
+        batch.append(frame)
+        if len(batch) >= batch_size or (
+            max_latency is not None and time.perf_counter() - started >= max_latency
+        ):
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def track_batch(model, tracker: FrameTracker, frames: list, conf=None, iou=None, imgsz=None, device=None,
+                with_masks=False):
+    """
+    Run detection on a list of frames in one forward pass, then update the tracker
+    frame by frame in order. Returns a list of (frame, tracks, masks); masks are the
+    segmentation polygons of the tracks when `with_masks` is set, else None.
+    `conf` and `iou` default to TRACK_PARAMS (see track_params).
+    """
+    params = track_params(conf, iou)
+    kwargs = {"conf": params["conf"], "iou": params["iou"], "verbose": False}
+    if imgsz is not None:
+        kwargs["imgsz"] = imgsz
+    if device is not None:
+        kwargs["device"] = device
+    start = time.perf_counter()
+    results = model.predict(list(frames), **kwargs)
+    instrument.record_model_call(start, time.perf_counter(), results)
+    tracked = []
+    for frame, result in zip(frames, results):
+        tracks = tracker.update(result)
+        tracked.append((frame, tracks, tracked_masks(result, tracker.indices) if with_masks else None))
+    return tracked
+
+
+def batched_track(model, frames, batch_size: int = 8, max_latency: float | None = None,
+                  conf=None, iou=None, tracker: str | None = None, device=None, with_masks=False):
+    """
+    Generator over (frame, tracks, masks) for every frame in `frames`, detecting in
+    batches of `batch_size` while keeping association strictly per-frame.
+    `conf`, `iou` and `tracker` default to TRACK_PARAMS (see track_params).
+    """
+    params = track_params(conf, iou, tracker)
+    frame_tracker = FrameTracker(params["tracker"])
+    for batch in iter_batches(frames, batch_size, max_latency):
+        yield from track_batch(model, frame_tracker, batch, conf=params["conf"], iou=params["iou"], device=device,
+                               with_masks=with_masks)
+
@@ -1,136 +1,279 @@
-import cv2
-import json
-import math
-from pathlib import Path
-from ultralytics import YOLO
+import os
+import time
+from types import SimpleNamespace
 
-def _safe_fps(val):
-    try:
-        v = float(val)
-        if not math.isfinite(v) or v <= 0:
-            return 25.0
-        return v
-    except Exception:
-        return 25.0
-
-def _open_writer(base_output_path: str, fps: float, size: tuple[int, int]):
-    base = Path(base_output_path)
-    candidates = [
-        ("mp4v", ".mp4"),
-        ("XVID", ".avi"),
-        ("avc1", ".mp4"),
-    ]
-    for fourcc_name, ext in candidates:
-        out_path = base.with_suffix(ext)
-        writer = cv2.VideoWriter(
-            str(out_path),
-            cv2.VideoWriter_fourcc(*fourcc_name),
-            max(fps, 1.0),
-            size
-        )
-        if writer.isOpened():
-            return writer, str(out_path), fourcc_name
-    return None, None, None
-
-def _get_class_name(model, cls_id: int) -> str:
+from . import instrument
+from .analytics import AnalyticsWriter
+from .backends import resolve_weights
+from .batching import FrameTracker, batched_track, iter_batches, track_batch
+from .model_registry import get_model, get_registry
+from .operating_point import TRACK_PARAMS, track_params
+from .results_io import open_results_writer
+from .pipeline import Stage, run_pipeline, format_stage_stats
+from .render import OverlayRenderer, _extract_masks
+from .track_cache import TrackCache, TrackRecorder
+from .video_io import VideoReader, open_video_writer
+
+class TrackingCancelled(Exception):
+    pass
+
+def _extract_tracks(result):
     """
-    Robustly fetch a class name from Ultralytics model.names which can be a list/tuple
-    or a dict with int or string keys.
+    Pull tracked boxes out of an Ultralytics result as NumPy arrays:
+    (xyxy, track_ids, confidences, classes), or None when nothing is tracked.
     """
-    names = getattr(model, "names", None)
-    if isinstance(names, (list, tuple)):
-        if 0 <= cls_id < len(names):
-            return str(names[cls_id])
-    elif isinstance(names, dict):
-        # try int key, then string variants
-        return str(
-            names.get(cls_id)
-            or names.get(int(cls_id), None)
-            or names.get(str(int(cls_id)), None)
-            or names.get(str(cls_id), f"class_{cls_id}")
-        )
-    return f"class_{cls_id}"
-
-def _map_binary(name: str) -> tuple[str, tuple]:
+    if result.boxes is None or result.boxes.id is None:
+        return None
+    boxes = result.boxes.xyxy.cpu().numpy()
+    track_ids = result.boxes.id.cpu().numpy().astype(int)
+    confidences = result.boxes.conf.cpu().numpy()
+    classes = result.boxes.cls.cpu().numpy().astype(int)
+    return boxes, track_ids, confidences, classes
+
+def _emit(out, reader, writer, frame, record):
+    """Encode a drawn frame, hand its buffer back to the reader and write its results."""
+    with instrument.span("encode"):
+        out.write(frame)
+    reader.release(frame)
+    with instrument.span("write_results"):
+        writer.write(record)
+
+def _reset_trackers(model):
+    # model.track(persist=True) keeps tracker state on the predictor between calls
+    predictor = getattr(model, "predictor", None)
+    for tracker in getattr(predictor, "trackers", None) or []:
+        tracker.reset()
+
+def _track_pipelined(model, renderer, reader, out, writer, queue_size, render_workers,
+                     batch_size=1, max_batch_latency=None, device=None, on_frame=None, recorder=None,
+                     params=TRACK_PARAMS):
     """
-    Map any detector name to strictly two labels:
-    - 'pedestrian' if the name indicates a person
-    - 'vehicle' otherwise
-    Colors are BGR as required by OpenCV (green for pedestrians, blue for vehicles).
+    Decode -> detect+track -> draw -> encode, each stage in its own thread(s) and
+    joined by bounded queues. Items are lists of frames (one frame unless batching).
+    Tracking is stateful so it always runs on one thread; drawing is stateless and
+    may use several workers (output order is preserved). Frames are `reader`'s ring
+    buffers and go back to it once encoded. Tracks are passed to `recorder`, if given,
+    in frame order. `params` holds conf, iou and tracker (see track_params).
     """
-    n = name.strip().lower()
-    if any(tok in n for tok in ("person", "pedestrian", "people", "human")):
-        return "pedestrian", (0, 255, 0)   # green (BGR)
-    return "vehicle", (255, 0, 0)          # blue (BGR)
+    if batch_size > 1:
+        frame_tracker = FrameTracker(params["tracker"])
+
+        def infer(frames):
+            return track_batch(model, frame_tracker, frames, conf=params["conf"], iou=params["iou"],
+                               device=device, with_masks=renderer.draw_masks)
+    else:
+        _reset_trackers(model)
+        device_kwargs = {} if device is None else {"device": device}
+
+        def infer(frames):
+            tracked = []
+            for frame in frames:
+                start = time.perf_counter()
+                results = model.track(
+                    frame,
+                    **params,
+                    persist=True,
+                    verbose=False,
+                    **device_kwargs
+                )
+                instrument.record_model_call(start, time.perf_counter(), results, remainder="tracker_update")
+                result = results[0]
+                masks = _extract_masks(result) if renderer.draw_masks else None
+                tracked.append((frame, _extract_tracks(result), masks))
+            return tracked
+
+    def track(frames):
+        tracked = infer(frames)
+        if recorder is not None:
+            for _, tracks, _ in tracked:
+                recorder.add(tracks)
+        return tracked
 
-def track_video(input_path, output_path, model_weights, json_path):
+    def render(tracked):
+        return [(frame, renderer.draw(frame, tracks, masks)) for frame, tracks, masks in tracked]
+
+    def encode(drawn):
+        for frame, frame_objects in drawn:
+            _emit(out, reader, writer, frame, {"frame_id": writer.frames + 1, "objects": frame_objects})
+            on_frame(writer.frames)
+
+    return run_pipeline(
+        iter_batches(reader, max(1, batch_size), max_batch_latency),
+        [
+            Stage("track", track),
+            Stage("draw", render, workers=render_workers),
+            Stage("encode", encode),
+        ],
+        queue_size=queue_size,
+    )
+
+def track_video(input_path, output_path, model_weights, json_path,
+                pipelined=False, queue_size=8, render_workers=1, stage_stats=None,
+                batch_size=1, max_batch_latency=None, results_format=None, device=None,
+                progress_callback=None, cancel_event=None, model_tag=None, draw_masks=False,
+                realtime=False, target_fps=None, decoder="opencv", encoder="auto", encoder_preset="ultrafast",
+                track_cache=None, profile_dir=None, backend="torch", conf=None, iou=None):
+    """
+    Track vehicles/pedestrians in `input_path`, writing an annotated video and a JSON of
+    per-frame objects. With pipelined=True, decode, detection+tracking, drawing and
+    encoding overlap in separate threads; per-stage fps is reported in the message and,
+    if `stage_stats` is a dict, stored there by stage name.
+    With batch_size > 1, detection runs on batches of frames (flushed early after
+    `max_batch_latency` seconds) and ByteTrack is still updated frame by frame, so
+    track IDs match the unbatched run.
+    Results are streamed to `json_path` frame by frame; `results_format` is "json"
+    (indented list, the default), "jsonl" or "npz", else inferred from the suffix.
+    A summary index for the app is saved next to it (see analytics.analytics_path).
+    The model comes from the process-wide registry, so repeated calls with the same
+    weights skip loading and warm-up; concurrent callers pass distinct `model_tag`s.
+    `progress_callback(frames_done, total_frames)` is called after every frame, and
+    setting `cancel_event` (a threading.Event) stops the run at the next frame.
+    With draw_masks=True the -seg model's masks are blended under the boxes.
+    realtime=True hands over to realtime.track_video_realtime, which skips detection
+    on some frames to keep up with `target_fps` (default: the video's fps).
+    The video is decoded once by a VideoReader (`decoder` "opencv" or "ffmpeg") into
+    reused frame buffers that are drawn on in place; output goes through ffmpeg's
+    libx264 at `encoder_preset` when available, else OpenCV (see open_video_writer).
+    `track_cache` (a TrackCache or a cache directory) stores the raw tracks of each
+    run; when the same video, weights and settings come again the video and results
+    are re-rendered from it without loading the model. Runs with draw_masks=True
+    neither use nor fill the cache, since masks are not stored.
+    `backend` picks how the model runs (see backends.py): the PyTorch weights, or their
+    ONNX Runtime/OpenVINO export, FP32 or INT8, exported on first use.
+    With `profile_dir`, the run is instrumented (see instrument.py) and its per-stage
+    summary, Chrome trace and Prometheus metrics are saved there.
+    `conf` and `iou` override the thresholds of TRACK_PARAMS for this run; by default they
+    follow the operating point evaluate.py recommended for `model_weights`, if any.
+    """
+    if profile_dir is not None:
+        kwargs = {name: value for name, value in locals().items() if name != "profile_dir"}
+        with instrument.profiling(profile_dir):
+            return track_video(**kwargs)
+    params = track_params(conf, iou, weights=model_weights)
+    try:
+        model_weights = resolve_weights(model_weights, backend)
+    except Exception as e:
+        return False, f"Could not prepare the {backend} model: {str(e)}"
+    if realtime:
+        from .realtime import track_video_realtime
+        return track_video_realtime(input_path, output_path, model_weights, json_path, target_fps=target_fps,
+                                    results_format=results_format, device=device,
+                                    progress_callback=progress_callback, cancel_event=cancel_event,
+                                    model_tag=model_tag, draw_masks=draw_masks, decoder=decoder,
+                                    encoder=encoder, encoder_preset=encoder_preset, **params)
     try:
-        model = YOLO(model_weights)
+        # Per-frame model.track(persist=True) and model.predict() leave different
+        # callbacks on a YOLO instance, so they get separate ones
+        tag = "predict" if batch_size > 1 else "track-frames"
+        if model_tag:
+            tag = f"{tag}:{model_tag}"
+        cache = cached = recorder = None
+        if track_cache is not None and not draw_masks:
+            cache = track_cache if isinstance(track_cache, TrackCache) else TrackCache(track_cache)
+            cache_key = cache.key(input_path, model_weights, **params)
+            cached = cache.get(cache_key)
+            recorder = TrackRecorder() if cached is None else None
+        if cached is not None:
+            model = None
+            renderer = OverlayRenderer(SimpleNamespace(names=cached.names))
+        else:
+            model = get_model(model_weights, device=device, tag=tag)
+            renderer = OverlayRenderer(model, draw_masks=draw_masks)
+        device_kwargs = {} if device is None else {"device": device}
 
-        cap = cv2.VideoCapture(input_path)
-        if not cap.isOpened():
-            return False, f"Could not open video file: {input_path}"
+        # Frames in flight: a detection batch, one per draw worker, the encoder and read-ahead
+        ring_size = 2 * max(1, batch_size) + (render_workers if pipelined and cached is None else 0) + 2
+        try:
+            reader = VideoReader(input_path, ring_size=ring_size, decoder=decoder)
+        except IOError as e:
+            return False, str(e)
+        fps, total_frames = reader.fps, reader.frame_count
 
-        fps = _safe_fps(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        cap.release()
+        def on_frame(done):
+            if progress_callback is not None:
+                progress_callback(done, max(total_frames, done))
+            if cancel_event is not None and cancel_event.is_set():
+                raise TrackingCancelled()
 
-        out, actual_out_path, used_codec = _open_writer(output_path, fps, (width, height))
+        try:
+            out, actual_out_path, used_codec = open_video_writer(output_path, fps, reader.size, encoder,
+                                                                 encoder_preset)
+        except Exception:
+            reader.close()
+            raise
         if out is None:
+            reader.close()
             return False, "Failed to initialize VideoWriter with mp4v/XVID/avc1"
 
-        results_data = []
+        writer = AnalyticsWriter(open_results_writer(json_path, results_format), fps)
         frame_id = 0
+        timing = ""
+
+        try:
+            if cached is not None:
+                for frame, tracks in zip(reader, cached):
+                    frame_id += 1
+                    frame_objects = renderer.draw(frame, tracks)
+                    _emit(out, reader, writer, frame, {"frame_id": frame_id, "objects": frame_objects})
+                    on_frame(frame_id)
+                timing = " (replayed from track cache)"
+            elif pipelined:
+                stats = _track_pipelined(model, renderer, reader, out, writer, queue_size, render_workers,
+                                         batch_size, max_batch_latency, device, on_frame, recorder, params)
+                frame_id = writer.frames
+                if stage_stats is not None:
+                    stage_stats.update({s.name: s.summary() for s in stats})
+                    stage_stats["model"] = get_registry().info(model_weights, device=device, tag=tag)
+                timing = f" ({format_stage_stats(stats)})"
+            elif batch_size > 1:
+                tracked = batched_track(
+                    model,
+                    reader,
+                    batch_size=batch_size,
+                    max_latency=max_batch_latency,
+                    **params,
+                    device=device,
+                    with_masks=draw_masks
+                )
+                for frame, tracks, masks in tracked:
+                    frame_id += 1
+                    if recorder is not None:
+                        recorder.add(tracks)
+                    frame_objects = renderer.draw(frame, tracks, masks)
+                    _emit(out, reader, writer, frame, {"frame_id": frame_id, "objects": frame_objects})
+                    on_frame(frame_id)
+            else:
+                _reset_trackers(model)
+                for frame in reader:
+                    frame_id += 1
+                    start = time.perf_counter()
+                    results = model.track(
+                        frame,
+                        **params,
+                        persist=True,
+                        verbose=False,
+                        **device_kwargs
+                    )
+                    instrument.record_model_call(start, time.perf_counter(), results, remainder="tracker_update")
+                    result = results[0]
+                    # Draw straight onto the decoded buffer; inference is done with it
+                    tracks = _extract_tracks(result)
+                    if recorder is not None:
+                        recorder.add(tracks)
+                    masks = _extract_masks(result) if draw_masks else None
+                    frame_objects = renderer.draw(frame, tracks, masks)
+                    _emit(out, reader, writer, frame, {"frame_id": frame_id, "objects": frame_objects})
+                    on_frame(frame_id)
+        finally:
+            reader.close()
+            out.release()
+            writer.close()
 
-        results = model.track(
-            source=input_path,
-            conf=0.5,
-            iou=0.7,
-            tracker="bytetrack.yaml",
-            stream=True,
-            verbose=False
-        )
-
-        for result in results:
-            frame_id += 1
-            frame = result.orig_img.copy()
-            frame_objects = []
-
-            if result.boxes is not None and result.boxes.id is not None:
-                boxes = result.boxes.xyxy.cpu().numpy()
-                track_ids = result.boxes.id.cpu().numpy().astype(int)
-                confidences = result.boxes.conf.cpu().numpy()
-                classes = result.boxes.cls.cpu().numpy().astype(int)
-
-                for box, track_id, conf, cls_id in zip(boxes, track_ids, confidences, classes):
-                    x1, y1, x2, y2 = map(int, box)
-
-                    # Robust class-name fetch, then strict two-class mapping
-                    raw_name = _get_class_name(model, int(cls_id))          # model.names access can vary [Ultralytics]
-                    normalized, color = _map_binary(raw_name)               # person -> pedestrian, else vehicle
-
-                    # Draw (BGR color order for OpenCV)
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                    label = f"{normalized.title()}-#{track_id}"
-                    text_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-                    cv2.rectangle(frame, (x1, y1 - text_size[1] - 10), (x1 + text_size[0], y1), color, -1)
-                    cv2.putText(frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-                    frame_objects.append({
-                        "id": int(track_id),
-                        "class": normalized,     # strictly 'pedestrian' or 'vehicle'
-                        "confidence": float(conf),
-                        "bbox": [x1, y1, x2, y2]
-                    })
-
-            results_data.append({"frame_id": frame_id, "objects": frame_objects})
-            out.write(frame)
-
-        out.release()
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(results_data, f, indent=2)
-
-        return True, f"Saved {frame_id} frames using {used_codec} at {actual_out_path}"
+        if recorder is not None:
+            cache.put(cache_key, recorder, model.names, input=str(input_path), weights=str(model_weights),
+                      fps=fps, size=list(reader.size), **params)
+        return True, f"Saved {frame_id} frames using {used_codec} at {actual_out_path}{timing}"
+    except TrackingCancelled:
+        return False, "Tracking cancelled"
     except Exception as e:
         return False, f"An error occurred during processing: {str(e)}"
@@ -0,0 +1,54 @@
+from collections import Counter, defaultdict
+
+
+def bbox_iou(a, b) -> float:
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(ix2 - ix1, 0) * max(iy2 - iy1, 0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def id_agreement(reference, candidate, iou_threshold: float = 0.5) -> dict:
+    """
+    How well the track IDs of `candidate` agree with `reference` (both iterables of
+    {"frame_id", "objects"} records, e.g. a full-rate run vs a segmented one).
+
+    Objects are paired per frame by greedy box IoU. Each reference ID is then
+    assigned the candidate ID it was paired with most often; `agreement` is the
+    share of pairs that use that ID, and `id_switches` counts how often the
+    candidate ID of a reference track changes between consecutive pairs.
+    """
+    cand_by_frame = {rec["frame_id"]: rec["objects"] for rec in candidate}
+    pairs = defaultdict(list)
+    ref_objects = 0
+
+    for rec in reference:
+        ref_objs = rec["objects"]
+        ref_objects += len(ref_objs)
+        cand_objs = list(cand_by_frame.get(rec["frame_id"], []))
+        scored = sorted(
+            ((bbox_iou(r["bbox"], c["bbox"]), i, j)
+             for i, r in enumerate(ref_objs) for j, c in enumerate(cand_objs)),
+            reverse=True,
+        )
+        used_r, used_c = set(), set()
+        for iou, i, j in scored:
+            if iou < iou_threshold:
+                break
+            if i in used_r or j in used_c:
+                continue
+            used_r.add(i)
+            used_c.add(j)
+            pairs[ref_objs[i]["id"]].append(cand_objs[j]["id"])
+
+    matched = sum(len(ids) for ids in pairs.values())
+    consistent = sum(Counter(ids).most_common(1)[0][1] for ids in pairs.values())
+    switches = sum(sum(1 for a, b in zip(ids, ids[1:]) if a != b) for ids in pairs.values())
+    return {
+        "reference_objects": ref_objects,
+        "matched": matched,
+        "recall": matched / ref_objects if ref_objects else 1.0,
+        "agreement": consistent / matched if matched else 1.0,
+        "id_switches": switches,
+    }
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import threading
+
+_digest_cache = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(path: str, algo: str = "sha256", chunk_size: int = 1 << 20) -> str:
+    """
+    Hex digest of a file's contents, read in chunks. Results are memoized per
+    (path, size, mtime) so hashing the same unchanged upload again is free.
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns, algo)
+    with _digest_lock:
+        if key in _digest_cache:
+            return _digest_cache[key]
+
+    h = hashlib.new(algo)
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            h.update(block)
+    digest = h.hexdigest()
+    with _digest_lock:
+        _digest_cache[key] = digest
+    return digest
+
+
+def remember_digest(path: str, digest: str, algo: str = "sha256"):
+    """Memoize a digest computed while writing `path` (e.g. while streaming it to disk), so file_digest() skips the read."""
+    st = os.stat(path)
+    with _digest_lock:
+        _digest_cache[(os.path.abspath(path), st.st_size, st.st_mtime_ns, algo)] = digest
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{int(n)} B"
+        n /= 1024
@@ -0,0 +1,260 @@
+import atexit
+import json
+import os
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+
+import numpy as np
+
+# Setting this to a directory enables instrumentation for the whole process and
+# writes the reports there at exit
+PROFILE_ENV = "PIPELINE_PROFILE"
+
+# Histogram bucket bounds in seconds for the Prometheus dump
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SUMMARY_NAME = "stages.json"
+TRACE_NAME = "trace.json"
+METRICS_NAME = "metrics.prom"
+
+_recorder = None
+
+
+class Recorder:
+    """
+    Collects stage durations (for percentiles and histograms), counters, and up to
+    `max_events` timeline events for a Chrome trace. Thread-safe; timestamps are
+    perf_counter based, relative to when the recorder was created.
+    """
+
+    def __init__(self, max_events: int = 200_000):
+        self.max_events = max_events
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.counters = {}
+        self.events = []
+        self.dropped_events = 0
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, seconds: float, args: dict | None = None, timeline: bool = True):
+        tid = threading.get_ident()
+        with self._lock:
+            samples = self.durations.get(name)
+            if samples is None:
+                samples = self.durations[name] = array("d")
+            samples.append(seconds)
+            if not timeline:
+                return
+            if tid not in self._threads:
+                self._threads[tid] = threading.current_thread().name
+            if len(self.events) < self.max_events:
+                self.events.append((name, start, seconds, tid, args))
+            else:
+                self.dropped_events += 1
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> dict:
+        """Per stage: calls, total seconds and latency percentiles in milliseconds, busiest first."""
+        with self._lock:
+            durations = {name: np.frombuffer(samples, dtype=np.float64).copy()
+                         for name, samples in self.durations.items()}
+            counters = dict(self.counters)
+        stages = {}
+        for name, d in sorted(durations.items(), key=lambda item: -item[1].sum()):
+            ms = d * 1000
+            stages[name] = {
+                "calls": int(len(d)),
+                "total_s": round(float(d.sum()), 4),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p90_ms": round(float(np.percentile(ms, 90)), 3),
+                "p99_ms": round(float(np.percentile(ms, 99)), 3),
+                "max_ms": round(float(ms.max()), 3),
+            }
+        return {"wall_s": round(time.perf_counter() - self.started, 4), "stages": stages, "counters": counters}
+
+    def chrome_trace(self) -> dict:
+        """Timeline in the Trace Event format (chrome://tracing, ui.perfetto.dev)."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        tids = {tid: i for i, tid in enumerate(threads)}
+        trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tids[tid], "args": {"name": name}}
+                 for tid, name in threads.items()]
+        for name, start, seconds, tid, args in events:
+            event = {"name": name, "ph": "X", "pid": pid, "tid": tids[tid],
+                     "ts": round((start - self.started) * 1e6, 1), "dur": round(seconds * 1e6, 1)}
+            if args:
+                event["args"] = args
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms",
+                "otherData": {"dropped_events": self.dropped_events}}
+
+    def prometheus(self, prefix: str = "pipeline") -> str:
+        """Stage histograms and counters in the Prometheus text exposition format."""
+        with self._lock:
+            durations = {name: np.frombuffer(samples, dtype=np.float64).copy()
+                         for name, samples in self.durations.items()}
+            counters = dict(self.counters)
+        lines = [f"# HELP {prefix}_stage_seconds Time spent in each pipeline stage.",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        for name, d in sorted(durations.items()):
+            d.sort()
+            for bound in BUCKETS:
+                count = int(np.searchsorted(d, bound, side="right"))
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {len(d)}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {float(d.sum())}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {len(d)}')
+        if counters:
+            lines += [f"# HELP {prefix}_events_total Counted pipeline events.",
+                      f"# TYPE {prefix}_events_total counter"]
+            lines += [f'{prefix}_events_total{{name="{name}"}} {value}' for name, value in sorted(counters.items())]
+        return "\n".join(lines) + "\n"
+
+    def save(self, output_dir) -> dict:
+        """Write stages.json, trace.json and metrics.prom to `output_dir`; returns their paths."""
+        os.makedirs(output_dir, exist_ok=True)
+        paths = {name: os.path.join(output_dir, name) for name in (SUMMARY_NAME, TRACE_NAME, METRICS_NAME)}
+        with open(paths[SUMMARY_NAME], "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        with open(paths[TRACE_NAME], "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        with open(paths[METRICS_NAME], "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        return paths
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "args", "start")
+
+    def __init__(self, recorder, name, args):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.add(self.name, self.start, time.perf_counter() - self.start, self.args)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+def current() -> Recorder | None:
+    return _recorder
+
+
+def span(name: str, **args):
+    """Time a `with` block as stage `name`. A shared no-op when instrumentation is off."""
+    recorder = _recorder
+    if recorder is None:
+        return _NULL_SPAN
+    return _Span(recorder, name, args or None)
+
+
+def count(name: str, value: float = 1):
+    recorder = _recorder
+    if recorder is not None:
+        recorder.count(name, value)
+
+
+def record(name: str, start: float, seconds: float, timeline: bool = True):
+    """Add a duration measured elsewhere (start is a perf_counter timestamp)."""
+    recorder = _recorder
+    if recorder is not None:
+        recorder.add(name, start, seconds, timeline=timeline)
+
+
+def record_sequence(start: float, end: float, parts, remainder: str | None = None):
+    """
+    Split the interval [start, end] into consecutive stages of the given
+    (name, seconds) durations, e.g. the per-phase speeds Ultralytics reports for
+    one call; whatever time is left over is recorded as `remainder`, if given.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return
+    t = start
+    for name, seconds in parts:
+        seconds = max(0.0, min(seconds, end - t))
+        recorder.add(name, t, seconds)
+        t += seconds
+    if remainder is not None:
+        recorder.add(remainder, t, max(0.0, end - t))
+
+
+def record_model_call(start: float, end: float, results, remainder: str | None = None):
+    """
+    Record an Ultralytics predict/track call as preprocess, inference and postprocess
+    from the per-image speeds (ms) on its results; time not covered by them (e.g. the
+    tracker update inside model.track) goes to `remainder`.
+    """
+    if _recorder is None:
+        return
+    speed = (getattr(results[0], "speed", None) or {}) if len(results) else {}
+    parts = [(name, speed.get(name, 0.0) * len(results) / 1000) for name in ("preprocess", "inference", "postprocess")]
+    record_sequence(start, end, parts, remainder)
+
+
+def enable(recorder: Recorder | None = None) -> Recorder:
+    global _recorder
+    _recorder = recorder or Recorder()
+    return _recorder
+
+
+def disable() -> Recorder | None:
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+@contextmanager
+def profiling(output_dir=None):
+    """
+    Record everything inside the block with a fresh Recorder (restoring whatever
+    was active before) and, if `output_dir` is given, save the reports there.
+    """
+    global _recorder
+    previous = _recorder
+    recorder = enable()
+    try:
+        yield recorder
+    finally:
+        _recorder = previous
+        if output_dir is not None:
+            recorder.save(output_dir)
+
+
+def _enable_from_env():
+    output_dir = os.environ.get(PROFILE_ENV)
+    if output_dir:
+        recorder = enable()
+        atexit.register(recorder.save, output_dir)
+
+
+_enable_from_env()
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from .byte_tracker import track_params, track_video
+from .fileutils import file_digest
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Job:
+    """A tracking job and its live progress, updated from a worker thread."""
+
+    def __init__(self, job_id: str, input_path: str, model_weights: str, params: dict, cache_key: str):
+        self.id = job_id
+        self.input_path = input_path
+        self.model_weights = model_weights
+        self.params = params
+        self.cache_key = cache_key
+        self.state = QUEUED
+        self.frames_done = 0
+        self.total_frames = 0
+        self.started_at = None
+        self.finished_at = None
+        self.message = ""
+        self.output_video_path = None
+        self.results_json_path = None
+        self.profile_path = None
+        self.from_cache = False
+        self.cancel_event = threading.Event()
+
+    @property
+    def fps(self) -> float:
+        if not self.started_at or not self.frames_done:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return self.frames_done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        fps = self.fps
+        if self.state != RUNNING or fps <= 0 or self.total_frames <= 0:
+            return None
+        return max(self.total_frames - self.frames_done, 0) / fps
+
+    @property
+    def active(self) -> bool:
+        return self.state in (QUEUED, RUNNING)
+
+    def snapshot(self) -> dict:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "frames_done": self.frames_done,
+            "total_frames": self.total_frames,
+            "fps": round(self.fps, 2),
+            "eta_s": None if self.eta is None else round(self.eta, 1),
+            "message": self.message,
+            "output_video_path": self.output_video_path,
+            "results_json_path": self.results_json_path,
+            "profile_path": self.profile_path,
+            "from_cache": self.from_cache,
+        }
+
+
+def _worker_main(conn, cancel_event):
+    """
+    Child-process loop: run one job at a time and stream progress back over `conn`.
+    ByteTrack numbers tracks with a process-wide counter that every tracker reset
+    zeroes, so concurrent jobs must not share a process.
+    """
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        job_id, args, kwargs = msg
+        cancel_event.clear()
+        last = [0.0]
+
+        def progress(done, total):
+            now = time.time()
+            if now - last[0] >= 0.2:
+                last[0] = now
+                conn.send(("progress", job_id, done, total))
+
+        try:
+            success, message = track_video(*args, progress_callback=progress, cancel_event=cancel_event, **kwargs)
+        except Exception as e:
+            success, message = False, f"An error occurred during processing: {str(e)}"
+        conn.send(("done", job_id, success, message))
+
+
+class _WorkerProcess:
+    def __init__(self, ctx, index: int):
+        self.ctx = ctx
+        self.index = index
+        self._start()
+
+    def _start(self):
+        self.conn, child_conn = self.ctx.Pipe()
+        self.cancel_event = self.ctx.Event()
+        self.process = self.ctx.Process(
+            target=_worker_main, args=(child_conn, self.cancel_event),
+            name=f"tracking-job-{self.index}", daemon=True,
+        )
+        self.process.start()
+
+    def run(self, job, args, kwargs, progress):
+        """Run one job in the child, blocking until it finishes. Returns (success, message)."""
+        if not self.process.is_alive():
+            self._start()
+        self.conn.send((job.id, args, kwargs))
+        try:
+            while True:
+                if job.cancel_event.is_set():
+                    self.cancel_event.set()
+                if not self.conn.poll(0.2):
+                    continue
+                msg = self.conn.recv()
+                if msg[0] == "progress":
+                    progress(msg[2], msg[3])
+                else:
+                    return msg[2], msg[3]
+        except (EOFError, OSError):
+            # The child died (e.g. out of memory); replace it for the next job
+            self.process.join(timeout=1)
+            self._start()
+            return False, "Tracking worker process exited unexpectedly"
+
+
+class JobScheduler:
+    """
+    Runs track_video jobs on `workers` background processes so the caller (e.g. the
+    Streamlit script thread) never blocks. Each worker process keeps its own model
+    loaded between jobs. Finished outputs are kept in `cache_dir` under a key made
+    of the video content hash, the weights hash and the tracking parameters, so
+    re-submitting the same upload completes immediately. Raw tracks are also kept in
+    a TrackCache under `cache_dir`/tracks, so a resubmission that only changes how
+    results are rendered or exported (e.g. results_format) skips inference.
+    """
+
+    def __init__(self, workers: int = 1, cache_dir: str | None = None):
+        self.cache_dir = Path(cache_dir or os.path.join(tempfile.gettempdir(), "tracker_jobs"))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.track_cache_dir = str(self.cache_dir / "tracks")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        # spawn, not fork: forking a process that already runs torch threads can deadlock
+        ctx = multiprocessing.get_context("spawn")
+        self._workers = [_WorkerProcess(ctx, i) for i in range(max(1, int(workers)))]
+        self._threads = [
+            threading.Thread(target=self._worker, args=(i,), name=f"tracking-job-{i}", daemon=True)
+            for i in range(max(1, int(workers)))
+        ]
+        for t in self._threads:
+            t.start()
+
+    @staticmethod
+    def cache_key(input_path: str, model_weights: str, params: dict) -> str:
+        payload = json.dumps(
+            {"video": file_digest(input_path), "weights": file_digest(model_weights), "params": params,
+             "track": track_params(params.get("conf"), params.get("iou"), weights=model_weights)},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _cached_outputs(self, key: str):
+        entry = self.cache_dir / key
+        manifest = entry / "manifest.json"
+        if not manifest.exists():
+            return None
+        with open(manifest, "r", encoding="utf-8") as f:
+            outputs = json.load(f)
+        video = entry / outputs["video"]
+        results = entry / outputs["results"]
+        if video.exists() and results.exists():
+            profile = entry / outputs["profile"] if outputs.get("profile") else None
+            return str(video), str(results), str(profile) if profile and profile.exists() else None
+        return None
+
+    def submit(self, input_path: str, model_weights: str, **track_kwargs) -> str:
+        """
+        Queue a tracking job and return its id. Extra kwargs go to track_video, except
+        profile=True, which saves a stage profile (see instrument.py) with the outputs.
+        """
+        key = self.cache_key(input_path, model_weights, track_kwargs)
+        job = Job(uuid.uuid4().hex[:12], input_path, model_weights, track_kwargs, key)
+
+        cached = self._cached_outputs(key)
+        if cached:
+            job.output_video_path, job.results_json_path, job.profile_path = cached
+            job.state, job.from_cache, job.message = DONE, True, "Loaded from cache"
+
+        with self._lock:
+            self._jobs[job.id] = job
+        if not cached:
+            self._queue.put(job.id)
+        return job.id
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.cancel_event.set()
+        if job.state == QUEUED:
+            job.state, job.message = CANCELLED, "Cancelled before start"
+        return True
+
+    def jobs(self) -> list[dict]:
+        with self._lock:
+            return [job.snapshot() for job in self._jobs.values()]
+
+    def pinned_paths(self) -> list[str]:
+        """Input videos of queued or running jobs, which must not be evicted from disk."""
+        with self._lock:
+            return [job.input_path for job in self._jobs.values() if job.active]
+
+    def _worker(self, index: int):
+        while True:
+            job = self.get(self._queue.get())
+            if job is None or job.state != QUEUED:
+                continue
+            self._run(job, self._workers[index])
+
+    def _run(self, job: Job, worker: _WorkerProcess):
+        # Write into a private folder and rename it into place only on success
+        partial = Path(tempfile.mkdtemp(prefix=f"{job.cache_key}.", dir=self.cache_dir))
+        results_name = f"tracking_results.{job.params.get('results_format') or 'json'}"
+
+        def progress(done, total):
+            job.frames_done, job.total_frames = done, total
+
+        job.state, job.started_at = RUNNING, time.time()
+        try:
+            args = (job.input_path, str(partial / "tracked"), job.model_weights, str(partial / results_name))
+            kwargs = {**job.params, "track_cache": self.track_cache_dir}
+            profile = "profile" if kwargs.pop("profile", False) else None
+            if profile:
+                kwargs["profile_dir"] = str(partial / profile)
+            success, message = worker.run(job, args, kwargs, progress)
+            job.finished_at = time.time()
+            job.message = message
+            if not success:
+                job.state = CANCELLED if job.cancel_event.is_set() else FAILED
+                shutil.rmtree(partial, ignore_errors=True)
+                return
+
+            video = next(p.name for p in partial.iterdir() if p.stem == "tracked")
+            with open(partial / "manifest.json", "w", encoding="utf-8") as f:
+                json.dump({"video": video, "results": results_name, "profile": profile, "input": job.input_path}, f)
+
+            final = self.cache_dir / job.cache_key
+            if final.exists():
+                shutil.rmtree(final, ignore_errors=True)
+            os.replace(partial, final)
+            job.output_video_path = str(final / video)
+            job.results_json_path = str(final / results_name)
+            job.profile_path = str(final / profile) if profile else None
+            job.frames_done = job.total_frames = max(job.frames_done, job.total_frames)
+            job.state = DONE
+        except Exception as e:
+            job.finished_at = time.time()
+            job.state, job.message = FAILED, f"An error occurred during processing: {str(e)}"
+            shutil.rmtree(partial, ignore_errors=True)
@@ -0,0 +1,345 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from . import instrument
+from .analytics import AnalyticsWriter
+from .backends import BACKENDS, resolve_weights
+from .batching import FrameTracker, tracked_masks
+from .byte_tracker import track_params
+from .model_registry import get_model
+from .render import OverlayRenderer
+from .results_io import open_results_writer
+from .video_io import _safe_fps
+
+# Default bound on capture-to-result latency, in seconds
+DEFAULT_MAX_LATENCY = 0.5
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+
+def _parse_source(source):
+    """("camera", index), ("url", url) or ("file", path) for a source given as int or str."""
+    if isinstance(source, int) or (isinstance(source, str) and source.strip().isdigit()):
+        return "camera", int(source)
+    source = str(source)
+    if "://" in source:
+        return "url", source
+    return "file", source
+
+
+class FrameSource:
+    """
+    Frames of a camera index, a stream URL (rtsp://, http://, ...) or a video file,
+    read on a background thread into a buffer of up to `buffer_size` frames, each
+    stamped with the perf_counter time it was captured.
+
+    Cameras and URLs are live: the grabber never waits for the consumer, and when
+    the buffer is full its oldest frame is dropped. A file stands in for a live
+    source when `pace` is set (the default): frames are released at the video's fps
+    and, with `loop`, the file starts over at its end. With pace=False a file is read
+    as fast as it is consumed and no frame is ever dropped.
+    """
+
+    def __init__(self, source, loop: bool = False, pace: bool = True, buffer_size: int = 4):
+        self.kind, self.source = _parse_source(source)
+        self.loop = loop and self.kind == "file"
+        self.live = self.kind != "file" or pace
+        self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            raise IOError(f"Could not open video source: {self.source}")
+        self.fps = _safe_fps(self._cap.get(cv2.CAP_PROP_FPS))
+        self.size = (int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.captured = 0
+        self.dropped = 0
+        self._buffer = deque()
+        self._buffer_size = max(1, int(buffer_size))
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._done = False
+        self._error = None
+        self._thread = threading.Thread(target=self._grab, name="live-grab", daemon=True)
+        self._thread.start()
+
+    def _read(self):
+        with instrument.span("decode"):
+            ok, frame = self._cap.read()
+            if not ok and self.loop and self.captured:
+                self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = self._cap.read()
+        return frame if ok else None
+
+    def _grab(self):
+        pace = self.kind == "file" and self.live
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                frame = self._read()
+                if frame is None:
+                    break
+                if pace:
+                    delay = start + self.captured / self.fps - time.perf_counter()
+                    if delay > 0 and self._stop.wait(delay):
+                        break
+                with self._cond:
+                    if not self.live:
+                        while len(self._buffer) >= self._buffer_size and not self._stop.is_set():
+                            self._cond.wait(0.1)
+                    elif len(self._buffer) >= self._buffer_size:
+                        self._buffer.popleft()
+                        self.dropped += 1
+                    self.captured += 1
+                    self._buffer.append((self.captured, time.perf_counter(), frame))
+                    self._cond.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def get(self, max_age: float | None = None):
+        """
+        Next frame as (frame number, capture time, frame), or None once the source has
+        ended. Buffered frames older than `max_age` seconds are dropped as long as a
+        newer one is waiting, so a stale frame is only returned when it is the newest.
+        """
+        with self._cond:
+            while not self._buffer and not self._done:
+                self._cond.wait()
+            if not self._buffer:
+                if self._error is not None:
+                    raise self._error
+                return None
+            if max_age is not None and self.live:
+                now = time.perf_counter()
+                while len(self._buffer) > 1 and now - self._buffer[0][1] > max_age:
+                    self._buffer.popleft()
+                    self.dropped += 1
+            item = self._buffer.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+        self._cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LatencyStats:
+    """Capture-to-result latencies and frame counters of one live run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latencies = []
+        self.processing = []
+        self.captured = 0
+        self.dropped = 0
+
+    def add(self, latency: float, processing: float):
+        self.latencies.append(latency)
+        self.processing.append(processing)
+
+    @property
+    def frames(self) -> int:
+        return len(self.latencies)
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        summary = {
+            "frames": self.frames,
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "fps": round(self.frames / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+        if self.latencies:
+            latencies = np.asarray(self.latencies) * 1000
+            summary["latency_ms"] = {
+                **{f"p{p}": round(float(v), 1)
+                   for p, v in zip(LATENCY_PERCENTILES, np.percentile(latencies, LATENCY_PERCENTILES))},
+                "mean": round(float(latencies.mean()), 1),
+                "max": round(float(latencies.max()), 1),
+            }
+            summary["processing_ms"] = round(float(np.mean(self.processing)) * 1000, 1)
+        return summary
+
+
+class LiveFrame:
+    """
+    One processed frame: `frame_id` is its number in the source (frames dropped before
+    it count too), `image` the frame with the tracks drawn on it, `objects` its JSON
+    objects, and `latency` the seconds from capture until the result was ready.
+    """
+
+    __slots__ = ("frame_id", "image", "objects", "captured_at", "latency", "processing")
+
+    def __init__(self, frame_id, image, objects, captured_at, latency, processing):
+        self.frame_id = frame_id
+        self.image = image
+        self.objects = objects
+        self.captured_at = captured_at
+        self.latency = latency
+        self.processing = processing
+
+    @property
+    def counts(self) -> dict:
+        counts = {"vehicle": 0, "pedestrian": 0}
+        for obj in self.objects:
+            counts[obj["class"]] = counts.get(obj["class"], 0) + 1
+        return counts
+
+    def record(self) -> dict:
+        """Results record like track_video's, plus the frame's latency."""
+        return {"frame_id": self.frame_id, "objects": self.objects, "latency_ms": round(self.latency * 1000, 1)}
+
+
+class LiveTracker:
+    """
+    Tracks a live source frame by frame and hands each result out as soon as it is
+    ready, through stream() (a generator) or astream() (an async iterator).
+
+    To keep the capture-to-result latency within `max_latency` seconds, buffered
+    frames that could no longer be processed in time (given the running average
+    processing time) are dropped. ByteTrack's Kalman filter and frame counter only
+    advance once per call, so the tracker is stepped over every dropped frame with
+    FrameTracker.predict() (as realtime.py does for skipped frames) before the next
+    detections are associated. `stats` holds the latency distribution of the current
+    or last run.
+    `conf` and `iou` override the thresholds of TRACK_PARAMS (see track_params).
+    """
+
+    def __init__(self, model_weights, max_latency: float | None = DEFAULT_MAX_LATENCY, draw_masks: bool = False,
+                 device=None, model_tag=None, backend: str = "torch", smoothing: float = 0.3, conf=None, iou=None):
+        self.params = track_params(conf, iou, weights=model_weights)
+        weights = resolve_weights(model_weights, backend)
+        self.model = get_model(weights, device=device, tag=f"live:{model_tag}" if model_tag else "live")
+        self.renderer = OverlayRenderer(self.model, draw_masks=draw_masks)
+        self.max_latency = max_latency
+        self.draw_masks = draw_masks
+        self.predict_kwargs = {"conf": self.params["conf"], "iou": self.params["iou"], "verbose": False}
+        if device is not None:
+            self.predict_kwargs["device"] = device
+        self.smoothing = smoothing
+        self.stats = LatencyStats()
+
+    def stream(self, source, loop: bool = False, pace: bool = True, max_frames: int | None = None,
+               duration: float | None = None, json_path=None, results_format=None, stop_event=None):
+        """
+        Generator of LiveFrames for `source` (camera index, stream URL or video file;
+        see FrameSource for `loop` and `pace`). Stops when the source ends, after
+        `max_frames` results or `duration` seconds, once `stop_event` is set, or when
+        the generator is closed. With `json_path`, the records are also written there.
+        """
+        frame_tracker = FrameTracker(self.params["tracker"])
+        self.stats = stats = LatencyStats()
+        writer = None
+        processing_s = 0.0
+        last_id = 0
+        with FrameSource(source, loop=loop, pace=pace) as frames:
+            if json_path is not None:
+                writer = AnalyticsWriter(open_results_writer(json_path, results_format), frames.fps)
+            try:
+                while max_frames is None or stats.frames < max_frames:
+                    if duration is not None and time.perf_counter() - stats.started >= duration:
+                        break
+                    if stop_event is not None and stop_event.is_set():
+                        break
+                    max_age = None if self.max_latency is None else self.max_latency - processing_s
+                    item = frames.get(max_age)
+                    if item is None:
+                        break
+                    frame_id, captured_at, frame = item
+                    start = time.perf_counter()
+
+                    results = self.model.predict(frame, **self.predict_kwargs)
+                    instrument.record_model_call(start, time.perf_counter(), results)
+                    result = results[0]
+                    for _ in range(frame_id - last_id - 1):
+                        frame_tracker.predict()
+                    last_id = frame_id
+                    tracks = frame_tracker.update(result)
+                    masks = tracked_masks(result, frame_tracker.indices) if self.draw_masks else None
+                    objects = self.renderer.draw(frame, tracks, masks)
+
+                    now = time.perf_counter()
+                    seconds = now - start
+                    processing_s = seconds if not stats.frames else \
+                        processing_s + self.smoothing * (seconds - processing_s)
+                    dropped = frames.dropped - stats.dropped
+                    stats.captured, stats.dropped = frames.captured, frames.dropped
+                    stats.add(now - captured_at, seconds)
+                    if dropped:
+                        instrument.count("live_dropped_frames", dropped)
+                    instrument.record("live_latency", captured_at, now - captured_at, timeline=False)
+
+                    live_frame = LiveFrame(frame_id, frame, objects, captured_at, now - captured_at, seconds)
+                    if writer is not None:
+                        with instrument.span("write_results"):
+                            writer.write(live_frame.record())
+                    yield live_frame
+            finally:
+                stats.captured, stats.dropped = frames.captured, frames.dropped
+                if writer is not None:
+                    writer.close()
+
+    async def astream(self, source, **stream_kwargs):
+        """
+        stream() as an async iterator: each frame is processed on a worker thread, so
+        the event loop stays free while detection runs.
+        """
+        loop = asyncio.get_running_loop()
+        frames = self.stream(source, **stream_kwargs)
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-track") as pool:
+            try:
+                while True:
+                    live_frame = await loop.run_in_executor(pool, next, frames, None)
+                    if live_frame is None:
+                        return
+                    yield live_frame
+            finally:
+                await loop.run_in_executor(pool, frames.close)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track a camera, stream URL or (looping, paced) video file live")
+    parser.add_argument("source", help="camera index, stream URL or video file")
+    parser.add_argument("weights")
+    parser.add_argument("--max-latency", type=float, default=DEFAULT_MAX_LATENCY,
+                        help="seconds from capture to result before frames are dropped (0 = never drop)")
+    parser.add_argument("--loop", action="store_true", help="start a video file over at its end")
+    parser.add_argument("--no-pace", action="store_true", help="read a video file as fast as it is processed")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--json", default=None, help="also write the per-frame results here")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="see tracking/backends.py")
+    parser.add_argument("--conf", type=float, default=None, help="default: the weights' recommended point (see track_params)")
+    parser.add_argument("--iou", type=float, default=None, help="default: the weights' recommended point (see track_params)")
+    parser.add_argument("--show", action="store_true", help="display the annotated frames in a window")
+    args = parser.parse_args()
+
+    tracker = LiveTracker(args.weights, max_latency=args.max_latency or None, backend=args.backend,
+                          conf=args.conf, iou=args.iou)
+    try:
+        for live_frame in tracker.stream(args.source, loop=args.loop, pace=not args.no_pace,
+                                         max_frames=args.max_frames, duration=args.duration, json_path=args.json):
+            if args.show:
+                cv2.imshow("live tracking", live_frame.image)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(tracker.stats.summary(), indent=2))
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from ultralytics import YOLO
+
+from . import instrument
+from .backends import exported_task
+
+
+def _weights_mtime(path: str) -> int:
+    # Exported models (e.g. OpenVINO) are directories; use the newest file inside
+    if os.path.isdir(path):
+        mtimes = [os.stat(os.path.join(root, f)).st_mtime_ns
+                  for root, _, files in os.walk(path) for f in files]
+        return max(mtimes, default=os.stat(path).st_mtime_ns)
+    return os.stat(path).st_mtime_ns
+
+
+def _model_bytes(model, weights_path: str) -> int:
+    """Approximate resident size: parameter bytes of a PyTorch model, else file size."""
+    try:
+        return int(sum(p.numel() * p.element_size() for p in model.model.parameters()))
+    except Exception:
+        if not os.path.exists(weights_path):
+            return 0
+        if os.path.isdir(weights_path):
+            return sum(os.path.getsize(os.path.join(root, f))
+                       for root, _, files in os.walk(weights_path) for f in files)
+        return os.path.getsize(weights_path)
+
+
+class ModelRegistry:
+    """
+    Loads each YOLO model once per process and hands the same instance out again.
+    Entries are keyed by (weights path, file mtime, device, tag) so a retrained weights
+    file is picked up automatically, and are evicted least-recently-used once more than
+    `max_models` are loaded or their estimated size exceeds `max_bytes`.
+
+    A YOLO instance keeps predictor/tracker state between calls, so callers that use
+    model.track() and model.predict() on the same weights, or run jobs concurrently,
+    should pass distinct `tag`s to get separate instances.
+    """
+
+    def __init__(self, max_models: int = 4, max_bytes: int | None = None, warmup_imgsz: int = 640):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.warmup_imgsz = warmup_imgsz
+        self._models = OrderedDict()
+        self._lock = threading.RLock()
+        self.timings = {}
+
+    @staticmethod
+    def _key(weights: str, device, tag) -> tuple:
+        device = str(device) if device is not None else None
+        path = os.path.abspath(weights)
+        if not os.path.exists(path):
+            # A hub / auto-download name such as "yolov8s-seg.pt" that YOLO() resolves itself
+            return weights, None, device, tag
+        return path, _weights_mtime(path), device, tag
+
+    def get(self, weights: str, device=None, warmup: bool = True, tag: str | None = None):
+        key = self._key(weights, device, tag)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.timings[key]["hits"] += 1
+                return self._models[key][0]
+
+            # A different mtime for the same path/device/tag means the file changed
+            for stale in [k for k in self._models if k[0] == key[0] and k[2:] == key[2:]]:
+                self.evict(stale)
+
+            t0 = time.perf_counter()
+            model = YOLO(weights, task=exported_task(weights))
+            load_s = time.perf_counter() - t0
+            instrument.record("model_load", t0, load_s)
+
+            warmup_s = 0.0
+            if warmup:
+                t0 = time.perf_counter()
+                self.warmup(model, device)
+                warmup_s = time.perf_counter() - t0
+                instrument.record("model_warmup", t0, warmup_s)
+
+            size = _model_bytes(model, key[0])
+            self._models[key] = (model, size)
+            self.timings[key] = {"load_s": load_s, "warmup_s": warmup_s, "bytes": size, "hits": 0}
+            self._enforce_limits()
+            return model
+
+    def warmup(self, model, device=None):
+        # The first inference pays for lazy init (fusing, allocator, kernels); do it off the clock
+        dummy = np.zeros((self.warmup_imgsz, self.warmup_imgsz, 3), dtype=np.uint8)
+        kwargs = {"verbose": False}
+        if device is not None:
+            kwargs["device"] = device
+        model.predict(dummy, **kwargs)
+
+    def _enforce_limits(self):
+        def total_bytes():
+            return sum(size for _, size in self._models.values())
+
+        while len(self._models) > 1 and (
+            len(self._models) > self.max_models
+            or (self.max_bytes is not None and total_bytes() > self.max_bytes)
+        ):
+            self.evict(next(iter(self._models)))
+
+    def evict(self, key):
+        with self._lock:
+            self._models.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def info(self, weights: str, device=None, tag: str | None = None) -> dict | None:
+        """Load/warm-up timings of one loaded model, or None if it is not loaded."""
+        with self._lock:
+            return self.timings.get(self._key(weights, device, tag))
+
+    def stats(self) -> list[dict]:
+        """Load/warm-up timings and cache hits of every model loaded so far."""
+        with self._lock:
+            return [
+                {"weights": k[0], "device": k[2], "tag": k[3], "loaded": k in self._models, **v}
+                for k, v in self.timings.items()
+            ]
+
+
+_registry = ModelRegistry()
+
+
+def get_registry() -> ModelRegistry:
+    return _registry
+
+
+def get_model(weights: str, device=None, warmup: bool = True, tag: str | None = None):
+    """Fetch `weights` from the process-wide registry, loading it on first use."""
+    return _registry.get(weights, device=device, warmup=warmup, tag=tag)
@@ -0,0 +1,51 @@
+import json
+import os
+import warnings
+
+from .fileutils import file_digest
+
+# Written by training/evaluate.py; TRACK_OPERATING_POINT points elsewhere
+OPERATING_POINT_ENV = "TRACK_OPERATING_POINT"
+DEFAULT_OPERATING_POINT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "Labeller_Assignment_Dataset", "evaluation", "operating_point.json",
+)
+
+# Detection/tracking settings every mode of track_video uses; part of the track cache key.
+# conf and iou are replaced by the recommended operating point for the weights it was swept on
+TRACK_PARAMS = {"conf": 0.5, "iou": 0.7, "tracker": "bytetrack.yaml"}
+
+
+def load_operating_point(weights, path=None) -> dict:
+    """
+    conf and iou of the recommended point in evaluate.py's operating_point.json, if it
+    was swept on `weights` (same content digest); {} if none was saved, it belongs to
+    other weights, or it cannot be read.
+    """
+    path = path or os.environ.get(OPERATING_POINT_ENV) or DEFAULT_OPERATING_POINT
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            point = json.load(f)
+        recommended = {"conf": float(point["recommended"]["conf"]), "iou": float(point["recommended"]["iou"])}
+        swept_on = point["weights_digest"]
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        warnings.warn(f"Ignoring operating point {path} ({type(e).__name__}: {e}); "
+                      f"using conf={TRACK_PARAMS['conf']}, iou={TRACK_PARAMS['iou']}")
+        return {}
+    try:
+        matches = file_digest(weights) == swept_on
+    except OSError:
+        return {}
+    return recommended if matches else {}
+
+
+def track_params(conf=None, iou=None, tracker=None, weights=None) -> dict:
+    """
+    TRACK_PARAMS with the given settings overridden. With `weights`, conf and iou default
+    to the operating point evaluate.py recommended for those weights, if any.
+    """
+    overrides = {"conf": conf, "iou": iou, "tracker": tracker}
+    point = load_operating_point(weights) if weights is not None else {}
+    return {**TRACK_PARAMS, **point, **{name: value for name, value in overrides.items() if value is not None}}
@@ -0,0 +1,180 @@
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class StageStats:
+    """
+    Timing counters for one pipeline stage.
+    busy_time is the time spent inside the stage function, wait_time the time
+    spent blocked on the input queue (starved) or the output queue (backpressure).
+    """
+
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+        self.durations = []
+        self._lock = threading.Lock()
+
+    def record(self, busy: float, wait: float):
+        with self._lock:
+            self.items += 1
+            self.busy_time += busy
+            self.wait_time += wait
+            self.durations.append(busy)
+
+    @property
+    def fps(self) -> float:
+        # Throughput the stage could sustain on its own, per worker thread pool
+        if self.busy_time <= 0:
+            return 0.0
+        return self.items * self.workers / self.busy_time
+
+    def summary(self) -> dict:
+        return {
+            "stage": self.name,
+            "frames": self.items,
+            "fps": round(self.fps, 2),
+            "busy_s": round(self.busy_time, 4),
+            "wait_s": round(self.wait_time, 4),
+        }
+
+
+class Stage:
+    """
+    A pipeline stage: fn(item) -> item. Returning None drops the item.
+    Stages with workers > 1 run fn concurrently; their output is re-ordered
+    before it reaches the next stage so frame order is always preserved.
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+
+
+def _put(q: queue.Queue, item, abort: threading.Event):
+    while not abort.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, abort: threading.Event):
+    while not abort.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _STOP
+
+
+def run_pipeline(source, stages: list, queue_size: int = 8, source_name: str = "decode") -> list:
+    """
+    Run `source` (an iterable) through `stages`, each in its own thread(s),
+    joined by bounded queues of `queue_size` items. A full queue blocks the
+    producer, so a slow stage throttles everything upstream of it.
+
+    Returns the list of StageStats (source first). Any exception raised in a
+    stage stops the whole pipeline and is re-raised in the caller.
+    """
+    abort = threading.Event()
+    errors = []
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+    stats = [StageStats(source_name)] + [StageStats(s.name, s.workers) for s in stages]
+    reorder = [{"lock": threading.Lock(), "pending": {}, "next": 0, "done": 0} for _ in stages]
+
+    def fail(exc):
+        errors.append(exc)
+        abort.set()
+
+    def produce():
+        out_q = queues[0]
+        try:
+            it = iter(source)
+            seq = 0
+            while not abort.is_set():
+                t0 = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    break
+                t1 = time.perf_counter()
+                if not _put(out_q, (seq, item), abort):
+                    break
+                stats[0].record(t1 - t0, time.perf_counter() - t1)
+                seq += 1
+        except Exception as e:
+            fail(e)
+        finally:
+            for _ in range(stages[0].workers):
+                _put(out_q, _STOP, abort)
+
+    def consume(idx: int):
+        stage = stages[idx]
+        in_q = queues[idx]
+        out_q = queues[idx + 1] if idx + 1 < len(queues) else None
+        st = stats[idx + 1]
+        # Shared per-stage state for re-ordering the output of parallel workers
+        state = reorder[idx]
+        try:
+            while not abort.is_set():
+                t0 = time.perf_counter()
+                packet = _get(in_q, abort)
+                if packet is _STOP:
+                    break
+                t1 = time.perf_counter()
+                seq, item = packet
+                # A None item was dropped upstream; it is still forwarded so
+                # re-ordering never waits on a missing sequence number.
+                result = None if item is None else stage.fn(item)
+                t2 = time.perf_counter()
+                if out_q is not None:
+                    if stage.workers == 1:
+                        if not _put(out_q, (seq, result), abort):
+                            break
+                    else:
+                        with state["lock"]:
+                            state["pending"][seq] = result
+                            # Only the worker holding the next expected seq flushes
+                            while state["next"] in state["pending"]:
+                                nxt = state["next"]
+                                if not _put(out_q, (nxt, state["pending"].pop(nxt)), abort):
+                                    break
+                                state["next"] += 1
+                st.record(t2 - t1, (t1 - t0) + (time.perf_counter() - t2))
+        except Exception as e:
+            fail(e)
+        finally:
+            if out_q is not None:
+                with state["lock"]:
+                    state["done"] += 1
+                    last = state["done"] == stage.workers
+                if last:
+                    for _ in range(stages[idx + 1].workers):
+                        _put(out_q, _STOP, abort)
+
+    threads = [threading.Thread(target=produce, name=f"pipeline-{source_name}", daemon=True)]
+    for i, stage in enumerate(stages):
+        for w in range(stage.workers):
+            threads.append(threading.Thread(target=consume, args=(i,), name=f"pipeline-{stage.name}-{w}", daemon=True))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    if errors:
+        raise errors[0]
+    return stats
+
+
+def format_stage_stats(stats: list) -> str:
+    return ", ".join(f"{s.name}={s.fps:.1f}fps" for s in stats)
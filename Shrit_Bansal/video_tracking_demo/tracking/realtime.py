@@ -0,0 +1,256 @@
+import argparse
+import json
+import math
+import os
+import time
+
+from . import instrument
+from .analytics import AnalyticsWriter
+from .batching import FrameTracker, tracked_masks
+from .byte_tracker import TrackingCancelled, _emit, track_video
+from .consistency import id_agreement
+from .model_registry import get_model
+from .operating_point import track_params
+from .render import OverlayRenderer
+from .results_io import iter_results, open_results_writer
+from .video_io import VideoReader, open_video_writer
+
+# Inference sizes to fall back through when detection cannot keep up (multiples of 32)
+IMGSZ_STEPS = (640, 512, 416, 320)
+
+
+class SkipController:
+    """
+    Decides how often to run detection so that tracking keeps up with `target_fps`.
+
+    Every frame costs some fixed work (decode, draw, encode) and every detected frame
+    additionally costs one inference. Both are tracked as moving averages; the
+    detection interval k is the smallest one for which k frames plus one inference
+    fit in k frame budgets. If even `max_skip` is not enough, the inference size is
+    stepped down through `imgsz_steps`, and stepped back up once there is room.
+    """
+
+    def __init__(self, target_fps: float, max_skip: int = 8, imgsz_steps=IMGSZ_STEPS,
+                 scale_down: bool = True, smoothing: float = 0.3):
+        self.budget = 1.0 / target_fps
+        self.max_skip = max(1, int(max_skip))
+        self.imgsz_steps = tuple(imgsz_steps or ())
+        self.scale_down = scale_down and len(self.imgsz_steps) > 1
+        self.smoothing = smoothing
+        self.interval = 1
+        self.level = 0
+        self.infer_s = None
+        self.frame_s = None
+
+    @property
+    def imgsz(self):
+        return self.imgsz_steps[self.level] if self.imgsz_steps else None
+
+    def _average(self, current, value):
+        return value if current is None else current + self.smoothing * (value - current)
+
+    def observe_inference(self, seconds: float):
+        self.infer_s = self._average(self.infer_s, seconds)
+
+    def observe_frame(self, seconds: float):
+        """Per-frame work other than inference."""
+        self.frame_s = self._average(self.frame_s, seconds)
+
+    def _rescale(self, level: int):
+        # Inference cost grows roughly with the number of input pixels
+        ratio = self.imgsz_steps[level] / self.imgsz_steps[self.level]
+        self.infer_s *= ratio * ratio
+        self.level = level
+
+    def update(self):
+        if self.infer_s is None:
+            return
+        spare = self.budget - (self.frame_s or 0.0)
+        needed = self.max_skip + 1 if spare <= 0 else math.ceil(self.infer_s / spare)
+
+        if self.scale_down:
+            if needed > self.max_skip and self.level < len(self.imgsz_steps) - 1:
+                self._rescale(self.level + 1)
+                needed = self.max_skip + 1 if spare <= 0 else math.ceil(self.infer_s / spare)
+            elif self.level > 0 and spare > 0 and needed <= self.max_skip:
+                larger = self.imgsz_steps[self.level - 1] / self.imgsz_steps[self.level]
+                # Only go back up if the larger size would fit within the current interval
+                if math.ceil(self.infer_s * larger * larger / spare) <= needed:
+                    self._rescale(self.level - 1)
+        self.interval = min(max(needed, 1), self.max_skip)
+
+
+def track_video_realtime(input_path, output_path, model_weights, json_path, target_fps=None,
+                         max_skip=8, imgsz_steps=IMGSZ_STEPS, scale_down=True, results_format=None,
+                         device=None, progress_callback=None, cancel_event=None, model_tag=None,
+                         draw_masks=False, stats=None, conf=None, iou=None, tracker=None,
+                         decoder="opencv", encoder="auto", encoder_preset="ultrafast"):
+    """
+    Real-time variant of track_video. Detection only runs every k-th frame, with k
+    picked by a SkipController from the measured latencies so that processing keeps
+    up with `target_fps` (default: the video's own fps); in between, ByteTrack's
+    Kalman filter predicts the boxes. When skipping `max_skip` frames is still too
+    slow, the inference size is lowered through `imgsz_steps` (scale_down=False keeps
+    the model's size). Every frame is still drawn and written, and each JSON record
+    carries "source": "detected" or "interpolated". Masks are only drawn on detected
+    frames. If `stats` is a dict it receives the run's counters. `conf`, `iou` and
+    `tracker` default to TRACK_PARAMS, with the recommended point for `model_weights`
+    (see track_params).
+    Returns (success, message) like track_video.
+    """
+    params = track_params(conf, iou, tracker, weights=model_weights)
+    try:
+        tag = f"predict:{model_tag}" if model_tag else "predict"
+        model = get_model(model_weights, device=device, tag=tag)
+        renderer = OverlayRenderer(model, draw_masks=draw_masks)
+        predict_kwargs = {"conf": params["conf"], "iou": params["iou"], "verbose": False}
+        if device is not None:
+            predict_kwargs["device"] = device
+
+        try:
+            reader = VideoReader(input_path, decoder=decoder)
+        except IOError as e:
+            return False, str(e)
+        fps, total_frames = reader.fps, reader.frame_count
+
+        try:
+            out, actual_out_path, used_codec = open_video_writer(output_path, fps, reader.size, encoder,
+                                                                 encoder_preset)
+        except Exception:
+            reader.close()
+            raise
+        if out is None:
+            reader.close()
+            return False, "Failed to initialize VideoWriter with mp4v/XVID/avc1"
+
+        controller = SkipController(target_fps or fps, max_skip, imgsz_steps if scale_down else (), scale_down)
+        frame_tracker = FrameTracker(params["tracker"])
+        writer = AnalyticsWriter(open_results_writer(json_path, results_format), fps)
+        frame_id = 0
+        detected = 0
+        since_detection = None
+        start = frame_start = time.perf_counter()
+
+        try:
+            for frame in reader:
+                infer_s = 0.0
+                frame_id += 1
+                if since_detection is None or since_detection >= controller.interval:
+                    imgsz = controller.imgsz
+                    kwargs = predict_kwargs if imgsz is None else {**predict_kwargs, "imgsz": imgsz}
+                    infer_start = time.perf_counter()
+                    results = model.predict(frame, **kwargs)
+                    infer_s = time.perf_counter() - infer_start
+                    instrument.record_model_call(infer_start, infer_start + infer_s, results)
+                    result = results[0]
+                    controller.observe_inference(infer_s)
+                    tracks = frame_tracker.update(result)
+                    masks = tracked_masks(result, frame_tracker.indices) if draw_masks else None
+                    source = "detected"
+                    detected += 1
+                    since_detection = 1
+                else:
+                    tracks = frame_tracker.predict()
+                    masks = None
+                    source = "interpolated"
+                    since_detection += 1
+
+                frame_objects = renderer.draw(frame, tracks, masks)
+                _emit(out, reader, writer, frame, {"frame_id": frame_id, "objects": frame_objects, "source": source})
+                # Frame time includes decoding the frame
+                now = time.perf_counter()
+                controller.observe_frame(now - frame_start - infer_s)
+                controller.update()
+                frame_start = now
+
+                if progress_callback is not None:
+                    progress_callback(frame_id, max(total_frames, frame_id))
+                if cancel_event is not None and cancel_event.is_set():
+                    raise TrackingCancelled()
+        finally:
+            reader.close()
+            out.release()
+            writer.close()
+
+        elapsed = time.perf_counter() - start
+        achieved = frame_id / elapsed if elapsed > 0 else 0.0
+        if stats is not None:
+            stats.update({
+                "frames": frame_id,
+                "detected": detected,
+                "interpolated": frame_id - detected,
+                "target_fps": round(1.0 / controller.budget, 2),
+                "fps": round(achieved, 2),
+                "interval": controller.interval,
+                "imgsz": controller.imgsz,
+            })
+        return True, (f"Saved {frame_id} frames using {used_codec} at {actual_out_path} "
+                      f"(real-time: {achieved:.1f}/{1.0 / controller.budget:.1f} fps, "
+                      f"detected {detected}/{frame_id} frames)")
+    except TrackingCancelled:
+        return False, "Tracking cancelled"
+    except Exception as e:
+        return False, f"An error occurred during processing: {str(e)}"
+
+
+def consistency_report(reference_path, realtime_path, iou_threshold: float = 0.5) -> dict:
+    """
+    Compare a real-time run with a full-rate one: id_agreement() over all frames and
+    separately over the frames the real-time run detected and interpolated.
+    """
+    reference = list(iter_results(reference_path))
+    realtime = list(iter_results(realtime_path))
+    sources = {rec["frame_id"]: rec.get("source", "detected") for rec in realtime}
+    report = {
+        "frames": len(realtime),
+        "detected_fraction": round(
+            sum(1 for s in sources.values() if s == "detected") / len(sources), 4) if sources else 0.0,
+        "all": id_agreement(reference, realtime, iou_threshold),
+    }
+    for source in ("detected", "interpolated"):
+        subset = [rec for rec in reference if sources.get(rec["frame_id"]) == source]
+        report[source] = id_agreement(subset, realtime, iou_threshold)
+    return report
+
+
+def compare_with_full_rate(input_path, model_weights, out_dir, target_fps=None, **realtime_kwargs) -> dict:
+    """Track `input_path` at full rate and in real-time mode and report what the latter loses."""
+    os.makedirs(out_dir, exist_ok=True)
+    full_json = os.path.join(out_dir, "full_rate.json")
+    realtime_json = os.path.join(out_dir, "realtime.json")
+
+    start = time.perf_counter()
+    # Both runs resolve the same thresholds, so only the frame skipping differs
+    ok, message = track_video(input_path, os.path.join(out_dir, "full_rate"), model_weights, full_json,
+                              conf=realtime_kwargs.get("conf"), iou=realtime_kwargs.get("iou"))
+    full_s = time.perf_counter() - start
+    if not ok:
+        raise RuntimeError(message)
+
+    stats = {}
+    start = time.perf_counter()
+    ok, message = track_video_realtime(input_path, os.path.join(out_dir, "realtime"), model_weights,
+                                       realtime_json, target_fps=target_fps, stats=stats, **realtime_kwargs)
+    realtime_s = time.perf_counter() - start
+    if not ok:
+        raise RuntimeError(message)
+
+    report = consistency_report(full_json, realtime_json)
+    report["full_rate_s"] = round(full_s, 3)
+    report["realtime_s"] = round(realtime_s, 3)
+    report["realtime"] = stats
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ID consistency of real-time tracking vs full-rate tracking")
+    parser.add_argument("video")
+    parser.add_argument("weights")
+    parser.add_argument("--out-dir", default="realtime_report")
+    parser.add_argument("--target-fps", type=float, default=None)
+    parser.add_argument("--max-skip", type=int, default=8)
+    parser.add_argument("--no-scale-down", action="store_true")
+    args = parser.parse_args()
+    print(json.dumps(compare_with_full_rate(args.video, args.weights, args.out_dir, args.target_fps,
+                                            max_skip=args.max_skip, scale_down=not args.no_scale_down),
+                     indent=2))
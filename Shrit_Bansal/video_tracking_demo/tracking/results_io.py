@@ -0,0 +1,220 @@
+import io
+import json
+import zipfile
+from pathlib import Path
+import numpy as np
+
+# Columns of the binary format, one row per tracked object
+NPZ_COLUMNS = {
+    "frame_id": np.int32,
+    "track_id": np.int32,
+    "class": np.uint8,
+    "conf": np.float32,
+    "x1": np.int32,
+    "y1": np.int32,
+    "x2": np.int32,
+    "y2": np.int32,
+}
+
+FORMATS = ("json", "jsonl", "npz")
+
+# Optional per-frame "source" values (see realtime.py), stored as codes in the binary format
+FRAME_SOURCES = ("detected", "interpolated")
+
+
+def _format_for(path, fmt: str | None) -> str:
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown results format '{fmt}', expected one of {FORMATS}")
+        return fmt
+    suffix = Path(path).suffix.lower().lstrip(".")
+    return suffix if suffix in FORMATS else "json"
+
+
+class JsonResultsWriter:
+    """
+    Writes the pretty, indented JSON list frame by frame. The bytes are identical to
+    json.dump(all_frames, f, indent=2) but only one frame is held in memory.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._f = open(self.path, "w", encoding="utf-8")
+        self.frames = 0
+
+    def write(self, record: dict):
+        body = json.dumps(record, indent=2).replace("\n", "\n  ")
+        self._f.write(("[\n  " if self.frames == 0 else ",\n  ") + body)
+        self.frames += 1
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.write("[]" if self.frames == 0 else "\n]")
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonlResultsWriter(JsonResultsWriter):
+    """One compact JSON object per line."""
+
+    def write(self, record: dict):
+        self._f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.frames += 1
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+
+class NpzResultsWriter:
+    """
+    Columnar binary results: typed arrays in a zip archive readable with np.load.
+    Rows are buffered for `chunk_frames` frames and then flushed as one chunk
+    (chunk_00000/x1.npy, ...). A `frames` array per chunk keeps frames with no
+    objects, a `sources` array is added when records carry a "source", and class
+    names are stored once in meta.json.
+    """
+
+    def __init__(self, path, chunk_frames: int = 1024):
+        self.path = str(path)
+        self.chunk_frames = max(1, int(chunk_frames))
+        self._zip = zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._classes = {}
+        self._chunks = 0
+        self._reset()
+        self.frames = 0
+
+    def _reset(self):
+        self._frame_ids = []
+        self._sources = []
+        self._rows = {name: [] for name in NPZ_COLUMNS}
+
+    def _class_code(self, name: str) -> int:
+        if name not in self._classes:
+            self._classes[name] = len(self._classes)
+        return self._classes[name]
+
+    def write(self, record: dict):
+        frame_id = record["frame_id"]
+        self._frame_ids.append(frame_id)
+        if "source" in record:
+            self._sources.append(FRAME_SOURCES.index(record["source"]))
+        rows = self._rows
+        for obj in record["objects"]:
+            x1, y1, x2, y2 = obj["bbox"]
+            rows["frame_id"].append(frame_id)
+            rows["track_id"].append(obj["id"])
+            rows["class"].append(self._class_code(obj["class"]))
+            rows["conf"].append(obj["confidence"])
+            rows["x1"].append(x1)
+            rows["y1"].append(y1)
+            rows["x2"].append(x2)
+            rows["y2"].append(y2)
+        self.frames += 1
+        if len(self._frame_ids) >= self.chunk_frames:
+            self._flush()
+
+    def _write_array(self, name: str, arr: np.ndarray):
+        with self._zip.open(name, "w") as f:
+            np.lib.format.write_array(f, arr, allow_pickle=False)
+
+    def _flush(self):
+        if not self._frame_ids:
+            return
+        prefix = f"chunk_{self._chunks:05d}/"
+        self._write_array(prefix + "frames.npy", np.asarray(self._frame_ids, dtype=np.int32))
+        if self._sources:
+            self._write_array(prefix + "sources.npy", np.asarray(self._sources, dtype=np.uint8))
+        for name, dtype in NPZ_COLUMNS.items():
+            self._write_array(f"{prefix}{name}.npy", np.asarray(self._rows[name], dtype=dtype))
+        self._chunks += 1
+        self._reset()
+
+    def close(self):
+        if self._zip.fp is None:
+            return
+        self._flush()
+        meta = {"chunks": self._chunks, "frames": self.frames,
+                "classes": sorted(self._classes, key=self._classes.get)}
+        self._zip.writestr("meta.json", json.dumps(meta))
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_results_writer(path, fmt: str | None = None, **kwargs):
+    """
+    Results sink for `path`. The format is `fmt` or inferred from the suffix
+    (.jsonl, .npz, anything else is the pretty JSON list).
+    """
+    fmt = _format_for(path, fmt)
+    if fmt == "jsonl":
+        return JsonlResultsWriter(path)
+    if fmt == "npz":
+        return NpzResultsWriter(path, **kwargs)
+    return JsonResultsWriter(path)
+
+
+def _iter_npz(path):
+    with zipfile.ZipFile(path) as zf:
+        meta = json.loads(zf.read("meta.json"))
+        classes = meta["classes"]
+        names = set(zf.namelist())
+        for chunk in range(meta["chunks"]):
+            prefix = f"chunk_{chunk:05d}/"
+            load = lambda name: np.load(io.BytesIO(zf.read(f"{prefix}{name}.npy")), allow_pickle=False)
+            frame_ids = load("frames")
+            cols = {name: load(name) for name in NPZ_COLUMNS}
+            sources = load("sources").tolist() if f"{prefix}sources.npy" in names else None
+            # Rows are written in frame order, so each frame is one contiguous run
+            starts = np.searchsorted(cols["frame_id"], frame_ids, side="left")
+            ends = np.searchsorted(cols["frame_id"], frame_ids, side="right")
+            for k, (frame_id, start, end) in enumerate(zip(frame_ids.tolist(), starts.tolist(), ends.tolist())):
+                objects = []
+                for i in range(start, end):
+                    objects.append({
+                        "id": int(cols["track_id"][i]),
+                        "class": classes[cols["class"][i]],
+                        "confidence": float(cols["conf"][i]),
+                        "bbox": [int(cols["x1"][i]), int(cols["y1"][i]), int(cols["x2"][i]), int(cols["y2"][i])],
+                    })
+                record = {"frame_id": frame_id, "objects": objects}
+                if sources is not None:
+                    record["source"] = FRAME_SOURCES[sources[k]]
+                yield record
+
+
+def iter_results(path, fmt: str | None = None):
+    """
+    Stream frame records ({"frame_id", "objects"}) back from any results format.
+    The pretty JSON list has to be parsed whole; JSONL and NPZ are read incrementally.
+    """
+    fmt = _format_for(path, fmt)
+    if fmt == "npz":
+        yield from _iter_npz(path)
+    elif fmt == "jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def export_json(src_path, dst_path, src_fmt: str | None = None):
+    """Convert a JSONL/NPZ results file to the pretty JSON list format."""
+    with JsonResultsWriter(dst_path) as writer:
+        for record in iter_results(src_path, src_fmt):
+            writer.write(record)
+    return str(dst_path)
@@ -0,0 +1,290 @@
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from .analytics import AnalyticsWriter
+from .backends import resolve_weights
+from .batching import FrameTracker, iter_batches, track_batch
+from .byte_tracker import track_params
+from .video_io import _open_writer, _safe_fps
+from .model_registry import get_model
+from .render import OverlayRenderer
+from .results_io import JsonlResultsWriter, iter_results, open_results_writer
+
+
+def plan_segments(total_frames: int, segments: int, overlap: int) -> list[tuple[int, int, int]]:
+    """
+    Split [0, total_frames) into `segments` contiguous core ranges. Each segment after
+    the first starts `overlap` frames early so its tracks are already established
+    when its core range begins. Returns (start, core_start, end) per segment.
+    """
+    segments = max(1, min(segments, total_frames))
+    bounds = np.linspace(0, total_frames, segments + 1).round().astype(int).tolist()
+    return [
+        (max(0, bounds[i] - overlap) if i else 0, bounds[i], bounds[i + 1])
+        for i in range(segments)
+    ]
+
+
+def _open_at(input_path: str, start: int):
+    cap = cv2.VideoCapture(input_path)
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+            # Backend could not seek exactly; decode forward instead
+            cap.release()
+            cap = cv2.VideoCapture(input_path)
+            for _ in range(start):
+                if not cap.grab():
+                    break
+    return cap
+
+
+def _read_range(input_path: str, start: int, end: int | None):
+    """Frames [start, end) of the video, or from `start` to the end of the file when `end` is None."""
+    cap = _open_at(input_path, start)
+    try:
+        index = start
+        while end is None or index < end:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def limit_threads(threads: int):
+    """Cap this process's OpenCV and torch thread pools, for workers that share the machine."""
+    # One torch/OpenCV thread pool per process would oversubscribe the cores
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _track_segment(input_path, start, end, model_weights, conf, iou, tracker, batch_size, threads):
+    """
+    Worker: track frames [start, end) (to EOF if `end` is None) with a fresh tracker. Returns one float32 array
+    per frame with rows (x1, y1, x2, y2, local_id, conf, cls), plus the class names.
+    """
+    limit_threads(threads)
+    model = get_model(model_weights, warmup=False, tag="predict")
+    frame_tracker = FrameTracker(tracker)
+    frames = []
+    for batch in iter_batches(_read_range(input_path, start, end), batch_size):
+        for _, tracks, _ in track_batch(model, frame_tracker, batch, conf=conf, iou=iou):
+            if tracks is None:
+                frames.append(np.zeros((0, 7), dtype=np.float32))
+            else:
+                boxes, ids, confs, classes = tracks
+                frames.append(np.column_stack([boxes, ids, confs, classes]).astype(np.float32))
+    return frames, dict(model.names) if isinstance(model.names, dict) else list(model.names)
+
+
+def _pairwise_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def match_overlap(prev_frames: list, next_frames: list, min_iou: float = 0.3) -> dict:
+    """
+    Match local track IDs of the next segment to those of the previous one using the
+    frames both segments tracked. The score of an ID pair is its mean box IoU over
+    the overlap window; pairs are assigned with the Hungarian method and kept if the
+    score reaches `min_iou`. Returns {next_local_id: prev_local_id}.
+    """
+    scores = {}
+    n = min(len(prev_frames), len(next_frames))
+    for a, b in zip(prev_frames[-n:] if n else [], next_frames[:n]):
+        if not len(a) or not len(b):
+            continue
+        ious = _pairwise_iou(a[:, :4], b[:, :4])
+        for i, j in zip(*np.nonzero(ious)):
+            key = (int(a[i, 4]), int(b[j, 4]))
+            scores[key] = scores.get(key, 0.0) + float(ious[i, j])
+    if not scores or not n:
+        return {}
+
+    prev_ids = sorted({k[0] for k in scores})
+    next_ids = sorted({k[1] for k in scores})
+    cost = np.zeros((len(prev_ids), len(next_ids)))
+    for (p, q), s in scores.items():
+        cost[prev_ids.index(p), next_ids.index(q)] = -s / n
+    rows, cols = linear_sum_assignment(cost)
+    return {
+        next_ids[c]: prev_ids[r]
+        for r, c in zip(rows, cols)
+        if -cost[r, c] >= min_iou
+    }
+
+
+def stitch_ids(plan: list, segment_frames: list, min_iou: float = 0.3) -> list[dict]:
+    """Map every segment's local track IDs to global IDs. Returns one {local: global} per segment."""
+    mappings = []
+    next_global = 1
+    for k, frames in enumerate(segment_frames):
+        mapping = {}
+        if k:
+            start, core_start, _ = plan[k]
+            overlap = core_start - start
+            prev_frames = segment_frames[k - 1]
+            matches = match_overlap(prev_frames[len(prev_frames) - overlap:] if overlap else [],
+                                    frames[:overlap], min_iou)
+            mapping = {local: mappings[k - 1][prev] for local, prev in matches.items()
+                       if prev in mappings[k - 1]}
+        for arr in frames:
+            for local in arr[:, 4].astype(int).tolist():
+                if local not in mapping:
+                    mapping[local] = next_global
+                    next_global += 1
+        mappings.append(mapping)
+    return mappings
+
+
+def _render_segment(input_path, core_start, end, frames, mapping, names, video_base, results_path,
+                    fps, size, first_frame_id, threads):
+    """Worker: draw the core range of one segment with global IDs and write its video and JSONL."""
+    limit_threads(threads)
+    out, video_path, codec = _open_writer(video_base, fps, size)
+    if out is None:
+        raise RuntimeError("Failed to initialize VideoWriter with mp4v/XVID/avc1")
+    renderer = OverlayRenderer(SimpleNamespace(names=names))
+    written = 0
+    with JsonlResultsWriter(results_path) as writer:
+        for frame, arr in zip(_read_range(input_path, core_start, end), frames):
+            tracks = None
+            if len(arr):
+                ids = np.array([mapping[int(i)] for i in arr[:, 4]], dtype=int)
+                tracks = (arr[:, :4], ids, arr[:, 5], arr[:, 6].astype(int))
+            frame_objects = renderer.draw(frame, tracks)
+            writer.write({"frame_id": first_frame_id + written, "objects": frame_objects})
+            out.write(frame)
+            written += 1
+    out.release()
+    return video_path, codec, written
+
+
+def _concat_videos(paths: list, output_base: str, fps: float, size: tuple[int, int]):
+    """Join segment videos, stream-copying with ffmpeg when available."""
+    suffix = Path(paths[0]).suffix
+    out_path = str(Path(output_base).with_suffix(suffix))
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        list_file = Path(paths[0]).parent / "segments.txt"
+        list_file.write_text("".join(f"file '{Path(p).resolve()}'\n" for p in paths), encoding="utf-8")
+        proc = subprocess.run(
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+             "-i", str(list_file), "-c", "copy", out_path],
+            capture_output=True,
+        )
+        if proc.returncode == 0:
+            return out_path
+
+    # No ffmpeg: re-encode the segments one after another
+    out, out_path, _ = _open_writer(output_base, fps, size)
+    if out is None:
+        raise RuntimeError("Failed to initialize VideoWriter with mp4v/XVID/avc1")
+    try:
+        for p in paths:
+            cap = cv2.VideoCapture(p)
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                out.write(frame)
+            cap.release()
+    finally:
+        out.release()
+    return out_path
+
+
+def track_video_segments(input_path, output_path, model_weights, json_path, workers=None,
+                         overlap=30, min_iou=0.3, batch_size=4, results_format=None,
+                         conf=None, iou=None, tracker=None, backend="torch"):
+    """
+    Parallel variant of track_video for long videos. The video is cut into one
+    overlapping segment per worker process and each segment is tracked independently;
+    local IDs are stitched into global IDs on the `overlap` frames shared by adjacent
+    segments, then the segments are drawn in parallel and concatenated.
+    `backend` is exported here, once, so the workers all load the same model.
+    `conf`, `iou` and `tracker` default to TRACK_PARAMS, with the recommended point for
+    `model_weights` (see track_params).
+    Returns (success, message) like track_video.
+    """
+    try:
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            return False, f"Could not open video file: {input_path}"
+        fps = _safe_fps(cap.get(cv2.CAP_PROP_FPS))
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if total_frames <= 0:
+            return False, "Could not determine the frame count needed to split the video"
+
+        params = track_params(conf, iou, tracker, weights=model_weights)
+        model_weights = resolve_weights(model_weights, backend)
+        workers = max(1, workers or os.cpu_count() or 1)
+        plan = plan_segments(total_frames, workers, overlap)
+        # CAP_PROP_FRAME_COUNT is only an estimate (often low for VFR/MP4 files), so the
+        # last segment reads to the end of the file instead of stopping at it
+        ends = [end for _, _, end in plan[:-1]] + [None]
+        threads = max(1, (os.cpu_count() or 1) // len(plan))
+
+        ctx = multiprocessing.get_context("spawn")
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                ProcessPoolExecutor(max_workers=len(plan), mp_context=ctx) as pool:
+            tracked = [
+                job.result() for job in [
+                    pool.submit(_track_segment, input_path, start, end, model_weights,
+                                params["conf"], params["iou"], params["tracker"], batch_size, threads)
+                    for (start, _, _), end in zip(plan, ends)
+                ]
+            ]
+            segment_frames = [frames for frames, _ in tracked]
+            names = tracked[0][1]
+            mappings = stitch_ids(plan, segment_frames, min_iou)
+
+            jobs = []
+            first_frame_id = 1
+            for k, (start, core_start, _) in enumerate(plan):
+                core = segment_frames[k][core_start - start:]
+                jobs.append(pool.submit(
+                    _render_segment, input_path, core_start, ends[k], core, mappings[k], names,
+                    os.path.join(tmp_dir, f"segment_{k:03d}"), os.path.join(tmp_dir, f"segment_{k:03d}.jsonl"),
+                    fps, size, first_frame_id, threads,
+                ))
+                first_frame_id += len(core)
+            rendered = [job.result() for job in jobs]
+
+            actual_out_path = _concat_videos([video for video, _, _ in rendered], output_path, fps, size)
+            with AnalyticsWriter(open_results_writer(json_path, results_format), fps) as writer:
+                for k in range(len(plan)):
+                    for record in iter_results(os.path.join(tmp_dir, f"segment_{k:03d}.jsonl")):
+                        writer.write(record)
+
+        frames_written = sum(n for _, _, n in rendered)
+        return True, (f"Saved {frames_written} frames using {rendered[0][1]} at {actual_out_path} "
+                      f"({len(plan)} segments)")
+    except Exception as e:
+        return False, f"An error occurred during processing: {str(e)}"
@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .fileutils import file_digest, format_bytes
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "track_cache")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _weights_digest(path: str) -> str:
+    # Exported models (e.g. OpenVINO) are directories; hash their files in order
+    if not os.path.isdir(path):
+        return file_digest(path)
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            h.update(name.encode("utf-8"))
+            h.update(file_digest(os.path.join(root, name)).encode("ascii"))
+    return h.hexdigest()
+
+
+class TrackRecorder:
+    """
+    Collects the raw tracks of a run frame by frame, in the form OverlayRenderer.draw
+    takes them: (xyxy, track_ids, confidences, classes), or None for no tracks.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self._counts = []
+        self._columns = ([], [], [], [])
+
+    def add(self, tracks):
+        self.frames += 1
+        count = 0 if tracks is None else len(tracks[1])
+        self._counts.append(count)
+        if count:
+            for column, values in zip(self._columns, tracks):
+                column.append(np.asarray(values))
+
+    def arrays(self) -> dict:
+        # Values keep the dtypes they were tracked with, so replayed overlays and JSON match exactly
+        empty = (np.empty((0, 4), np.float32), np.empty(0, np.int64), np.empty(0, np.float32), np.empty(0, np.int64))
+        boxes, ids, conf, cls = (np.concatenate(c) if c else e for c, e in zip(self._columns, empty))
+        return {
+            "counts": np.asarray(self._counts, dtype=np.int32),
+            "boxes": boxes.reshape(-1, 4),
+            "track_ids": ids,
+            "confidences": conf,
+            "classes": cls,
+        }
+
+
+class CachedTracks:
+    """A cache entry: its metadata and the recorded tracks, replayable frame by frame."""
+
+    def __init__(self, key: str, meta: dict, arrays: dict):
+        self.key = key
+        self.meta = meta
+        self.names = {int(k): v for k, v in meta["names"].items()}
+        self._arrays = arrays
+
+    @property
+    def frames(self) -> int:
+        return len(self._arrays["counts"])
+
+    def __iter__(self):
+        """Yield each frame's tracks (or None) exactly as they were recorded."""
+        a = self._arrays
+        ends = np.cumsum(a["counts"]).tolist()
+        start = 0
+        for end in ends:
+            if end == start:
+                yield None
+            else:
+                yield a["boxes"][start:end], a["track_ids"][start:end], a["confidences"][start:end], \
+                    a["classes"][start:end]
+            start = end
+
+
+class TrackCache:
+    """
+    On-disk cache of raw tracking output, so an annotated video or results file can be
+    re-rendered without running the model. Entries are keyed by the content hash of
+    the video and of the weights plus the conf/iou/tracker settings (and the tracker
+    config's contents when it is a file), and each is a directory holding
+    tracks.npz and meta.json. Entries are written under a temporary name and renamed
+    into place, and the least recently used ones are evicted once the cache
+    outgrows `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str | None = None, max_bytes: int | None = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir or DEFAULT_CACHE_DIR)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(input_path: str, model_weights: str, conf: float, iou: float, tracker: str) -> str:
+        params = {"conf": conf, "iou": iou, "tracker": tracker}
+        if os.path.isfile(tracker):
+            params["tracker_digest"] = file_digest(tracker)
+        payload = json.dumps(
+            {"video": file_digest(input_path), "weights": _weights_digest(model_weights), "params": params},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def get(self, key: str) -> CachedTracks | None:
+        entry = self.cache_dir / key
+        try:
+            with open(entry / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with np.load(entry / "tracks.npz", allow_pickle=False) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        except (OSError, ValueError, KeyError):
+            return None
+        # The entry directory's mtime is its last use, for LRU eviction
+        os.utime(entry)
+        return CachedTracks(key, meta, arrays)
+
+    def put(self, key: str, recorder: TrackRecorder, names, **meta) -> Path:
+        """Store a finished run's tracks with `names` (the model's class names) and extra metadata."""
+        if isinstance(names, (list, tuple)):
+            names = dict(enumerate(names))
+        partial = Path(tempfile.mkdtemp(prefix=f"{key}.", dir=self.cache_dir))
+        try:
+            np.savez_compressed(partial / "tracks.npz", **recorder.arrays())
+            meta = {**meta, "frames": recorder.frames, "names": {str(k): v for k, v in names.items()},
+                    "created": time.time()}
+            with open(partial / "meta.json", "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+            final = self.cache_dir / key
+            if final.exists():
+                shutil.rmtree(final, ignore_errors=True)
+            os.replace(partial, final)
+        except Exception:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise
+        self.prune()
+        return final
+
+    def entries(self) -> list[dict]:
+        """Complete entries, most recently used first."""
+        rows = []
+        for entry in self.cache_dir.iterdir():
+            meta_path = entry / "meta.json"
+            if "." in entry.name or not meta_path.exists():
+                continue
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            rows.append({"key": entry.name, "bytes": _dir_bytes(entry), "last_used": entry.stat().st_mtime,
+                         "frames": meta.get("frames"), "input": meta.get("input"),
+                         "weights": meta.get("weights")})
+        rows.sort(key=lambda row: row["last_used"], reverse=True)
+        return rows
+
+    def remove(self, key: str) -> bool:
+        entry = self.cache_dir / key
+        if not entry.exists():
+            return False
+        shutil.rmtree(entry, ignore_errors=True)
+        return True
+
+    def prune(self, max_bytes: int | None = None, older_than: float | None = None) -> list[str]:
+        """
+        Evict least recently used entries until the cache fits in `max_bytes` (default:
+        the cache's limit), plus any unused for more than `older_than` seconds.
+        Returns the evicted keys.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        evicted = []
+        if older_than is not None:
+            cutoff = time.time() - older_than
+            evicted += [row["key"] for row in entries if row["last_used"] < cutoff]
+            entries = [row for row in entries if row["last_used"] >= cutoff]
+        if max_bytes is not None:
+            total = sum(row["bytes"] for row in entries)
+            while entries and total > max_bytes:
+                row = entries.pop()
+                total -= row["bytes"]
+                evicted.append(row["key"])
+        for key in evicted:
+            self.remove(key)
+        return evicted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and prune the tracking result cache")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list entries, most recently used first")
+    info = sub.add_parser("info", help="show an entry's metadata")
+    info.add_argument("key")
+    prune = sub.add_parser("prune", help="evict least recently used entries")
+    prune.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2)
+    prune.add_argument("--older-than-days", type=float, default=None)
+    sub.add_parser("clear", help="remove every entry")
+    args = parser.parse_args()
+
+    cache = TrackCache(args.cache_dir, max_bytes=None)
+    if args.command == "list":
+        rows = cache.entries()
+        for row in rows:
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["last_used"]))
+            print(f"{row['key']}  {format_bytes(row['bytes']):>10}  {row['frames']:>7} frames  {used}  "
+                  f"{os.path.basename(row['input'] or '')}")
+        print(f"{len(rows)} entries, {format_bytes(sum(row['bytes'] for row in rows))} in {cache.cache_dir}")
+    elif args.command == "info":
+        entry = cache.get(args.key)
+        if entry is None:
+            parser.exit(1, f"No cache entry {args.key}\n")
+        print(json.dumps(entry.meta, indent=2))
+    elif args.command == "prune":
+        older_than = None if args.older_than_days is None else args.older_than_days * 86400
+        evicted = cache.prune(int(args.max_mb * 1024 ** 2), older_than)
+        print(f"Evicted {len(evicted)} entries")
+    else:
+        evicted = cache.prune(0)
+        print(f"Removed {len(evicted)} entries")
@@ -0,0 +1,250 @@
+import math
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from . import instrument
+
+DECODERS = ("opencv", "ffmpeg")
+ENCODERS = ("auto", "ffmpeg", "opencv")
+
+
+def _safe_fps(val):
+    try:
+        v = float(val)
+        if not math.isfinite(v) or v <= 0:
+            return 25.0
+        return v
+    except Exception:
+        return 25.0
+
+
+def _open_writer(base_output_path: str, fps: float, size: tuple[int, int]):
+    base = Path(base_output_path)
+    candidates = [
+        ("mp4v", ".mp4"),
+        ("XVID", ".avi"),
+        ("avc1", ".mp4"),
+    ]
+    for fourcc_name, ext in candidates:
+        out_path = base.with_suffix(ext)
+        writer = cv2.VideoWriter(
+            str(out_path),
+            cv2.VideoWriter_fourcc(*fourcc_name),
+            max(fps, 1.0),
+            size
+        )
+        if writer.isOpened():
+            return writer, str(out_path), fourcc_name
+    return None, None, None
+
+
+def _read_frames(input_path):
+    cap = cv2.VideoCapture(input_path)
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+class VideoReader:
+    """
+    Decodes a video once into a ring of `ring_size` preallocated frame buffers, on a
+    background thread that stays ahead of the consumer. Iterating yields views of
+    the ring (no per-frame allocation or copy); each frame must be handed back with
+    release(frame) once it has been written, which frees its slot for decoding.
+    Holding more than `ring_size` frames blocks the decoder, so the ring also bounds
+    how many frames are in flight.
+
+    decoder="opencv" uses cv2.VideoCapture; decoder="ffmpeg" pipes raw BGR frames
+    from an ffmpeg process using `threads` decoding threads and, if given, `hwaccel`
+    (e.g. "auto", "cuda", "vaapi"). Metadata comes from OpenCV in both cases.
+    """
+
+    def __init__(self, path, ring_size: int = 4, decoder: str = "opencv", threads: int = 0,
+                 hwaccel: str | None = None):
+        if decoder not in DECODERS:
+            raise ValueError(f"Unknown decoder '{decoder}', expected one of {DECODERS}")
+        if decoder == "ffmpeg" and not shutil.which("ffmpeg"):
+            raise RuntimeError("ffmpeg decoder requested but ffmpeg is not on PATH")
+        self.path = str(path)
+        self.decoder = decoder
+        self._cap = cv2.VideoCapture(self.path)
+        if not self._cap.isOpened():
+            raise IOError(f"Could not open video file: {self.path}")
+        self.fps = _safe_fps(self._cap.get(cv2.CAP_PROP_FPS))
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = max(int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+
+        self._proc = None
+        if decoder == "ffmpeg":
+            self._cap.release()
+            self._cap = None
+            cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-threads", str(threads)]
+            if hwaccel:
+                cmd += ["-hwaccel", hwaccel]
+            cmd += ["-i", self.path, "-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+            self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        ring_size = max(2, int(ring_size))
+        self._buffers = np.empty((ring_size, self.height, self.width, 3), dtype=np.uint8)
+        self._views = [self._buffers[i] for i in range(ring_size)]
+        self._slot_of = {id(view): i for i, view in enumerate(self._views)}
+        self._free = queue.Queue()
+        for i in range(ring_size):
+            self._free.put(i)
+        self._ready = queue.Queue()
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._decode, name="video-decode", daemon=True)
+        self._thread.start()
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def _read_into(self, buf) -> bool:
+        with instrument.span("decode"):
+            return self._decode_into(buf)
+
+    def _decode_into(self, buf) -> bool:
+        if self._proc is not None:
+            view = memoryview(buf).cast("B")
+            filled = 0
+            while filled < len(view):
+                n = self._proc.stdout.readinto(view[filled:])
+                if not n:
+                    return False
+                filled += n
+            return True
+        ok, frame = self._cap.read(buf)
+        if ok and not np.shares_memory(frame, buf):
+            # The backend returned its own buffer (e.g. a size change); keep the ring intact
+            if frame.shape != buf.shape:
+                frame = cv2.resize(frame, (self.width, self.height))
+            buf[...] = frame
+        return ok
+
+    def _decode(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    slot = self._free.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if not self._read_into(self._buffers[slot]):
+                    break
+                self._ready.put(slot)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.put(None)
+
+    def __iter__(self):
+        while True:
+            slot = self._ready.get()
+            if slot is None:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield self._views[slot]
+
+    def release(self, frame):
+        """Give a frame's buffer back to the decoder."""
+        self._free.put(self._slot_of[id(frame)])
+
+    def close(self):
+        self._stop.set()
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.stdout.close()
+            self._proc.wait()
+        self._thread.join(timeout=5)
+        if self._cap is not None:
+            self._cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FFmpegWriter:
+    """
+    cv2.VideoWriter-like sink that pipes raw BGR frames into an ffmpeg encoder. yuv420p
+    needs even dimensions, so odd-sized frames get one black row/column of padding.
+    """
+
+    def __init__(self, path: str, fps: float, size: tuple[int, int], codec: str = "libx264",
+                 preset: str = "ultrafast", crf: int = 23):
+        width, height = size
+        self.path = path
+        # A file rather than a pipe: nobody reads stderr while encoding, and a full pipe would block ffmpeg
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(
+            ["ffmpeg", "-y", "-nostdin", "-loglevel", "error",
+             "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(max(fps, 1.0)),
+             "-i", "-", "-an", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-c:v", codec, "-preset", preset, "-crf", str(crf),
+             "-pix_fmt", "yuv420p", "-movflags", "+faststart", path],
+            stdin=subprocess.PIPE, stderr=self._stderr,
+        )
+
+    def isOpened(self) -> bool:
+        return self._proc.poll() is None
+
+    def _failed(self):
+        self._proc.wait()
+        self._stderr.seek(0)
+        message = self._stderr.read().decode(errors="replace").strip()
+        self._stderr.close()
+        return RuntimeError(f"ffmpeg failed to encode {self.path}: {message}")
+
+    def write(self, frame):
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            raise self._failed() from None
+
+    def release(self):
+        if self._proc.stdin.closed:
+            return
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self._proc.wait() != 0:
+            raise self._failed()
+        self._stderr.close()
+
+
+def open_video_writer(base_output_path: str, fps: float, size: tuple[int, int], encoder: str = "auto",
+                      preset: str = "ultrafast", crf: int = 23):
+    """
+    Video sink for `base_output_path` (the suffix is chosen here). encoder="auto" pipes
+    into ffmpeg's libx264 with `preset`/`crf` when ffmpeg is on PATH and otherwise
+    falls back to OpenCV's fourcc chain (mp4v, XVID, avc1); "ffmpeg" and "opencv"
+    force one of them. Returns (writer, path, codec) like _open_writer, or
+    (None, None, None) if nothing could be opened.
+    """
+    if encoder not in ENCODERS:
+        raise ValueError(f"Unknown encoder '{encoder}', expected one of {ENCODERS}")
+    if encoder != "opencv" and shutil.which("ffmpeg"):
+        out_path = str(Path(base_output_path).with_suffix(".mp4"))
+        writer = FFmpegWriter(out_path, fps, size, preset=preset, crf=crf)
+        if writer.isOpened():
+            return writer, out_path, f"libx264/{preset}"
+    elif encoder == "ffmpeg":
+        raise RuntimeError("ffmpeg encoder requested but ffmpeg is not on PATH")
+    return _open_writer(base_output_path, fps, size)